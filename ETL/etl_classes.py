@@ -6,11 +6,13 @@ from typing import Dict, List
 import elasticsearch
 import psycopg2
 import psycopg2.extras
+import redis
 import requests
 from backoff_ import backoff
 from config import Database, Genre, Movies, Person, logger, state_map
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
+from hash_ring import HashRing
 from psycopg2 import sql
 from state import JsonFileStorage, State
 
@@ -169,6 +171,93 @@ class ElasticsearchLoader:
             self.set_state()
 
 
+ETL_COMPLETED_CHANNEL = 'etl::completed'
+DATA_VERSION_KEY = 'etl::version'
+
+
+class CacheClient:
+    """
+    Клиент кэша API. Ключи раскладываются по узлам REDIS_NODES тем же кольцом, что и в API,
+    реплики узлов ETL не нужны. Первый узел служит для pub/sub.
+    """
+
+    def __init__(self, nodes: str):
+        primaries = [item.split('|')[0].strip() for item in nodes.split(',') if item.strip()]
+        self.clients = {}
+        for primary in primaries:
+            host, _, port = primary.rpartition(':')
+            self.clients[primary] = redis.Redis(host=host, port=int(port))
+        self.control = self.clients[primaries[0]]
+        self.ring = HashRing(primaries)
+
+    def client_for(self, key: str) -> redis.Redis:
+        return self.clients[self.ring.get(key)]
+
+    def delete(self, *keys: str) -> None:
+        by_node: Dict[str, List[str]] = {}
+        for key in keys:
+            by_node.setdefault(self.ring.get(key), []).append(key)
+        for node, node_keys in by_node.items():
+            self.clients[node].delete(*node_keys)
+
+    def smembers(self, key: str) -> set:
+        return self.client_for(key).smembers(key)
+
+    def incr(self, key: str) -> int:
+        return self.client_for(key).incr(key)
+
+    def publish(self, channel: str, message: str) -> None:
+        self.control.publish(channel, message)
+
+
+def redis_connection() -> CacheClient:
+    default_node = '{0}:{1}'.format(os.environ.get('REDIS_HOST', '127.0.0.1'), os.environ.get('REDIS_PORT', 6379))
+    return CacheClient(os.environ.get('REDIS_NODES', default_node))
+
+
+class CacheInvalidator:
+    """
+    Удаляет из кэша API записи об изменённых объектах.
+    Ключи должны совпадать с ключами API (cache/keys.py): <index>::guid::<id>.
+    Вместе с записью удаляется её копия stale::<key>, которую API отдаёт, пока
+    Elasticsearch недоступен, иначе API продолжал бы отдавать старые данные.
+    Списки в кэше API хранят только id, поэтому после удаления записи объекта
+    они тоже отдают актуальные данные.
+    Пустые страницы и поиски, запомненные API, перечислены в множестве <index>::negative,
+    они удаляются целиком, так как новый объект может в них попасть.
+    """
+
+    def __init__(self, index_name: str):
+        self.index_name = index_name
+        self.client = redis_connection()
+
+    def get_keys(self, rows: List[dict]) -> List[str]:
+        keys = ['{0}::guid::{1}'.format(self.index_name, row['id']) for row in rows]
+        if self.index_name == 'person':
+            keys.extend('person::films::guid::{0}'.format(row['id']) for row in rows)
+        return keys + ['stale::{0}'.format(key) for key in keys]
+
+    @backoff(logger)
+    def invalidate(self, rows: List[dict]) -> None:
+        """Удаление записей изменённых объектов и пустых страниц из кэша"""
+        if not rows:
+            return
+        negative_key = '{0}::negative'.format(self.index_name)
+        negative_keys = [key.decode() for key in self.client.smembers(negative_key)]
+        self.client.delete(*self.get_keys(rows), *negative_keys, negative_key)
+
+
+@backoff(logger)
+def notify_etl_completed(indexes: List[str]) -> None:
+    """
+    Сообщение API о завершении загрузки, по нему API прогревает кэш.
+    Перед ним увеличивается версия данных, из которой API строит ETag ответов.
+    """
+    client = redis_connection()
+    client.incr(DATA_VERSION_KEY)
+    client.publish(ETL_COMPLETED_CHANNEL, ','.join(indexes))
+
+
 
 
 
@@ -3,8 +3,10 @@ import time
 
 from dotenv import load_dotenv
 from es_indexes import settings_film, settings_genre, settings_person
-from etl_classes import (DataTransform, ElasticsearchLoader,
-                         ElasticsearchPreparation, PostgresExtractor)
+from etl_classes import (CacheInvalidator, DataTransform, ElasticsearchLoader,
+                         ElasticsearchPreparation, PostgresExtractor,
+                         notify_etl_completed)
+from snapshot import snapshot_writer
 from sql_query import film_query, genre_query, person_query
 
 load_dotenv()
@@ -15,11 +17,14 @@ INDEX_PERSON_NAME = 'person'
 INDEX_GENRE_NAME = 'genre'
 
 
-def etl(query: str, index_name: str, settings: dict) -> None:
+def etl(query: str, index_name: str, settings: dict, snapshot=None) -> int:
+    """Перенос изменённых записей индекса, возвращает количество перенесённых записей"""
+    uploaded = 0
     cl = ElasticsearchPreparation()
     postgr = PostgresExtractor(query, BATCH_SIZE, index_name)
 
     el = ElasticsearchLoader(os.environ.get('ES_URL'), index_name)
+    cache = CacheInvalidator(index_name)
     cl.create_index(index_name=index_name, settings=settings)
     transf = DataTransform(index_name)
     with postgr.conn as pc:
@@ -27,13 +32,25 @@ def etl(query: str, index_name: str, settings: dict) -> None:
         for row in rows:
             res = transf.get_elasticsearch_type(row)
             el.upload_to_elasticsearch(res)
+            cache.invalidate(res)
+            if snapshot is not None:
+                snapshot.put(index_name, res)
+            uploaded += len(res)
     pc.close()
+    return uploaded
 
 
 if __name__ == '__main__':
+    snapshot = snapshot_writer()
     while True:
-        etl(film_query, INDEX_MOVIE_NAME, settings_film)
-        etl(person_query, INDEX_PERSON_NAME, settings_person)
-        etl(genre_query, INDEX_GENRE_NAME, settings_genre)
+        changed = [index_name for index_name, uploaded in (
+            (INDEX_MOVIE_NAME, etl(film_query, INDEX_MOVIE_NAME, settings_film, snapshot)),
+            (INDEX_PERSON_NAME, etl(person_query, INDEX_PERSON_NAME, settings_person, snapshot)),
+            (INDEX_GENRE_NAME, etl(genre_query, INDEX_GENRE_NAME, settings_genre, snapshot)),
+        ) if uploaded]
+        if snapshot is not None:
+            snapshot.publish()
+        if changed:
+            notify_etl_completed(changed)
         time.sleep(10)
 
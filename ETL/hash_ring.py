@@ -0,0 +1,33 @@
+import bisect
+import hashlib
+from typing import Dict, List
+
+
+class HashRing:
+    """
+    Кольцо консистентного хеширования с виртуальными узлами.
+    Должно совпадать с кольцом API (src/db/sharded_redis.py), иначе ETL будет
+    удалять ключи не на тех узлах кэша.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 160):
+        self.vnodes = vnodes
+        self.points: List[int] = []
+        self.owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def add(self, node: str) -> None:
+        for replica in range(self.vnodes):
+            point = self.hash('{0}#{1}'.format(node, replica))
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+            self.owners[point] = node
+
+    def get(self, key: str) -> str:
+        position = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+        return self.owners[self.points[position]]
@@ -0,0 +1,102 @@
+import datetime
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from config import logger
+
+MANIFEST = 'current.json'
+SCHEMA = 'CREATE TABLE IF NOT EXISTS entities (idx TEXT NOT NULL, id TEXT NOT NULL, value TEXT NOT NULL, ' \
+         'PRIMARY KEY (idx, id)) WITHOUT ROWID'
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotWriter:
+    """
+    Снимок документов индексов для API: файл SQLite с таблицей entities (индекс, id, документ).
+    Каждая версия — новый файл: копия предыдущей версии с изменёнными за проход ETL
+    документами. Опубликованный файл больше не меняется, API читает его как неизменяемый.
+    Версия публикуется атомарной заменой файла current.json; старые файлы удаляются,
+    кроме последних keep.
+    """
+
+    def __init__(self, directory: str, keep: int = 3):
+        self.directory = directory
+        self.keep = keep
+        self.connection: Optional[sqlite3.Connection] = None
+        self.version = 0
+        self.path = ''
+        self.counts: Dict[str, int] = {}
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = read_manifest(self.directory)
+        self.version = (manifest['version'] if manifest else 0) + 1
+        self.path = os.path.join(self.directory, 'snapshot-{0}.sqlite'.format(self.version))
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.connection = sqlite3.connect(self.path)
+        if manifest:
+            source = sqlite3.connect('file:{0}?mode=ro'.format(os.path.join(self.directory, manifest['file'])),
+                                     uri=True)
+            source.backup(self.connection)
+            source.close()
+        self.connection.execute(SCHEMA)
+        self.counts = {}
+
+    def put(self, index_name: str, rows: List[dict]) -> None:
+        """Добавление или замена документов индекса в готовящейся версии"""
+        if not rows:
+            return
+        if self.connection is None:
+            self._open()
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO entities (idx, id, value) VALUES (?, ?, ?)',
+            [(index_name, str(row['id']), json.dumps(row, default=str)) for row in rows])
+        self.counts[index_name] = self.counts.get(index_name, 0) + len(rows)
+
+    def publish(self) -> None:
+        """Публикация готовящейся версии, если в ней есть изменения"""
+        if self.connection is None:
+            return
+        self.connection.commit()
+        self.connection.execute('VACUUM')
+        self.connection.close()
+        self.connection = None
+        manifest = {
+            'version': self.version,
+            'file': os.path.basename(self.path),
+            'created': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'changed': self.counts,
+        }
+        temporary = os.path.join(self.directory, MANIFEST + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(manifest, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, os.path.join(self.directory, MANIFEST))
+        logger.info('Snapshot version {0} published: {1}'.format(self.version, self.counts))
+        self._remove_old()
+
+    def _remove_old(self) -> None:
+        files = sorted((name for name in os.listdir(self.directory)
+                        if name.startswith('snapshot-') and name.endswith('.sqlite')),
+                       key=lambda name: int(name[len('snapshot-'):-len('.sqlite')]))
+        for name in files[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+def snapshot_writer() -> Optional[SnapshotWriter]:
+    directory = os.environ.get('SNAPSHOT_DIR')
+    return SnapshotWriter(directory) if directory else None
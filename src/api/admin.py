@@ -0,0 +1,57 @@
+import hmac
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+
+from api.v1.error import ADMIN_FORBIDDEN, SLOW_QUERY_LOG_DISABLED
+from core import config
+from db.redis import get_redis
+from db.sharded_redis import ShardedRedis
+from storage import slow_queries
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail=ADMIN_FORBIDDEN)
+
+
+# Every route needs the token: main.py includes the router with `require_admin` as a dependency.
+router = APIRouter()
+
+
+def slow_query_log() -> slow_queries.SlowQueryLog:
+    if slow_queries.slow_query_log is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=SLOW_QUERY_LOG_DISABLED)
+    return slow_queries.slow_query_log
+
+
+@router.get('/slow-queries',
+            summary="Slow queries",
+            description="Searches of the answering worker that took longer than SLOW_QUERY_MS")
+async def slow_query_records():
+    return ORJSONResponse(slow_query_log().snapshot(), headers={'Cache-Control': 'no-store'})
+
+
+@router.put('/slow-queries/profiling',
+            summary="Query profiling switch",
+            description="Profiles slow searches and a sample of the others in all workers for `seconds`; "
+                        "0 switches profiling off")
+async def switch_profiling(rate: float = Query(0.01, ge=0, le=1, description='Share of other searches to profile'),
+                           seconds: int = Query(600, ge=0, le=60 * 60 * 24, description='How long to keep profiling'),
+                           redis: ShardedRedis = Depends(get_redis)):
+    log = slow_query_log()
+    await slow_queries.switch_profiling(redis, rate, seconds)
+    await log.refresh()
+    return ORJSONResponse({'profile_rate': log.profile_rate, 'seconds': seconds})
+
+
+@router.get('/slow-queries/profiles',
+            summary="Query profiles",
+            description="Profile trees stored by all workers, newest first")
+async def query_profiles(redis: ShardedRedis = Depends(get_redis)):
+    slow_query_log()
+    return ORJSONResponse(await slow_queries.stored_profiles(redis), headers={'Cache-Control': 'no-store'})
@@ -0,0 +1,42 @@
+from http import HTTPStatus
+
+import orjson
+
+from api.routes import EXPORT, route_class
+from storage.resilience import route_kind
+
+OVERLOADED = 'Service is overloaded, retry later'
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Marks API requests with their route class for the storage concurrency limiter
+    (storage.resilience.ConcurrencyLimiter). Requests answered from the caches never wait
+    for a slot; storage calls over the limit fall back to stale entries or get a 503.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        kind = route_class(scope['path']) if scope['type'] == 'http' else None
+        # Exports stream for minutes, their duration says nothing about the backend's load.
+        if kind is None or kind == EXPORT:
+            await self.app(scope, receive, send)
+            return
+        token = route_kind.set(kind)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_kind.reset(token)
+
+
+async def reject(send, detail: str, retry_after: int, status: int = HTTPStatus.SERVICE_UNAVAILABLE,
+                 headers: list = ()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'retry-after', str(retry_after).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': orjson.dumps({'detail': detail})})
@@ -0,0 +1,34 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from cache import shared_memory
+from db.warmup import readiness
+from services.catalogue import genre_catalogue
+from storage import snapshot
+from storage.resilience import elastic_breaker, storage_limiter
+
+router = APIRouter()
+
+
+@router.get('/live',
+            summary="Liveness",
+            description="The worker's event loop answers")
+async def live():
+    return ORJSONResponse({'alive': True, 'uptime_seconds': readiness.snapshot()['uptime_seconds']})
+
+
+@router.get('/ready',
+            summary="Readiness",
+            description="503 until the worker's Redis and Elasticsearch connections are warmed up")
+async def ready():
+    content = {**readiness.snapshot(), 'elasticsearch_breaker': elastic_breaker.snapshot(),
+               'storage_concurrency': storage_limiter.snapshot(),
+               'genre_catalogue': genre_catalogue.snapshot()}
+    if shared_memory.shared_table is not None:
+        content['shared_cache'] = shared_memory.shared_table.snapshot()
+    if snapshot.snapshot_reader is not None:
+        content['snapshot'] = snapshot.snapshot_reader.snapshot()
+    status = HTTPStatus.OK if readiness.ready else HTTPStatus.SERVICE_UNAVAILABLE
+    return ORJSONResponse(content, status_code=status, headers={'Cache-Control': 'no-store'})
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import math
+import time
+from http import HTTPStatus
+from typing import Optional
+
+import aioredis
+
+from api.concurrency import reject
+from api.routes import EXPORT, LISTING, LOOKUP, SEARCH, route_class
+from core import config
+from core.config import logger
+from db import redis
+
+TOO_MANY_REQUESTS = 'Too many requests'
+
+# GCRA: the key holds the theoretical arrival time (TAT) in ms. A request is allowed when
+# TAT - burst * emission interval <= now, and then moves TAT one emission interval forward.
+# Returns {allowed, remaining, retry after ms, reset ms}.
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local tolerance = emission * burst
+local new_tat = tat + emission
+if new_tat - tolerance > now then
+    return {0, 0, new_tat - tolerance - now, tat - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((tolerance - (new_tat - now)) / emission), 0, new_tat - now}
+"""
+
+
+class Limit:
+    """`requests` per `seconds`, bursts of up to `requests` are allowed."""
+
+    def __init__(self, requests: int, seconds: float):
+        self.requests = requests
+        self.emission_ms = max(1, int(seconds * 1000 / requests))
+        self.burst = requests
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Limit':
+        """`100/60` -> 100 requests per 60 seconds."""
+        requests, _, seconds = spec.partition('/')
+        return cls(int(requests), float(seconds or 1))
+
+
+class LocalBuckets:
+    """The same GCRA kept in process memory, used while Redis is unreachable."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.tats: dict[str, float] = {}
+        self.max_keys = max_keys
+
+    def check(self, key: str, limit: Limit) -> tuple[int, int, int, int]:
+        now = time.monotonic() * 1000
+        if len(self.tats) > self.max_keys:
+            self.tats = {name: tat for name, tat in self.tats.items() if tat > now}
+        tat = max(self.tats.get(key, now), now)
+        tolerance = limit.emission_ms * limit.burst
+        new_tat = tat + limit.emission_ms
+        if new_tat - tolerance > now:
+            return 0, 0, int(new_tat - tolerance - now), int(tat - now)
+        self.tats[key] = new_tat
+        return 1, int((tolerance - (new_tat - now)) // limit.emission_ms), 0, int(new_tat - now)
+
+
+class RateLimiter:
+    """
+    Limits requests per client and route class across all workers with one Lua call per
+    request. Clients are identified by a known `X-API-Key` header, or by their address. When
+    Redis fails the limiter switches to per-worker buckets for `fallback_seconds`.
+    """
+
+    def __init__(self, limits: Optional[dict] = None, timeout_ms: float = config.RATE_LIMIT_REDIS_TIMEOUT_MS,
+                 fallback_seconds: float = config.RATE_LIMIT_FALLBACK_SECONDS):
+        self.limits = limits or {
+            LOOKUP: Limit.parse(config.RATE_LIMIT_LOOKUP),
+            LISTING: Limit.parse(config.RATE_LIMIT_LISTING),
+            SEARCH: Limit.parse(config.RATE_LIMIT_SEARCH),
+            EXPORT: Limit.parse(config.RATE_LIMIT_EXPORT),
+        }
+        self.timeout = timeout_ms / 1000
+        self.fallback_seconds = fallback_seconds
+        self.local = LocalBuckets()
+        self.redis_down_until = 0.0
+
+    async def check(self, kind: str, client: str) -> tuple[Limit, tuple[int, int, int, int]]:
+        limit = self.limits[kind]
+        key = 'rate::{0}::{1}'.format(kind, client)
+        if redis.redis is not None and time.monotonic() >= self.redis_down_until:
+            try:
+                result = await asyncio.wait_for(
+                    redis.redis.eval_script(GCRA_SCRIPT, key, [limit.emission_ms, limit.burst]), self.timeout)
+                return limit, tuple(result)
+            except (aioredis.RedisError, OSError, asyncio.TimeoutError) as error:
+                logger.warning('Rate limiting falls back to local buckets: {0!r}'.format(error))
+                self.redis_down_until = time.monotonic() + self.fallback_seconds
+        return limit, self.local.check(key, limit)
+
+
+def client_identity(scope) -> str:
+    headers = dict(scope['headers'])
+    api_key = headers.get(b'x-api-key')
+    # Unknown keys would give every request a fresh bucket.
+    if api_key and api_key.decode('latin-1') in config.RATE_LIMIT_API_KEYS:
+        return 'key:{0}'.format(hashlib.blake2b(api_key, digest_size=8).hexdigest())
+    forwarded = headers.get(b'x-forwarded-for')
+    if forwarded and config.RATE_LIMIT_TRUST_FORWARDED:
+        # nginx appends the address it sees, earlier entries come from the client.
+        return 'ip:{0}'.format(forwarded.decode().split(',')[-1].strip())
+    client = scope.get('client')
+    return 'ip:{0}'.format(client[0] if client else 'unknown')
+
+
+def rate_limit_headers(limit: Limit, remaining: int, reset_ms: int) -> list[tuple[bytes, bytes]]:
+    return [
+        (b'ratelimit-limit', str(limit.requests).encode()),
+        (b'ratelimit-remaining', str(max(0, remaining)).encode()),
+        (b'ratelimit-reset', str(math.ceil(reset_ms / 1000)).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After over the limit and adds RateLimit-* headers to API responses."""
+
+    def __init__(self, app, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or RateLimiter()
+
+    async def __call__(self, scope, receive, send):
+        kind = route_class(scope['path']) if scope['type'] == 'http' else None
+        if kind is None:
+            await self.app(scope, receive, send)
+            return
+        limit, (allowed, remaining, retry_after_ms, reset_ms) = await self.limiter.check(kind, client_identity(scope))
+        headers = rate_limit_headers(limit, remaining, reset_ms)
+        if not allowed:
+            await reject(send, TOO_MANY_REQUESTS, retry_after=math.ceil(retry_after_ms / 1000),
+                         status=HTTPStatus.TOO_MANY_REQUESTS, headers=headers)
+            return
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', []), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,26 @@
+from typing import Optional
+
+API_PREFIX = '/api/v1/'
+
+LOOKUP = 'lookup'
+LISTING = 'listing'
+SEARCH = 'search'
+EXPORT = 'export'
+
+
+def route_class(path: str) -> Optional[str]:
+    """
+    Cost class of an API path: `lookup` for requests by id, `search` for fuzzy search,
+    `listing` for pages and `export` for full catalogue streams. Paths outside the API
+    (docs, health checks) have no class.
+    """
+    if not path.startswith(API_PREFIX):
+        return None
+    segments = [segment for segment in path[len(API_PREFIX):].split('/') if segment]
+    if 'search' in segments:
+        return SEARCH
+    if segments[1:2] == ['export']:
+        return EXPORT
+    if len(segments) >= 2:
+        return LOOKUP
+    return LISTING
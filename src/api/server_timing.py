@@ -0,0 +1,70 @@
+import hmac
+import logging
+import random
+
+import orjson
+
+from api.routes import route_class
+from core import config, timing
+
+access_logger = logging.getLogger('api.access')
+
+FORCE_HEADER = b'x-server-timing'
+ADMIN_TOKEN_HEADER = b'x-admin-token'
+
+
+class ServerTimingMiddleware:
+    """
+    Times a sample of API requests: the share `sample_rate` of them and every request with an
+    `X-Server-Timing` header and the admin token in `X-Admin-Token`. Sampled responses carry
+    a Server-Timing header with the time spent in Redis, Elasticsearch, model construction
+    and serialization and the hits and misses of each cache tier; the same data is written
+    as a JSON access log record.
+    Requests that are not sampled only pay for the sampling decision.
+    """
+
+    def __init__(self, app, sample_rate: float = config.SERVER_TIMING_SAMPLE_RATE,
+                 header: bool = config.SERVER_TIMING_HEADER):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header
+
+    def sampled(self, scope) -> bool:
+        if random.random() < self.sample_rate:
+            return True
+        headers = dict(scope['headers'])
+        if FORCE_HEADER not in headers or not config.ADMIN_TOKEN:
+            return False
+        return hmac.compare_digest(headers.get(ADMIN_TOKEN_HEADER, b''), config.ADMIN_TOKEN.encode())
+
+    async def __call__(self, scope, receive, send):
+        kind = route_class(scope['path']) if scope['type'] == 'http' else None
+        if kind is None or not self.sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timings = timing.Timings()
+        token = timing.current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if self.header:
+                    message = {**message, 'headers': [*message.get('headers', []),
+                                                      (b'server-timing', timings.header().encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timing.current.reset(token)
+            access_logger.info(orjson.dumps({
+                'method': scope['method'],
+                'path': scope['path'],
+                'query': scope['query_string'].decode('latin-1'),
+                'route_class': kind,
+                'status': status,
+                **timings.record(),
+            }).decode())
@@ -3,3 +3,7 @@ PAGE_NOT_FOUND = 'Page not found'
 FILM_NOT_FOUND = 'Film not found'
 GENRE_NOT_FOUND = 'Genre not found'
 PERSON_NOT_FOUND = 'Person not found'
+INVALID_CURSOR = 'Invalid export cursor'
+STORAGE_UNAVAILABLE = 'Storage is temporarily unavailable'
+ADMIN_FORBIDDEN = 'Invalid admin token'
+SLOW_QUERY_LOG_DISABLED = 'Slow query log is not enabled'
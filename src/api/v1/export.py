@@ -0,0 +1,50 @@
+import base64
+import binascii
+from http import HTTPStatus
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from api.v1.error import INVALID_CURSOR
+from core.config import logger
+from services.utils import BaseService
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def encode_cursor(index: str, last_id: str) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps({'i': index, 'a': last_id})).decode().rstrip('=')
+
+
+def decode_cursor(index: str, cursor: Optional[str]) -> Optional[str]:
+    """Id of the last exported document, the cursor must come from an export of the same index."""
+    if not cursor:
+        return None
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=INVALID_CURSOR)
+    if not isinstance(data, dict) or data.get('i') != index or not isinstance(data.get('a'), str):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=INVALID_CURSOR)
+    return data['a']
+
+
+def export_response(service: BaseService, cursor: Optional[str]) -> StreamingResponse:
+    """
+    Streams every document of the service's index as NDJSON, one batch in memory at a time.
+    Each batch is followed by a `{"cursor": ...}` line; passing it back resumes after that batch.
+    """
+    after = decode_cursor(service.index, cursor)
+
+    async def stream():
+        exported = 0
+        async for sources in service.export_batches(after):
+            lines = [orjson.dumps(source) for source in sources]
+            lines.append(orjson.dumps({'cursor': encode_cursor(service.index, sources[-1]['id'])}))
+            exported += len(sources)
+            yield b'\n'.join(lines) + b'\n'
+        logger.info('Exported {0} documents of {1}'.format(exported, service.index))
+
+    return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE, headers={'X-Accel-Buffering': 'no'})
@@ -3,6 +3,9 @@ from http import HTTPStatus
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from api.v1.error import FILM_NOT_FOUND, PAGE_NOT_FOUND
+from api.v1.export import export_response
+from api.v1.http_cache import (DETAILS_CACHE_CONTROL, LISTING_CACHE_CONTROL,
+                                SEARCH_CACHE_CONTROL, json_response, not_modified)
 from api.v1.paginator import Paginator
 from models.models import Film, FilmById, GenreInFilm, PersonInFilm
 from services.film import FilmService, get_film_service
@@ -10,7 +13,7 @@ from services.film import FilmService, get_film_service
 router = APIRouter()
 
 
-@router.get('/',
+@router.get('/', response_model=list[Film],
             summary="All movies",
             response_description="Movies' title and rating",
             description="Information about all movies in the service")
@@ -22,15 +25,18 @@ async def all_films(request: Request,
     """
     Returns the list of people participating in any movies.
     """
+    response = not_modified(request, LISTING_CACHE_CONTROL)
+    if response is not None:
+        return response
     films = await person_service.get_all_objects(page=paginator.page_number, sort=sort, genre=genre,
                                                page_size=paginator.page_size, request=request)
     if not films:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return films
+    return json_response(request, films, LISTING_CACHE_CONTROL)
 
 
-@router.get('/search/',
+@router.get('/search/', response_model=list[Film],
             summary="Film search",
             response_description="Movies' title and rating",
             description="Full text search for movies",
@@ -42,12 +48,24 @@ async def all_films(request: Request,
     """
     Returns the list of people participating in any movies.
     """
+    response = not_modified(request, SEARCH_CACHE_CONTROL)
+    if response is not None:
+        return response
     films = await person_service.get_all_objects(title=title, page=paginator.page_number,
                                                page_size=paginator.page_size, request=request)
     if not films:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return films
+    return json_response(request, films, SEARCH_CACHE_CONTROL)
+
+
+@router.get('/export',
+            summary="Export all movies",
+            response_description="NDJSON stream: one document per line, a cursor line after every batch",
+            description="Streams every movie of the service, resumable from a cursor line")
+async def export_films(film_service: FilmService = Depends(get_film_service),
+                       cursor: str = Query(None, description='Cursor from a previous export to resume after')):
+    return export_response(film_service, cursor)
 
 
 @router.get('/{film_id}', response_model=FilmById,
@@ -55,11 +73,13 @@ async def all_films(request: Request,
             response_description="Movies' title, rating, description, genre, director, actors and writers",
             description="Information about film by its id",
             tags=['ID search'])
-async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)) -> FilmById:
+async def film_details(film_id: str, request: Request,
+                       film_service: FilmService = Depends(get_film_service)) -> FilmById:
+    response = not_modified(request, DETAILS_CACHE_CONTROL)
+    if response is not None:
+        return response
     film = await film_service.get_by_id(film_id)
     if not film:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=FILM_NOT_FOUND)
 
-    return FilmById(id=film.id, title=film.title, imdb_rating=film.imdb_rating,
-                    description=film.description, genre=film.genre, director=film.director,
-                    actors=film.actors, writers=film.writers)
+    return json_response(request, film, DETAILS_CACHE_CONTROL)
@@ -3,6 +3,9 @@ from http import HTTPStatus
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from api.v1.error import GENRE_NOT_FOUND, PAGE_NOT_FOUND
+from api.v1.export import export_response
+from api.v1.http_cache import (DETAILS_CACHE_CONTROL, LISTING_CACHE_CONTROL,
+                                SEARCH_CACHE_CONTROL, json_response, not_modified)
 from api.v1.paginator import Paginator
 from models.models import Genre
 from services.genre import GenreService, get_genre_service
@@ -10,7 +13,7 @@ from services.genre import GenreService, get_genre_service
 router = APIRouter()
 
 
-@router.get('/',
+@router.get('/', response_model=list[Genre],
             summary="All genres",
             response_description="Genres' name",
             description="Information about all genres in the service")
@@ -21,15 +24,18 @@ async def all_genres(request: Request,
     Returns the list of genres from all movies.
 
     """
+    response = not_modified(request, LISTING_CACHE_CONTROL)
+    if response is not None:
+        return response
     genre = await genre_service.get_all_objects(page=paginator.page_number,
                                                 page_size=paginator.page_size, request=request)
     if not genre:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return genre
+    return json_response(request, genre, LISTING_CACHE_CONTROL)
 
 
-@router.get('/search/',
+@router.get('/search/', response_model=list[Genre],
             summary="Genre search",
             response_description="Genres' name",
             description="Full text search for genres",
@@ -42,12 +48,24 @@ async def all_genres(request: Request,
     Returns the list of genres from all movies.
 
     """
+    response = not_modified(request, SEARCH_CACHE_CONTROL)
+    if response is not None:
+        return response
     genre = await genre_service.get_all_objects(name=name, page=paginator.page_number,
                                                 page_size=paginator.page_size, request=request)
     if not genre:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return genre
+    return json_response(request, genre, SEARCH_CACHE_CONTROL)
+
+
+@router.get('/export',
+            summary="Export all genres",
+            response_description="NDJSON stream: one document per line, a cursor line after every batch",
+            description="Streams every genre of the service, resumable from a cursor line")
+async def export_genres(genre_service: GenreService = Depends(get_genre_service),
+                        cursor: str = Query(None, description='Cursor from a previous export to resume after')):
+    return export_response(genre_service, cursor)
 
 
 @router.get('/{genre_id}', response_model=Genre,
@@ -55,12 +73,15 @@ async def all_genres(request: Request,
             response_description="Genres' name",
             description="Information about genre by its id",
             tags=['ID search'])
-async def genre_details(genre_id: str,
+async def genre_details(genre_id: str, request: Request,
                         genre_service: GenreService = Depends(get_genre_service)) -> Genre:
     """
     Returns the info about genre from its id.
     """
+    response = not_modified(request, DETAILS_CACHE_CONTROL)
+    if response is not None:
+        return response
     genre = await genre_service.get_by_id(genre_id)
     if not genre:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=GENRE_NOT_FOUND)
-    return Genre(id=genre.id, name=genre.name)
+    return json_response(request, genre, DETAILS_CACHE_CONTROL)
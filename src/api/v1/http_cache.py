@@ -0,0 +1,85 @@
+import hashlib
+from http import HTTPStatus
+from typing import Any, Optional
+
+import orjson
+from fastapi import Request, Response
+
+from cache import data_version
+from cache.redis_cache import served_stale
+from core import timing
+from models.models import model_encoder
+
+LISTING_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=30'
+SEARCH_CACHE_CONTROL = 'public, max-age=30, stale-while-revalidate=30'
+DETAILS_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=60'
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag built from the hash of the serialized body."""
+    return '"{0}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def version_etag(request: Request) -> Optional[str]:
+    """
+    Weak ETag from the data version and the request URL: known before the body is serialized.
+    None while there is no data version, the body hash is used then.
+    """
+    if data_version.data_version is None or data_version.data_version.value is None:
+        return None
+    url = '{0}?{1}'.format(request.url.path, request.url.query).encode()
+    return 'W/"{0}-{1}"'.format(data_version.data_version.value, hashlib.blake2b(url, digest_size=8).hexdigest())
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {tag.strip() for tag in header.split(',')}
+    return etag in candidates or 'W/' + etag in candidates
+
+
+def cached_response(request: Request, body: bytes, cache_control: str) -> Response:
+    """
+    Returns 304 without a body when the client already holds this representation,
+    otherwise the body itself. Both carry the ETag and Cache-Control headers.
+    """
+    etag = make_etag(body)
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def not_modified(request: Request, cache_control: str) -> Optional[Response]:
+    """
+    Called first in a route: with a data version, a matching If-None-Match is answered with
+    304 before the service looks anything up. Also starts tracking stale copies for the request.
+    """
+    served_stale.set(False)
+    etag = version_etag(request)
+    if etag is None or not etag_matches(request, etag):
+        return None
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag, 'Cache-Control': cache_control})
+
+
+def json_response(request: Request, content: Any, cache_control: str) -> Response:
+    """
+    Serializes objects from the cache or the storage once with orjson. The returned Response
+    bypasses the route's response_model, which is kept only for the OpenAPI schema.
+    With a data version, If-None-Match is checked first and a 304 is sent without serializing.
+    Content from stale copies is older than the data version and gets the ETag of its body.
+    """
+    etag = None if served_stale.get() else version_etag(request)
+    if etag is not None:
+        headers = {'ETag': etag, 'Cache-Control': cache_control}
+        if etag_matches(request, etag):
+            return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+        with timing.measure('serialize'):
+            body = orjson.dumps(content, default=model_encoder)
+        return Response(content=body, media_type='application/json', headers=headers)
+    with timing.measure('serialize'):
+        body = orjson.dumps(content, default=model_encoder)
+        return cached_response(request, body, cache_control)
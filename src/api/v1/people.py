@@ -3,6 +3,9 @@ from http import HTTPStatus
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from api.v1.error import FILM_NOT_FOUND, PAGE_NOT_FOUND, PERSON_NOT_FOUND
+from api.v1.export import export_response
+from api.v1.http_cache import (DETAILS_CACHE_CONTROL, LISTING_CACHE_CONTROL,
+                                SEARCH_CACHE_CONTROL, json_response, not_modified)
 from api.v1.paginator import Paginator
 from models.models import Film, Person
 from services.person import PersonService, get_person_service
@@ -10,7 +13,7 @@ from services.person import PersonService, get_person_service
 router = APIRouter()
 
 
-@router.get('/',
+@router.get('/', response_model=list[Person],
             summary="All people",
             response_description="Person' full name, them roles and movies' links",
             description="All people from any movies")
@@ -20,15 +23,18 @@ async def all_people(request: Request,
     """
     Returns the list of people participating in any movies.
     """
+    response = not_modified(request, LISTING_CACHE_CONTROL)
+    if response is not None:
+        return response
     person = await person_service.get_all_objects(request=request, page_size=paginator.page_size,
                                                   page=paginator.page_number)
     if not person:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return person
+    return json_response(request, person, LISTING_CACHE_CONTROL)
 
 
-@router.get('/search/',
+@router.get('/search/', response_model=list[Person],
             summary="Person search",
             response_description="Person' full name, them roles and movies' links",
             description="Full text search for people",
@@ -41,13 +47,25 @@ async def all_people(request: Request,
     """
     Returns the list of people participating in any movies.
     """
+    response = not_modified(request, SEARCH_CACHE_CONTROL)
+    if response is not None:
+        return response
     person = await person_service.get_all_objects(name=name, role=role,
                                                   request=request, page_size=paginator.page_size,
                                                   page=paginator.page_number)
     if not person:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PAGE_NOT_FOUND)
 
-    return person
+    return json_response(request, person, SEARCH_CACHE_CONTROL)
+
+
+@router.get('/export',
+            summary="Export all people",
+            response_description="NDJSON stream: one document per line, a cursor line after every batch",
+            description="Streams every person of the service, resumable from a cursor line")
+async def export_people(person_service: PersonService = Depends(get_person_service),
+                        cursor: str = Query(None, description='Cursor from a previous export to resume after')):
+    return export_response(person_service, cursor)
 
 
 @router.get('/{person_id}', response_model=Person,
@@ -55,28 +73,34 @@ async def all_people(request: Request,
             response_description="Person' full name, them roles and movies' links",
             description="Information about person by its id",
             tags=['ID search'])
-async def person_details(person_id: str,
+async def person_details(person_id: str, request: Request,
                          person_service: PersonService = Depends(get_person_service)) -> Person:
     """
     Returns the info about person from them ids.
     """
+    response = not_modified(request, DETAILS_CACHE_CONTROL)
+    if response is not None:
+        return response
     person = await person_service.get_by_id(person_id)
     if not person:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=PERSON_NOT_FOUND)
-    return Person(id=person.id, full_name=person.full_name, roles=person.roles, film_ids=person.film_ids)
+    return json_response(request, person, DETAILS_CACHE_CONTROL)
 
 
-@router.get('/{person_id}/films/',
+@router.get('/{person_id}/films/', response_model=list[Film],
             summary="Movie search from person id",
             response_description="Movies' title and rating",
             description="Information about movies in which a person participated",
             tags=['ID search'])
-async def film_details(person_id: str,
+async def film_details(person_id: str, request: Request,
                        person_service: PersonService = Depends(get_person_service)) -> Film:
     """
     Returns the info about person from them ids.
     """
+    response = not_modified(request, LISTING_CACHE_CONTROL)
+    if response is not None:
+        return response
     film = await person_service.get_film_by_person_id(person_id=person_id)
     if not film:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=FILM_NOT_FOUND)
-    return film
+    return json_response(request, film, LISTING_CACHE_CONTROL)
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Any
 
 
 class AsyncCacheStorage(ABC):
@@ -7,5 +8,5 @@ class AsyncCacheStorage(ABC):
         pass
 
     @abstractmethod
-    async def set(self, key: str, value: str, expire: int, **kwargs):
+    async def set(self, key: str, value: Any, expire: int, **kwargs):
         pass
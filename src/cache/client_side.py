@@ -0,0 +1,206 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import aioredis
+from aioredis import Redis
+
+from cache import shared_memory
+from core import config, timing
+from core.config import logger
+from db.sharded_redis import ShardedRedis, address
+
+INVALIDATE_CHANNEL = '__redis__:invalidate'
+
+
+class TrackedNode:
+    """
+    Two dedicated connections to one Redis node: `reader` has CLIENT TRACKING on and
+    redirects invalidation messages to `listener`, which is subscribed to them.
+    """
+
+    def __init__(self, name: str, reader: Redis, listener: Redis, channel):
+        self.name = name
+        self.reader = reader
+        self.listener = listener
+        self.channel = channel
+
+    @classmethod
+    async def connect(cls, name: str) -> 'TrackedNode':
+        listener = await aioredis.create_redis(address(name))
+        listener_id = await listener.execute(b'CLIENT', b'ID')
+        channel, = await listener.subscribe(INVALIDATE_CHANNEL)
+        reader = await aioredis.create_redis(address(name))
+        await reader.execute(b'CLIENT', b'TRACKING', b'ON', b'REDIRECT', listener_id)
+        return cls(name, reader, listener, channel)
+
+    def close(self):
+        self.reader.close()
+        self.listener.close()
+
+
+class ClientSideCache:
+    """
+    In-process cache of raw Redis values kept coherent by Redis server-assisted tracking.
+
+    Values are read through a tracking connection per node, so Redis remembers which keys this
+    worker holds and pushes an invalidation as soon as any client changes one of them; the local
+    copy is dropped right away. If the invalidation connection of a node breaks, its keys are
+    dropped and the node is bypassed until tracking is re-established.
+    """
+
+    def __init__(self, sharded: ShardedRedis, max_keys: int = config.CLIENT_CACHE_MAX_KEYS,
+                 report_interval: float = config.CLIENT_CACHE_REPORT_SECONDS):
+        self.sharded = sharded
+        self.max_keys = max_keys
+        self.report_interval = report_interval
+        self.values: OrderedDict[str, bytes] = OrderedDict()
+        self.tracked: dict[str, TrackedNode] = {}
+        self.fetching: dict[str, int] = {}
+        self.dirty: set[str] = set()
+        self.tasks = []
+        self.started = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.memory = 0
+
+    def start(self):
+        self.tasks = [asyncio.ensure_future(self._track(name)) for name in self.sharded.nodes]
+        self.tasks.append(asyncio.ensure_future(self._report()))
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info('Client side cache {0}'.format(self.snapshot()))
+
+    async def _track(self, name: str):
+        while True:
+            node = None
+            try:
+                node = await TrackedNode.connect(name)
+                self.tracked[name] = node
+                logger.info('Client side caching enabled for {0}'.format(name))
+                while await node.channel.wait_message():
+                    self.invalidate(await node.channel.get())
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Client side caching unavailable for {0}: {1!r}'.format(name, error))
+            finally:
+                self.tracked.pop(name, None)
+                self._drop_node(name)
+                if node is not None:
+                    node.close()
+            await asyncio.sleep(1)
+
+    def invalidate(self, keys: Optional[list]):
+        """A None message means the node was flushed. Entries of the shared table are dropped too."""
+        table = shared_memory.shared_table
+        if keys is None:
+            self.invalidations += len(self.values)
+            self._clear()
+            if table is not None:
+                table.clear()
+            return
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            self.invalidations += 1
+            if key in self.fetching:
+                self.dirty.add(key)
+            self._pop(key)
+            if table is not None:
+                table.delete(key)
+
+    def _pop(self, key: str):
+        value = self.values.pop(key, None)
+        if value is not None:
+            self.memory -= len(key) + len(value)
+
+    def _clear(self):
+        self.dirty.update(self.fetching)
+        self.values.clear()
+        self.memory = 0
+
+    def _drop_node(self, name: str):
+        for key in [key for key in self.values if self.sharded.node_for(key).name == name]:
+            self._pop(key)
+        self.dirty.update(key for key in self.fetching if self.sharded.node_for(key).name == name)
+
+    def _store(self, key: str, value: Optional[bytes]):
+        if value is None or key in self.dirty:
+            return
+        self._pop(key)
+        self.values[key] = value
+        self.memory += len(key) + len(value)
+        while len(self.values) > self.max_keys:
+            old_key, old_value = self.values.popitem(last=False)
+            self.memory -= len(old_key) + len(old_value)
+
+    def _local(self, key: str) -> Optional[bytes]:
+        value = self.values.get(key)
+        if value is not None:
+            self.values.move_to_end(key)
+        return value
+
+    async def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+        result = [self._local(key) for key in keys]
+        missing = [position for position, value in enumerate(result) if value is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        timing.tier('client', len(keys) - len(missing), len(missing))
+        if not missing:
+            return result
+
+        by_node: dict[str, list[int]] = {}
+        for position in missing:
+            by_node.setdefault(self.sharded.node_for(keys[position]).name, []).append(position)
+
+        async def fetch(name: str, positions: list[int]):
+            node_keys = [keys[position] for position in positions]
+            node = self.tracked.get(name)
+            if node is None:
+                values = await self.sharded.mget(*node_keys)
+                for position, value in zip(positions, values):
+                    result[position] = value
+                return
+            for key in node_keys:
+                self.fetching[key] = self.fetching.get(key, 0) + 1
+            try:
+                values = await node.reader.mget(*node_keys)
+                for position, key, value in zip(positions, node_keys, values):
+                    result[position] = value
+                    self._store(key, value)
+            finally:
+                for key in node_keys:
+                    self.fetching[key] -= 1
+                    if not self.fetching[key]:
+                        del self.fetching[key]
+                        self.dirty.discard(key)
+
+        await asyncio.gather(*(fetch(name, positions) for name, positions in by_node.items()))
+        return result
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value, = await self.mget([key])
+        return value
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'keys': len(self.values),
+            'memory_bytes': self.memory,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'invalidations_per_second': round(self.invalidations / (time.monotonic() - self.started), 3),
+            'tracked_nodes': sorted(self.tracked),
+        }
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+client_cache: Optional[ClientSideCache] = None
@@ -0,0 +1,87 @@
+import zlib
+from typing import Any, Optional
+
+import orjson
+
+from core import config
+from core.config import logger
+from models.models import model_encoder
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+CODEC_VERSION = 1
+
+FORMAT_JSON = 0
+FORMAT_JSON_ZLIB = 1
+FORMAT_JSON_LZ4 = 2
+FORMAT_NOT_FOUND = 3
+
+LEGACY_JSON_PREFIXES = (ord('{'), ord('['), ord('"'))
+
+
+class NotFound:
+    """Decoded negative cache entry: the object or page is known to be absent."""
+
+    def __repr__(self):
+        return 'NOT_FOUND'
+
+
+NOT_FOUND = NotFound()
+
+
+class CacheCodec:
+    """
+    Serializes cache entries as orjson payloads behind a one byte header.
+
+    The high nibble of the header is the codec version, the low nibble is the payload format.
+    Payloads larger than `compress_threshold` bytes are compressed with lz4 when it is
+    installed and with zlib otherwise. Negative entries are a bare header that decodes to NOT_FOUND.
+    Plain JSON written before the codec existed is still readable.
+    """
+
+    def __init__(self, compress_threshold: int = config.CACHE_COMPRESS_THRESHOLD,
+                 compression: str = config.CACHE_COMPRESSION):
+        self.compress_threshold = compress_threshold
+        if compression == 'lz4' and lz4_frame is None:
+            compression = 'zlib'
+        self.compression = compression
+
+    @staticmethod
+    def header(payload_format: int) -> bytes:
+        return bytes([CODEC_VERSION << 4 | payload_format])
+
+    def encode(self, value: Any) -> bytes:
+        payload = orjson.dumps(value, default=model_encoder)
+        if len(payload) < self.compress_threshold or self.compression == 'none':
+            return self.header(FORMAT_JSON) + payload
+        if self.compression == 'lz4':
+            return self.header(FORMAT_JSON_LZ4) + lz4_frame.compress(payload)
+        return self.header(FORMAT_JSON_ZLIB) + zlib.compress(payload, 1)
+
+    def encode_not_found(self) -> bytes:
+        return self.header(FORMAT_NOT_FOUND)
+
+    def decode(self, data: bytes) -> Optional[Any]:
+        if not data:
+            return None
+        header = data[0]
+        if header in LEGACY_JSON_PREFIXES:
+            return orjson.loads(data)
+        version, payload_format = header >> 4, header & 0x0F
+        if version != CODEC_VERSION:
+            logger.warning("Unknown cache codec version {0}".format(version))
+            return None
+        if payload_format == FORMAT_NOT_FOUND:
+            return NOT_FOUND
+        payload = memoryview(data)[1:]
+        if payload_format == FORMAT_JSON:
+            return orjson.loads(payload)
+        if payload_format == FORMAT_JSON_ZLIB:
+            return orjson.loads(zlib.decompress(payload))
+        if payload_format == FORMAT_JSON_LZ4 and lz4_frame is not None:
+            return orjson.loads(lz4_frame.decompress(payload))
+        logger.warning("Unsupported cache payload format {0}".format(payload_format))
+        return None
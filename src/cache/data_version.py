@@ -0,0 +1,48 @@
+import asyncio
+from typing import Optional
+
+from core import config
+from core.config import logger
+from db.sharded_redis import ShardedRedis
+
+VERSION_KEY = 'etl::version'
+
+
+class DataVersion:
+    """
+    Version of the indexed data: a Redis counter the ETL increments before it announces a run.
+    Read on ETL messages and every `poll_interval` seconds; None while the counter does not exist.
+    """
+
+    def __init__(self, redis: ShardedRedis, poll_interval: float = config.DATA_VERSION_POLL_SECONDS):
+        self.redis = redis
+        self.poll_interval = poll_interval
+        self.value: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        value = await self.redis.get(VERSION_KEY)
+        self.value = int(value) if value is not None else None
+
+    async def on_etl(self, indexes: list[str]):
+        await self.refresh()
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as error:
+                logger.warning('Data version unavailable: {0!r}'.format(error))
+                self.value = None
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._poll())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+
+data_version: Optional[DataVersion] = None
@@ -0,0 +1,57 @@
+import hashlib
+from typing import Any, Iterable, Optional
+from urllib.parse import quote
+
+MAX_KEY_LENGTH = 96
+DIGEST_SIZE = 16
+
+PAGINATION_DEFAULTS = {'page': 1, 'page_size': 50}
+
+
+def normalize_value(value: Any, text: bool = False) -> Optional[str]:
+    """Empty values become None, search text is trimmed, whitespace-collapsed and case-folded."""
+    if value is None:
+        return None
+    value = str(value)
+    if text:
+        value = ' '.join(value.split()).casefold()
+    else:
+        value = value.strip()
+    return value or None
+
+
+def canonical_params(params: dict, defaults: Optional[dict] = None, text_fields: Iterable[str] = ()) -> dict:
+    """Normalized parameters sorted by name, without empty values and values equal to their defaults."""
+    defaults = defaults or {}
+    text_fields = set(text_fields)
+    result = {}
+    for name in sorted(params):
+        value = normalize_value(params[name], text=name in text_fields)
+        if value is None or value == normalize_value(defaults.get(name), text=name in text_fields):
+            continue
+        result[name] = value
+    return result
+
+
+def build_key(prefix: str, params: dict, defaults: Optional[dict] = None, text_fields: Iterable[str] = ()) -> str:
+    """
+    Canonical cache key: `prefix::name=value::...` over canonical parameters. Names and values
+    are percent-encoded, so no value can forge the `::` and `=` separators of another key.
+    Keys longer than MAX_KEY_LENGTH are replaced by `prefix::h::<digest>`.
+    """
+    parts = ['{0}={1}'.format(quote(name, safe=''), quote(value, safe=''))
+             for name, value in canonical_params(params, defaults, text_fields).items()]
+    key = '::'.join([prefix, *parts])
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    digest = hashlib.blake2b(key.encode(), digest_size=DIGEST_SIZE).hexdigest()
+    return '{0}::h::{1}'.format(prefix, digest)
+
+
+def entity_key(index: str, object_id: str) -> str:
+    return '{0}::guid::{1}'.format(index, object_id)
+
+
+def is_entity_key(key: str) -> bool:
+    parts = key.split('::')
+    return len(parts) == 3 and parts[1] == 'guid'
@@ -1,48 +1,193 @@
-import json
-from typing import List, Optional, Union
-
-from aioredis import Redis
-from pydantic import parse_raw_as
-from pydantic.json import pydantic_encoder
+from contextvars import ContextVar
+from typing import Optional, Union
 
+from cache import client_side, shared_memory, writer
 from cache.basic_cache import AsyncCacheStorage
+from cache.codec import NOT_FOUND, CacheCodec
+from cache.keys import is_entity_key
+from cache.stats import cache_stats
+from core import config, timing
 from core.config import logger
+from db.sharded_redis import ShardedRedis
 from models.models import Film, FilmById, Genre, Person
 
 CACHE_EXPIRE_IN_SECONDS = 60 * 5
+NEGATIVE_CACHE_EXPIRE_IN_SECONDS = 30
+
+# Set once a request is answered from stale copies, so that the response is not tagged as current data.
+served_stale: ContextVar[bool] = ContextVar('served_stale', default=False)
+
+
+def negative_keys_key(index: str) -> str:
+    """Set of negative listing keys of the index, the ETL deletes them when the index changes."""
+    return '{0}::negative'.format(index)
+
+
+def stale_key(redis_key: str) -> str:
+    """Long-lived copy of a positive entry, read only while the storage is unavailable."""
+    return 'stale::{0}'.format(redis_key)
+
+
+def is_id_list(data) -> bool:
+    """Entries written by older releases under id list keys may hold whole objects: they count as misses."""
+    return isinstance(data, list) and all(isinstance(item, str) for item in data)
 
 
 class RedisService(AsyncCacheStorage):
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: ShardedRedis, codec: Optional[CacheCodec] = None):
         self.redis = redis
+        self.codec = codec or CacheCodec()
 
     async def get(self, key, **kwargs):
-        return self.redis.get(key)
+        return self.codec.decode((await self.mget_raw([key]))[0])
+
+    async def mget_raw(self, keys: list[str]) -> list[Optional[bytes]]:
+        """
+        Entities are read through the table shared by the workers of the host, everything
+        else and its misses through the in-process client side cache when they are enabled.
+        """
+        table = shared_memory.shared_table
+        if table is None:
+            return await self.mget_remote(keys)
+        result = [table.get(key) if is_entity_key(key) else None for key in keys]
+        missing = [position for position, value in enumerate(result) if value is None]
+        timing.tier('shared', hits=len(keys) - len(missing),
+                    misses=sum(is_entity_key(keys[position]) for position in missing))
+        if missing:
+            # Invalidations that arrive while the values are fetched make the table drop them.
+            stamp = table.stamp
+            values = await self.mget_remote([keys[position] for position in missing])
+            for position, value in zip(missing, values):
+                result[position] = value
+                if value is not None and is_entity_key(keys[position]):
+                    table.put(keys[position], value, stamp)
+        return result
+
+    async def mget_remote(self, keys: list[str]) -> list[Optional[bytes]]:
+        with timing.measure('redis'):
+            if client_side.client_cache is not None:
+                return await client_side.client_cache.mget(keys)
+            return await self.redis.mget(*keys)
+
+    async def set(self, key: str, value, expire: int, **kwargs):
+        return await self.redis.set(key, self.codec.encode(value), expire=expire)
 
-    async def set(self, key: str, value: str, expire: int, **kwargs):
-        return self.redis.set(key, value, expire=expire)
+    async def write(self, commands: list[writer.Command]):
+        """
+        Hands the commands to the background writer when it runs, so that callers
+        do not wait for Redis; otherwise sends them in one pipeline right away.
+        """
+        if writer.writer is not None:
+            writer.writer.put(commands)
+            return
+        pipe = self.redis.pipeline()
+        for name, args, kwargs in commands:
+            getattr(pipe, name)(*args, **kwargs)
+        await pipe.execute()
+
+    # Entries are written from validated models, so they are read back with `construct`
+    # instead of being validated again.
 
     async def object_from_cache(self, index: str, model, redis_key) -> Optional[Union[Film, FilmById, Genre, Person]]:
-        data = await self.redis.get(redis_key)
-        logger.info("{0} from cache {1}".format(index, data))
+        data = await self.get(redis_key)
+        logger.info("{0} from cache {1}".format(index, redis_key))
         if not data:
+            cache_stats.record(misses=1)
             return None
-        result = model.parse_raw(data)
+        cache_stats.record(hits=1)
+        if data is NOT_FOUND:
+            return NOT_FOUND
+        with timing.measure('model'):
+            result = model.construct(**data)
         return result
 
-    async def all_objects_from_cache(self, model, redis_key):
-        data = await self.redis.get(redis_key)
-        logger.info("Data from cache {0}".format(data))
-        if not data:
+    async def objects_from_cache(self, model, redis_keys: list[str]) -> list[Optional[Union[FilmById, Genre, Person]]]:
+        """Reads entities with one MGET, missing entries are None, negative entries NOT_FOUND."""
+        if not redis_keys:
+            return []
+        values = await self.mget_raw(redis_keys)
+        result = []
+        with timing.measure('model'):
+            for value in values:
+                data = self.codec.decode(value)
+                if data is NOT_FOUND:
+                    result.append(NOT_FOUND)
+                else:
+                    result.append(model.construct(**data) if data else None)
+        misses = result.count(None)
+        cache_stats.record(hits=len(result) - misses, misses=misses)
+        logger.info("{0} of {1} objects from cache".format(len(result) - misses, len(redis_keys)))
+        return result
+
+    async def ids_from_cache(self, redis_key) -> Optional[list[str]]:
+        data = await self.get(redis_key)
+        logger.info("Ids from cache {0}".format(redis_key))
+        if not data or data is not NOT_FOUND and not is_id_list(data):
+            cache_stats.record(misses=1)
             return None
-        obj = parse_raw_as(List[model], data)
-        return obj
+        cache_stats.record(hits=1)
+        return data
+
+    async def stale_objects(self, model, redis_keys: list[str]) -> list[Optional[Union[FilmById, Genre, Person]]]:
+        """Last known values of the entries, kept after they expire."""
+        if not redis_keys:
+            return []
+        with timing.measure('redis'):
+            values = await self.redis.mget(*[stale_key(redis_key) for redis_key in redis_keys])
+        result = []
+        for value in values:
+            data = self.codec.decode(value)
+            result.append(model.construct(**data) if data and data is not NOT_FOUND else None)
+        if result.count(None) < len(result):
+            served_stale.set(True)
+        logger.info("{0} of {1} stale objects from cache".format(len(result) - result.count(None), len(redis_keys)))
+        return result
+
+    async def stale_ids(self, redis_key) -> Optional[list[str]]:
+        with timing.measure('redis'):
+            data = self.codec.decode(await self.redis.get(stale_key(redis_key)))
+        if not data or data is NOT_FOUND or not is_id_list(data):
+            return None
+        served_stale.set(True)
+        return data
+
+    @staticmethod
+    def set_commands(redis_key: str, value: bytes) -> list[writer.Command]:
+        """
+        The entry and its stale copy. Entities keep stale copies for a day; id lists of listings
+        and searches, which are many and mostly requested once, only briefly.
+        """
+        commands = [('set', (redis_key, value), {'expire': CACHE_EXPIRE_IN_SECONDS})]
+        stale_expire = (config.STALE_CACHE_EXPIRE_IN_SECONDS if is_entity_key(redis_key)
+                        else config.STALE_LIST_CACHE_EXPIRE_IN_SECONDS)
+        if stale_expire > 0:
+            commands.append(('set', (stale_key(redis_key), value), {'expire': stale_expire}))
+        return commands
 
     async def put_object_to_cache(self, object_, index, redis_key):
-        logger.info("Put {2} to cache {0} {1}".format(object_.id, object_.json(), index))
-        await self.redis.set(redis_key, object_.json(), expire=CACHE_EXPIRE_IN_SECONDS)
+        logger.info("Put {1} to cache {0}".format(object_.id, index))
+        await self.write(self.set_commands(redis_key, self.codec.encode(object_)))
+
+    async def put_objects_to_cache(self, index, objects, redis_keys: list[str]):
+        """Writes entities under their own keys in one pipeline."""
+        if not objects:
+            return
+        logger.info('Put {0} {1} objects to cache'.format(len(objects), index))
+        await self.write([command for object_, redis_key in zip(objects, redis_keys)
+                          for command in self.set_commands(redis_key, self.codec.encode(object_))])
+
+    async def put_ids_to_cache(self, index, ids: list[str], redis_key):
+        logger.info('{1}::{0} : {2} ids'.format(redis_key, index, len(ids)))
+        await self.write(self.set_commands(redis_key, self.codec.encode(ids)))
 
-    async def put_objects_to_cache(self, index, objects, redis_key):
-        logger.info('{2}::{0} : values::{1}'.format(redis_key, json.dumps(objects, default=pydantic_encoder), index))
-        await self.redis.set(redis_key, json.dumps(objects, default=pydantic_encoder),
-                             expire=CACHE_EXPIRE_IN_SECONDS)
+    async def put_not_found_to_cache(self, index, redis_key, listing: bool = False):
+        """
+        Remembers for a short time that an object or a page does not exist.
+        Listing keys are also registered in the index set of negative keys for the ETL.
+        """
+        logger.info('{0}::{1} : not found'.format(index, redis_key))
+        commands = [('set', (redis_key, self.codec.encode_not_found()), {'expire': NEGATIVE_CACHE_EXPIRE_IN_SECONDS})]
+        if listing:
+            commands.append(('sadd', (negative_keys_key(index), redis_key), {}))
+            commands.append(('expire', (negative_keys_key(index), NEGATIVE_CACHE_EXPIRE_IN_SECONDS), {}))
+        await self.write(commands)
@@ -0,0 +1,236 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Optional
+
+from core import config
+from core.config import logger
+
+MAGIC = b'AAPISHM2'
+# magic, slots, slot size, ways, generation, invalidations
+HEADER = struct.Struct('<8sIIIII')
+HEADER_SIZE = 64
+GENERATION_OFFSET = 20
+INVALIDATIONS_OFFSET = 24
+STAMP = struct.Struct('<II')
+# sequence, generation, key hash, expires at, key length, value length
+SLOT = struct.Struct('<IIQdHI')
+SLOT_HEADER_SIZE = 32
+SEQUENCE = struct.Struct('<I')
+READ_ATTEMPTS = 3
+
+
+def key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class SharedTable:
+    """
+    Hash table of raw cache values in a memory-mapped file shared by the workers of a host.
+
+    The file is a header and fixed-size slots grouped into buckets of `ways` slots; a key
+    lives in one of the slots of its bucket, and when they are all taken by live entries
+    the one closest to expiry is evicted (counted as a collision). Writers hold an fcntl
+    lock on the byte range of the bucket. Readers take no lock: every slot has a sequence
+    number that writers make odd while they change the slot, and a read that saw an odd or
+    changed sequence is a miss. Incrementing the generation in the header empties the
+    table at once. Every delete increments the invalidation count in the header, and a
+    put given the stamp taken before its value was fetched is dropped when either number
+    changed meanwhile, so a value read before an invalidation is not stored after it.
+    Counters other than occupancy are per worker.
+    """
+
+    def __init__(self, fd: int, memory: mmap.mmap, slots: int, slot_size: int, ways: int,
+                 ttl: float = config.SHARED_CACHE_TTL_SECONDS):
+        self.fd = fd
+        self.memory = memory
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = ways
+        self.buckets = slots // ways
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.collisions = 0
+        self.too_large = 0
+        self.torn_reads = 0
+        self.stale_puts = 0
+
+    @classmethod
+    def open(cls, path: str = config.SHARED_CACHE_PATH, slots: int = config.SHARED_CACHE_SLOTS,
+             slot_size: int = config.SHARED_CACHE_SLOT_BYTES, ways: int = config.SHARED_CACHE_WAYS,
+             ttl: float = config.SHARED_CACHE_TTL_SECONDS) -> 'SharedTable':
+        """Opens the table file, creating or resetting it when it does not match the parameters."""
+        slots -= slots % ways
+        size = HEADER_SIZE + slots * slot_size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+            try:
+                header = os.pread(fd, HEADER.size, 0)
+                expected = (MAGIC, slots, slot_size, ways)
+                if os.fstat(fd).st_size != size or len(header) < HEADER.size \
+                        or HEADER.unpack(header)[:4] != expected:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, HEADER.pack(*expected, 0, 0), 0)
+                    logger.info('Shared cache {0} created: {1} slots of {2} bytes'.format(path, slots, slot_size))
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+            memory = mmap.mmap(fd, size)
+        except Exception:
+            os.close(fd)
+            raise
+        return cls(fd, memory, slots, slot_size, ways, ttl)
+
+    def close(self):
+        self.memory.close()
+        os.close(self.fd)
+
+    @property
+    def generation(self) -> int:
+        return SEQUENCE.unpack_from(self.memory, GENERATION_OFFSET)[0]
+
+    @property
+    def stamp(self) -> tuple[int, int]:
+        """Generation and invalidation count, taken before fetching a value to `put`."""
+        return STAMP.unpack_from(self.memory, GENERATION_OFFSET)
+
+    def _offsets(self, hashed: int) -> range:
+        start = HEADER_SIZE + hashed % self.buckets * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    def _read(self, offset: int, key: bytes, hashed: int, generation: int, now: float) -> Optional[bytes]:
+        for _ in range(READ_ATTEMPTS):
+            sequence, slot_generation, slot_hash, expires, key_length, value_length = SLOT.unpack_from(
+                self.memory, offset)
+            if sequence & 1:
+                continue
+            if slot_hash != hashed or slot_generation != generation or expires <= now or key_length != len(key):
+                return None
+            start = offset + SLOT_HEADER_SIZE
+            data = self.memory[start:start + key_length + value_length]
+            if SEQUENCE.unpack_from(self.memory, offset)[0] != sequence:
+                continue
+            return data[key_length:] if data[:key_length] == key else None
+        self.torn_reads += 1
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode()
+        hashed = key_hash(encoded)
+        generation, now = self.generation, time.time()
+        for offset in self._offsets(hashed):
+            value = self._read(offset, encoded, hashed, generation, now)
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def _write(self, offset: int, fields: tuple, data: bytes = b''):
+        sequence = SEQUENCE.unpack_from(self.memory, offset)[0]
+        # An odd sequence is left by a writer that died mid-write; the bucket lock is ours now.
+        sequence += 1 if sequence % 2 == 0 else 0
+        SEQUENCE.pack_into(self.memory, offset, sequence)
+        SLOT.pack_into(self.memory, offset, sequence, *fields)
+        self.memory[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + len(data)] = data
+        SEQUENCE.pack_into(self.memory, offset, (sequence + 1) & 0xFFFFFFFF)
+
+    def put(self, key: str, value: bytes, stamp: Optional[tuple[int, int]] = None):
+        encoded = key.encode()
+        if SLOT_HEADER_SIZE + len(encoded) + len(value) > self.slot_size:
+            self.too_large += 1
+            return
+        hashed = key_hash(encoded)
+        offsets = self._offsets(hashed)
+        generation, now = self.generation, time.time()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, len(offsets) * self.slot_size, offsets[0])
+        try:
+            # Deletes count before they take the bucket lock, so a delete that missed this
+            # value is seen here.
+            if stamp is not None and self.stamp != stamp:
+                self.stale_puts += 1
+                return
+            target, victim, earliest = None, None, None
+            for offset in offsets:
+                _, slot_generation, slot_hash, expires, key_length, _ = SLOT.unpack_from(self.memory, offset)
+                live = key_length and slot_generation == generation and expires > now
+                if live and slot_hash == hashed:
+                    target = offset
+                    break
+                if not live and target is None:
+                    target = offset
+                elif live and (earliest is None or expires < earliest):
+                    victim, earliest = offset, expires
+            if target is None:
+                target = victim
+                self.collisions += 1
+            self._write(target, (generation, hashed, now + self.ttl, len(encoded), len(value)), encoded + value)
+            self.writes += 1
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, len(offsets) * self.slot_size, offsets[0])
+
+    def delete(self, key: str):
+        encoded = key.encode()
+        hashed = key_hash(encoded)
+        offsets = self._offsets(hashed)
+        self._increment(INVALIDATIONS_OFFSET)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, len(offsets) * self.slot_size, offsets[0])
+        try:
+            for offset in offsets:
+                if SLOT.unpack_from(self.memory, offset)[2] == hashed:
+                    self._write(offset, (0, 0, 0.0, 0, 0))
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, len(offsets) * self.slot_size, offsets[0])
+
+    def _increment(self, offset: int):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            SEQUENCE.pack_into(self.memory, offset, (SEQUENCE.unpack_from(self.memory, offset)[0] + 1) & 0xFFFFFFFF)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+
+    def clear(self):
+        self._increment(GENERATION_OFFSET)
+
+    async def on_etl(self, indexes: list[str]):
+        self.clear()
+
+    def occupancy(self) -> dict:
+        """Walks every slot, so it is for benchmarks and debugging rather than health probes."""
+        generation, now = self.generation, time.time()
+        live_per_bucket = [0] * (self.ways + 1)
+        live = 0
+        for bucket in range(self.buckets):
+            count = 0
+            for offset in self._offsets(bucket):
+                _, slot_generation, _, expires, key_length, _ = SLOT.unpack_from(self.memory, offset)
+                count += bool(key_length and slot_generation == generation and expires > now)
+            live_per_bucket[count] += 1
+            live += count
+        return {
+            'live': live,
+            'occupancy': round(live / self.slots, 4),
+            'full_buckets': live_per_bucket[-1],
+        }
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'slots': self.slots,
+            'slot_bytes': self.slot_size,
+            'generation': self.generation,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'writes': self.writes,
+            'collisions': self.collisions,
+            'too_large': self.too_large,
+            'torn_reads': self.torn_reads,
+            'stale_puts': self.stale_puts,
+        }
+
+shared_table: Optional[SharedTable] = None
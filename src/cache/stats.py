@@ -0,0 +1,25 @@
+from core import timing
+
+
+class CacheStats:
+    """Per-worker cache hit and miss counters."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int = 0, misses: int = 0):
+        self.hits += hits
+        self.misses += misses
+        timing.tier('cache', hits, misses)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': round(self.hit_rate, 4)}
+
+
+cache_stats = CacheStats()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Optional
+
+from core import config
+from core.config import logger
+from db.sharded_redis import ShardedRedis
+
+Command = tuple[str, tuple, dict]
+
+
+class CacheWriter:
+    """
+    Per-worker write-behind queue for cache writes.
+
+    Each queued item is a list of Redis commands `(method, args, kwargs)` that belong together.
+    A background task collects items for `flush_interval_ms` or up to `batch_size` items and sends
+    them in one pipeline. When the queue is full new items are dropped: a lost cache write only
+    costs a later miss. `stop` writes out everything that is already queued.
+    """
+
+    def __init__(self, redis: ShardedRedis, max_queue: int = config.CACHE_WRITE_QUEUE_SIZE,
+                 batch_size: int = config.CACHE_WRITE_BATCH_SIZE,
+                 flush_interval_ms: float = config.CACHE_WRITE_FLUSH_MS):
+        self.redis = redis
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.stopping = False
+        self.task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def put(self, commands: list[Command]) -> bool:
+        try:
+            self.queue.put_nowait(commands)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _next_batch(self) -> list[list[Command]]:
+        batch = [await self.queue.get()]
+        if not self.stopping and self.queue.qsize() < self.batch_size - 1:
+            await asyncio.sleep(self.flush_interval)
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return [item for item in batch if item is not None]
+
+    async def _write(self, batch: list[list[Command]]):
+        pipe = self.redis.pipeline()
+        for commands in batch:
+            for name, args, kwargs in commands:
+                getattr(pipe, name)(*args, **kwargs)
+        try:
+            await pipe.execute()
+            self.written += len(batch)
+        except Exception as error:
+            self.failed += len(batch)
+            logger.warning('Cache write of {0} entries failed: {1!r}'.format(len(batch), error))
+
+    async def _run(self):
+        while not (self.stopping and self.queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self, timeout: float = config.CACHE_WRITE_DRAIN_SECONDS):
+        self.stopping = True
+        await self.queue.put(None)
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Cache writer did not drain in {0}s, {1} entries lost'.format(timeout, self.queue.qsize()))
+        logger.info('Cache writer stopped: written {0}, dropped {1}, failed {2}'.format(self.written, self.dropped,
+                                                                                        self.failed))
+
+    def snapshot(self) -> dict:
+        return {'queued': self.queue.qsize(), 'written': self.written, 'dropped': self.dropped, 'failed': self.failed}
+
+
+writer: Optional[CacheWriter] = None
@@ -13,8 +13,109 @@ PROJECT_NAME = os.getenv('FasterAPI', 'Movies Service')
 
 REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+# Comma separated cache nodes, each `primary_host:port` optionally followed by `|replica_host:port`.
+REDIS_NODES = os.getenv('REDIS_NODES', '{0}:{1}'.format(REDIS_HOST, REDIS_PORT))
+REDIS_READ_FROM_REPLICAS = os.getenv('REDIS_READ_FROM_REPLICAS', 'false').lower() == 'true'
 
 ELASTIC_HOST = os.getenv('ELASTIC_HOST', '127.0.0.1')
 ELASTIC_PORT = int(os.getenv('ELASTIC_PORT', 9200))
 
+# `elastic` or `memory`: documents from the `<index>.ndjson` files in MEMORY_STORAGE_PATH.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'elastic')
+MEMORY_STORAGE_PATH = os.getenv('MEMORY_STORAGE_PATH', '')
+
+CACHE_COMPRESS_THRESHOLD = int(os.getenv('CACHE_COMPRESS_THRESHOLD', 4096))
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'lz4')
+
+WARM_TOP_N = int(os.getenv('WARM_TOP_N', 200))
+WARM_CONCURRENCY = int(os.getenv('WARM_CONCURRENCY', 8))
+WARM_TRACK_FLUSH_SECONDS = float(os.getenv('WARM_TRACK_FLUSH_SECONDS', 10))
+WARM_MAX_TRACKED_KEYS = int(os.getenv('WARM_MAX_TRACKED_KEYS', 10000))
+
+LISTING_ADMISSION_LIMIT = int(os.getenv('LISTING_ADMISSION_LIMIT', 20))
+
+CACHE_WRITE_QUEUE_SIZE = int(os.getenv('CACHE_WRITE_QUEUE_SIZE', 10000))
+CACHE_WRITE_BATCH_SIZE = int(os.getenv('CACHE_WRITE_BATCH_SIZE', 100))
+CACHE_WRITE_FLUSH_MS = float(os.getenv('CACHE_WRITE_FLUSH_MS', 5))
+CACHE_WRITE_DRAIN_SECONDS = float(os.getenv('CACHE_WRITE_DRAIN_SECONDS', 5))
+
+ES_GET_TIMEOUT_MS = float(os.getenv('ES_GET_TIMEOUT_MS', 500))
+ES_SEARCH_TIMEOUT_MS = float(os.getenv('ES_SEARCH_TIMEOUT_MS', 2000))
+ES_HEDGE_MIN_DELAY_MS = float(os.getenv('ES_HEDGE_MIN_DELAY_MS', 10))
+ES_HEDGE_BUDGET = float(os.getenv('ES_HEDGE_BUDGET', 0.1))
+ES_BREAKER_WINDOW = int(os.getenv('ES_BREAKER_WINDOW', 100))
+ES_BREAKER_MIN_CALLS = int(os.getenv('ES_BREAKER_MIN_CALLS', 20))
+ES_BREAKER_FAILURE_RATIO = float(os.getenv('ES_BREAKER_FAILURE_RATIO', 0.5))
+ES_BREAKER_SLOW_RATIO = float(os.getenv('ES_BREAKER_SLOW_RATIO', 0.8))
+ES_BREAKER_SLOW_MS = float(os.getenv('ES_BREAKER_SLOW_MS', 1000))
+ES_BREAKER_OPEN_SECONDS = float(os.getenv('ES_BREAKER_OPEN_SECONDS', 5))
+# Searches over SLOW_QUERY_MS are logged; profiling is switched on by admins through /admin/slow-queries.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_KEPT = int(os.getenv('SLOW_QUERY_KEPT', 100))
+SLOW_QUERY_POLL_SECONDS = float(os.getenv('SLOW_QUERY_POLL_SECONDS', 5))
+SLOW_QUERY_PROFILE_TIMEOUT_SECONDS = float(os.getenv('SLOW_QUERY_PROFILE_TIMEOUT_SECONDS', 10))
+SLOW_QUERY_PROFILE_TTL_SECONDS = int(os.getenv('SLOW_QUERY_PROFILE_TTL_SECONDS', 60 * 60 * 24))
+SLOW_QUERY_PROFILES_KEPT = int(os.getenv('SLOW_QUERY_PROFILES_KEPT', 50))
+# Admin endpoints answer 404 while no token is set.
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+STALE_CACHE_EXPIRE_IN_SECONDS = int(os.getenv('STALE_CACHE_EXPIRE_IN_SECONDS', 60 * 60 * 24))
+# Stale copies of listing and search id lists; 0 turns them off.
+STALE_LIST_CACHE_EXPIRE_IN_SECONDS = int(os.getenv('STALE_LIST_CACHE_EXPIRE_IN_SECONDS', 60 * 10))
+
+CONCURRENCY_INITIAL_LIMIT = float(os.getenv('CONCURRENCY_INITIAL_LIMIT', 20))
+CONCURRENCY_MIN_LIMIT = float(os.getenv('CONCURRENCY_MIN_LIMIT', 4))
+CONCURRENCY_MAX_LIMIT = float(os.getenv('CONCURRENCY_MAX_LIMIT', 200))
+CONCURRENCY_BACKOFF = float(os.getenv('CONCURRENCY_BACKOFF', 0.9))
+CONCURRENCY_BACKOFF_INTERVAL_MS = float(os.getenv('CONCURRENCY_BACKOFF_INTERVAL_MS', 100))
+CONCURRENCY_LATENCY_TOLERANCE = float(os.getenv('CONCURRENCY_LATENCY_TOLERANCE', 2.0))
+CONCURRENCY_MIN_LATENCY_MS = float(os.getenv('CONCURRENCY_MIN_LATENCY_MS', 50))
+CONCURRENCY_LATENCY_WINDOW = int(os.getenv('CONCURRENCY_LATENCY_WINDOW', 200))
+CONCURRENCY_LISTING_SHARE = float(os.getenv('CONCURRENCY_LISTING_SHARE', 0.8))
+CONCURRENCY_SEARCH_SHARE = float(os.getenv('CONCURRENCY_SEARCH_SHARE', 0.6))
+
+# Requests per seconds for each client, `count/seconds`.
+RATE_LIMIT_LOOKUP = os.getenv('RATE_LIMIT_LOOKUP', '200/1')
+RATE_LIMIT_LISTING = os.getenv('RATE_LIMIT_LISTING', '50/1')
+RATE_LIMIT_SEARCH = os.getenv('RATE_LIMIT_SEARCH', '10/1')
+RATE_LIMIT_EXPORT = os.getenv('RATE_LIMIT_EXPORT', '5/60')
+RATE_LIMIT_REDIS_TIMEOUT_MS = float(os.getenv('RATE_LIMIT_REDIS_TIMEOUT_MS', 50))
+RATE_LIMIT_FALLBACK_SECONDS = float(os.getenv('RATE_LIMIT_FALLBACK_SECONDS', 5))
+# Only behind a proxy that appends the client address (nginx in docker-compose).
+RATE_LIMIT_TRUST_FORWARDED = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+# API keys with buckets of their own, comma-separated; requests with other keys are limited by address.
+RATE_LIMIT_API_KEYS = frozenset(key.strip() for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key.strip())
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
+
+WARMUP_ES_CONNECTIONS = int(os.getenv('WARMUP_ES_CONNECTIONS', 4))
+WARMUP_TIMEOUT_SECONDS = float(os.getenv('WARMUP_TIMEOUT_SECONDS', 5))
+WARMUP_RETRY_SECONDS = float(os.getenv('WARMUP_RETRY_SECONDS', 5))
+
+GENRE_CATALOGUE_ENABLED = os.getenv('GENRE_CATALOGUE_ENABLED', 'true').lower() == 'true'
+GENRE_CATALOGUE_REFRESH_SECONDS = float(os.getenv('GENRE_CATALOGUE_REFRESH_SECONDS', 300))
+
+# Entities shared by the workers of a host through a memory-mapped file, see cache/shared_memory.py.
+SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', 'true').lower() == 'true'
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', '/dev/shm/async-api-cache')
+SHARED_CACHE_SLOTS = int(os.getenv('SHARED_CACHE_SLOTS', 8192))
+SHARED_CACHE_SLOT_BYTES = int(os.getenv('SHARED_CACHE_SLOT_BYTES', 4096))
+SHARED_CACHE_WAYS = int(os.getenv('SHARED_CACHE_WAYS', 4))
+SHARED_CACHE_TTL_SECONDS = float(os.getenv('SHARED_CACHE_TTL_SECONDS', 10))
+
+# Directory of the document snapshots published by the ETL, empty to read ids from the cache and storage only.
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+SNAPSHOT_POLL_SECONDS = float(os.getenv('SNAPSHOT_POLL_SECONDS', 5))
+SNAPSHOT_MMAP_BYTES = int(os.getenv('SNAPSHOT_MMAP_BYTES', 256 * 1024 * 1024))
+
+# Share of API requests with a Server-Timing header and a JSON access log record.
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', 0.01))
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+
+# How often workers re-read the ETL data version used in ETags, besides ETL messages.
+DATA_VERSION_POLL_SECONDS = float(os.getenv('DATA_VERSION_POLL_SECONDS', 5))
+
+CLIENT_CACHE_ENABLED = os.getenv('CLIENT_CACHE_ENABLED', 'true').lower() == 'true'
+CLIENT_CACHE_MAX_KEYS = int(os.getenv('CLIENT_CACHE_MAX_KEYS', 10000))
+CLIENT_CACHE_REPORT_SECONDS = float(os.getenv('CLIENT_CACHE_REPORT_SECONDS', 60))
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
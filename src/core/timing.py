@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Tiers that report hits and misses, in the order they are consulted.
+TIERS = ('catalogue', 'snapshot', 'shared', 'client', 'cache')
+
+
+class Timings:
+    """Time spent per component and hits and misses per cache tier within one sampled request."""
+
+    __slots__ = ('started', 'spent', 'calls', 'hits', 'misses')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spent: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    def add(self, name: str, seconds: float):
+        self.spent[name] = self.spent.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def tier(self, name: str, hits: int = 0, misses: int = 0):
+        if hits:
+            self.hits[name] = self.hits.get(name, 0) + hits
+        if misses:
+            self.misses[name] = self.misses.get(name, 0) + misses
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Value of the Server-Timing header."""
+        metrics = ['{0};dur={1:.3f};desc="{2} calls"'.format(name, seconds * 1000, self.calls[name])
+                   for name, seconds in self.spent.items()]
+        for name in TIERS:
+            if name in self.hits or name in self.misses:
+                metrics.append('{0};desc="{1} hit, {2} miss"'.format(name, self.hits.get(name, 0),
+                                                                     self.misses.get(name, 0)))
+        metrics.append('total;dur={0:.3f}'.format(self.elapsed() * 1000))
+        return ', '.join(metrics)
+
+    def record(self) -> dict:
+        return {
+            'total_ms': round(self.elapsed() * 1000, 3),
+            'spent_ms': {name: round(seconds * 1000, 3) for name, seconds in self.spent.items()},
+            'calls': self.calls,
+            'tiers': {name: {'hits': self.hits.get(name, 0), 'misses': self.misses.get(name, 0)}
+                      for name in TIERS if name in self.hits or name in self.misses},
+        }
+
+
+# Set only for sampled requests; everything below is a no-op otherwise.
+current: ContextVar[Optional[Timings]] = ContextVar('timings', default=None)
+
+
+@contextmanager
+def measure(name: str):
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def tier(name: str, hits: int = 0, misses: int = 0):
+    timings = current.get()
+    if timings is not None:
+        timings.tier(name, hits, misses)
@@ -1,9 +1,9 @@
 from typing import Optional
 
-from aioredis import Redis
+from db.sharded_redis import ShardedRedis
 
-redis: Optional[Redis] = None
+redis: Optional[ShardedRedis] = None
 
 
-async def get_redis() -> Redis:
+async def get_redis() -> ShardedRedis:
     return redis
@@ -0,0 +1,286 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import time
+from collections import defaultdict
+
+import aioredis
+from aioredis import Redis
+
+from core.config import logger
+
+READ_COMMANDS = {'get', 'exists', 'ttl', 'zrange', 'zrevrange', 'hmget', 'smembers'}
+WRITE_COMMANDS = {'set', 'expire', 'sadd', 'zadd', 'zincrby', 'zrem', 'zremrangebyrank', 'zremrangebyscore',
+                  'zunionstore', 'hset', 'hdel'}
+
+
+class HashRing:
+    """Consistent hashing ring with virtual nodes: adding or removing a node remaps ~1/N of the keys."""
+
+    def __init__(self, nodes: list[str], vnodes: int = 160):
+        self.vnodes = vnodes
+        self.points: list[int] = []
+        self.owners: dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def add(self, node: str):
+        for replica in range(self.vnodes):
+            point = self.hash('{0}#{1}'.format(node, replica))
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+            self.owners[point] = node
+
+    def remove(self, node: str):
+        for replica in range(self.vnodes):
+            point = self.hash('{0}#{1}'.format(node, replica))
+            if self.owners.get(point) == node:
+                del self.owners[point]
+                self.points.remove(point)
+
+    def get(self, key: str) -> str:
+        position = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+        return self.owners[self.points[position]]
+
+
+class NodeStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, error: bool = False, hits: int = 0, misses: int = 0):
+        self.calls += 1
+        self.errors += error
+        self.hits += hits
+        self.misses += misses
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'avg_ms': round(self.seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 3),
+        }
+
+
+class RedisNode:
+    def __init__(self, name: str, primary: Redis, replicas: list[Redis]):
+        self.name = name
+        self.primary = primary
+        self.replicas = replicas
+        self.stats = NodeStats()
+        self._replica_cycle = itertools.cycle(replicas) if replicas else None
+
+    def reader(self, from_replicas: bool) -> Redis:
+        if from_replicas and self._replica_cycle is not None:
+            return next(self._replica_cycle)
+        return self.primary
+
+    def connections(self) -> list[Redis]:
+        return [self.primary, *self.replicas]
+
+
+def parse_nodes(spec: str) -> list[tuple[str, list[str]]]:
+    """`primary|replica,primary2` -> [('primary', ['replica']), ('primary2', [])]"""
+    nodes = []
+    for item in spec.split(','):
+        addresses = [address.strip() for address in item.split('|') if address.strip()]
+        if addresses:
+            nodes.append((addresses[0], addresses[1:]))
+    return nodes
+
+
+def address(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(':')
+    return host, int(port)
+
+
+class ShardedRedis:
+    """
+    Spreads keys over several Redis nodes with a consistent hashing ring.
+
+    Exposes the subset of the aioredis API the cache layer uses. Writes and pipelines go to
+    the primary of the key's node, single-key reads to its replicas when `read_from_replicas`
+    is on (falling back to the primary on errors). The first node is the control node that
+    carries pub/sub channels.
+    """
+
+    SET_IF_NOT_EXIST = Redis.SET_IF_NOT_EXIST
+
+    def __init__(self, nodes: list[RedisNode], read_from_replicas: bool = False, vnodes: int = 160):
+        self.nodes = {node.name: node for node in nodes}
+        self.control_node = nodes[0]
+        self.read_from_replicas = read_from_replicas
+        self.ring = HashRing([node.name for node in nodes], vnodes=vnodes)
+
+    @classmethod
+    async def connect(cls, spec: str, read_from_replicas: bool = False, minsize: int = 10, maxsize: int = 20):
+        nodes = []
+        for primary, replicas in parse_nodes(spec):
+            nodes.append(RedisNode(
+                primary,
+                await aioredis.create_redis_pool(address(primary), minsize=minsize, maxsize=maxsize),
+                [await aioredis.create_redis_pool(address(replica), minsize=minsize, maxsize=maxsize)
+                 for replica in replicas],
+            ))
+        logger.info('Redis nodes: {0}'.format(', '.join(node.name for node in nodes)))
+        return cls(nodes, read_from_replicas=read_from_replicas)
+
+    @property
+    def control_address(self) -> tuple[str, int]:
+        return address(self.control_node.name)
+
+    def node_for(self, key) -> RedisNode:
+        if isinstance(key, bytes):
+            key = key.decode()
+        return self.nodes[self.ring.get(key)]
+
+    async def _call(self, node: RedisNode, connection: Redis, name: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await getattr(connection, name)(*args, **kwargs)
+        except Exception:
+            node.stats.record(time.perf_counter() - started, error=True)
+            raise
+        hits = misses = 0
+        if name == 'get':
+            hits, misses = (0, 1) if result is None else (1, 0)
+        elif name == 'mget':
+            misses = result.count(None)
+            hits = len(result) - misses
+        node.stats.record(time.perf_counter() - started, hits=hits, misses=misses)
+        return result
+
+    async def _read(self, name: str, key, *args, **kwargs):
+        node = self.node_for(key)
+        connection = node.reader(self.read_from_replicas)
+        try:
+            return await self._call(node, connection, name, key, *args, **kwargs)
+        except (aioredis.RedisError, OSError):
+            if connection is node.primary:
+                raise
+            return await self._call(node, node.primary, name, key, *args, **kwargs)
+
+    async def _write(self, name: str, key, *args, **kwargs):
+        node = self.node_for(key)
+        return await self._call(node, node.primary, name, key, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name in READ_COMMANDS:
+            return lambda key, *args, **kwargs: self._read(name, key, *args, **kwargs)
+        if name in WRITE_COMMANDS:
+            return lambda key, *args, **kwargs: self._write(name, key, *args, **kwargs)
+        raise AttributeError(name)
+
+    def _group(self, keys) -> dict[str, list[int]]:
+        positions = defaultdict(list)
+        for position, key in enumerate(keys):
+            positions[self.node_for(key).name].append(position)
+        return positions
+
+    async def mget(self, key, *keys, **kwargs) -> list:
+        keys = (key, *keys)
+        result = [None] * len(keys)
+
+        async def fetch(node_name: str, positions: list[int]):
+            node = self.nodes[node_name]
+            node_keys = [keys[position] for position in positions]
+            connection = node.reader(self.read_from_replicas)
+            try:
+                values = await self._call(node, connection, 'mget', *node_keys, **kwargs)
+            except (aioredis.RedisError, OSError):
+                if connection is node.primary:
+                    raise
+                values = await self._call(node, node.primary, 'mget', *node_keys, **kwargs)
+            for position, value in zip(positions, values):
+                result[position] = value
+
+        await asyncio.gather(*(fetch(node_name, positions) for node_name, positions in self._group(keys).items()))
+        return result
+
+    async def delete(self, key, *keys) -> int:
+        keys = (key, *keys)
+        deleted = await asyncio.gather(*(
+            self._call(self.nodes[node_name], self.nodes[node_name].primary, 'delete',
+                       *[keys[position] for position in positions])
+            for node_name, positions in self._group(keys).items()))
+        return sum(deleted)
+
+    async def eval_script(self, script: str, key: str, args: list):
+        """Runs a single-key Lua script on the key's primary: EVALSHA, and EVAL when the node does not know it yet."""
+        node = self.node_for(key)
+        digest = hashlib.sha1(script.encode()).hexdigest()
+        try:
+            return await self._call(node, node.primary, 'evalsha', digest, keys=[key], args=args)
+        except aioredis.ReplyError as error:
+            if not str(error).startswith('NOSCRIPT'):
+                raise
+        return await self._call(node, node.primary, 'eval', script, keys=[key], args=args)
+
+    def pipeline(self) -> 'ShardedPipeline':
+        return ShardedPipeline(self)
+
+    def stats(self) -> dict:
+        return {name: node.stats.snapshot() for name, node in self.nodes.items()}
+
+    def close(self):
+        for node in self.nodes.values():
+            for connection in node.connections():
+                connection.close()
+
+    async def wait_closed(self):
+        await asyncio.gather(*(connection.wait_closed()
+                               for node in self.nodes.values() for connection in node.connections()))
+
+
+class ShardedPipeline:
+    """Buffers single-key commands and sends one pipeline per node concurrently."""
+
+    def __init__(self, sharded: ShardedRedis):
+        self.sharded = sharded
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        if name not in READ_COMMANDS and name not in WRITE_COMMANDS:
+            raise AttributeError(name)
+
+        def command(key, *args, **kwargs):
+            self.commands.append((name, key, args, kwargs))
+        return command
+
+    async def execute(self) -> list:
+        result = [None] * len(self.commands)
+
+        async def run(node_name: str, positions: list[int]):
+            node = self.sharded.nodes[node_name]
+            pipe = node.primary.pipeline()
+            for position in positions:
+                name, key, args, kwargs = self.commands[position]
+                getattr(pipe, name)(key, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                values = await pipe.execute()
+            except Exception:
+                node.stats.record(time.perf_counter() - started, error=True)
+                raise
+            node.stats.record(time.perf_counter() - started)
+            for position, value in zip(positions, values):
+                result[position] = value
+
+        keys = [key for _, key, _, _ in self.commands]
+        await asyncio.gather(*(run(node_name, positions)
+                               for node_name, positions in self.sharded._group(keys).items()))
+        return result
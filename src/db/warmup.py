@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Optional
+
+from elasticsearch import AsyncElasticsearch
+
+from core import config
+from core.config import logger
+from db.sharded_redis import ShardedRedis
+
+
+class Readiness:
+    """
+    Warms the connections of a worker before it takes traffic and remembers the outcome.
+
+    Every Redis connection pool (primaries and replicas) is pinged and every index gets
+    `es_connections` concurrent warm-up queries, so that the HTTP client keeps that many
+    connections open. The worker is ready once every check has passed; failed checks are
+    retried in the background every `retry_seconds`.
+    """
+
+    def __init__(self, es_connections: int = config.WARMUP_ES_CONNECTIONS,
+                 timeout: float = config.WARMUP_TIMEOUT_SECONDS, retry_seconds: float = config.WARMUP_RETRY_SECONDS):
+        self.es_connections = es_connections
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.started = time.monotonic()
+        self.ready = False
+        self.ready_after: Optional[float] = None
+        self.checks: dict[str, dict] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def _check(self, name: str, coro, **details):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(coro, self.timeout)
+            self.checks[name] = {'ok': True, 'ms': round((time.monotonic() - started) * 1000, 3), **details}
+        except Exception as error:
+            self.checks[name] = {'ok': False, 'ms': round((time.monotonic() - started) * 1000, 3),
+                                 'error': repr(error), **details}
+
+    async def warm_up(self, redis: ShardedRedis, es: AsyncElasticsearch, indexes: list[str]) -> bool:
+        checks = []
+        for name, node in redis.nodes.items():
+            for position, connection in enumerate(node.connections()):
+                label = 'redis:{0}'.format(name) if position == 0 else 'redis:{0}:replica{1}'.format(name, position)
+                checks.append(self._check(label, connection.ping(), pool_size=connection.connection.size))
+        for index in indexes:
+            checks.append(self._check('elasticsearch:{0}'.format(index), asyncio.gather(*(
+                es.search(index=index, body={'query': {'match_all': {}}}, params={'size': 1})
+                for _ in range(self.es_connections)))))
+        await asyncio.gather(*checks)
+        self.ready = all(check['ok'] for check in self.checks.values())
+        if self.ready and self.ready_after is None:
+            self.ready_after = round(time.monotonic() - self.started, 3)
+        logger.info('Warm-up {0}: {1}'.format('finished' if self.ready else 'failed', self.checks))
+        return self.ready
+
+    async def _retry(self, redis: ShardedRedis, es: AsyncElasticsearch, indexes: list[str]):
+        while not self.ready:
+            await asyncio.sleep(self.retry_seconds)
+            await self.warm_up(redis, es, indexes)
+
+    async def start(self, redis: ShardedRedis, es: AsyncElasticsearch, indexes: list[str]):
+        if not await self.warm_up(redis, es, indexes):
+            self.task = asyncio.ensure_future(self._retry(redis, es, indexes))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            'ready': self.ready,
+            'uptime_seconds': round(time.monotonic() - self.started, 3),
+            'ready_after_seconds': self.ready_after,
+            'checks': self.checks,
+        }
+
+
+readiness = Readiness()
@@ -1,15 +1,30 @@
 import logging
+from http import HTTPStatus
 
-import aioredis
 import uvicorn
 from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import ORJSONResponse
 
+from api import admin, health
+from api.concurrency import OVERLOADED, AdaptiveConcurrencyMiddleware
+from api.rate_limit import RateLimitMiddleware
+from api.server_timing import ServerTimingMiddleware
 from api.v1 import films, genres, people
+from api.v1.error import STORAGE_UNAVAILABLE
 from core import config
 from core.logger import LOGGING
+from cache import client_side, data_version, shared_memory, writer
 from db import elastic, redis
+from db.sharded_redis import ShardedRedis
+from db.warmup import readiness
+from services import warmer
+from services.catalogue import genre_catalogue
+from services.film import get_film_service
+from services.genre import get_genre_service
+from services.person import get_person_service
+from storage import slow_queries, snapshot
+from storage.resilience import StorageOverloaded, StorageUnavailable
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -22,15 +37,76 @@ app = FastAPI(
     version="1.0.0"
 )
 
+app.add_middleware(AdaptiveConcurrencyMiddleware)
+# Added last, so it runs first: clients over their limit are rejected before any work.
+app.add_middleware(RateLimitMiddleware)
+# Outermost, so that sampled records include the time spent in the limiters.
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.exception_handler(StorageUnavailable)
+async def storage_unavailable(request: Request, error: StorageUnavailable):
+    if isinstance(error, StorageOverloaded):
+        return ORJSONResponse(status_code=HTTPStatus.SERVICE_UNAVAILABLE, content={'detail': OVERLOADED},
+                              headers={'Retry-After': '1'})
+    logger.warning('Storage unavailable for {0}: {1}'.format(request.url.path, error))
+    return ORJSONResponse(status_code=HTTPStatus.SERVICE_UNAVAILABLE, content={'detail': STORAGE_UNAVAILABLE},
+                          headers={'Retry-After': str(int(config.ES_BREAKER_OPEN_SECONDS))})
+
 
 @app.on_event('startup')
 async def startup():
-    redis.redis = await aioredis.create_redis_pool((config.REDIS_HOST, config.REDIS_PORT), minsize=10, maxsize=20)
+    redis.redis = await ShardedRedis.connect(config.REDIS_NODES, read_from_replicas=config.REDIS_READ_FROM_REPLICAS,
+                                             minsize=10, maxsize=20)
     elastic.es = AsyncElasticsearch(hosts=[f'{config.ELASTIC_HOST}:{config.ELASTIC_PORT}'])
+    writer.writer = writer.CacheWriter(redis.redis)
+    writer.writer.start()
+    if config.SHARED_CACHE_ENABLED:
+        try:
+            shared_memory.shared_table = shared_memory.SharedTable.open()
+        except OSError as error:
+            logger.warning('Shared cache unavailable: {0!r}'.format(error))
+    if config.CLIENT_CACHE_ENABLED:
+        client_side.client_cache = client_side.ClientSideCache(redis.redis)
+        client_side.client_cache.start()
+    services = [get_service(redis=redis.redis, elastic=elastic.es)
+                for get_service in (get_film_service, get_genre_service, get_person_service)]
+    await readiness.start(redis.redis, elastic.es,
+                          [service.index for service in services] if config.STORAGE_BACKEND == 'elastic' else [])
+    warmer.warmer = warmer.CacheWarmer(redis.redis, {service.index: service for service in services})
+    data_version.data_version = data_version.DataVersion(redis.redis)
+    data_version.data_version.start()
+    warmer.warmer.etl_listeners.append(data_version.data_version.on_etl)
+    if config.GENRE_CATALOGUE_ENABLED:
+        genre_catalogue.start(get_genre_service(redis=redis.redis, elastic=elastic.es))
+        warmer.warmer.etl_listeners.append(genre_catalogue.on_etl)
+    if shared_memory.shared_table is not None:
+        warmer.warmer.etl_listeners.append(shared_memory.shared_table.on_etl)
+    if config.SNAPSHOT_DIR:
+        snapshot.snapshot_reader = snapshot.SnapshotReader()
+        snapshot.snapshot_reader.start()
+        warmer.warmer.etl_listeners.append(snapshot.snapshot_reader.on_etl)
+    warmer.warmer.start()
+    if config.STORAGE_BACKEND == 'elastic':
+        slow_queries.slow_query_log = slow_queries.SlowQueryLog(redis.redis, elastic.es)
+        slow_queries.slow_query_log.start()
 
 
 @app.on_event('shutdown')
 async def shutdown():
+    await readiness.stop()
+    await warmer.warmer.stop()
+    await data_version.data_version.stop()
+    await genre_catalogue.stop()
+    if slow_queries.slow_query_log is not None:
+        await slow_queries.slow_query_log.stop()
+    if snapshot.snapshot_reader is not None:
+        await snapshot.snapshot_reader.stop()
+    await writer.writer.stop()
+    if client_side.client_cache is not None:
+        await client_side.client_cache.stop()
+    if shared_memory.shared_table is not None:
+        shared_memory.shared_table.close()
     redis.redis.close()
     await redis.redis.wait_closed()
     await elastic.es.close()
@@ -39,6 +115,8 @@ async def shutdown():
 app.include_router(films.router, prefix='/api/v1/films', tags=['films'])
 app.include_router(people.router, prefix='/api/v1/people', tags=['people'])
 app.include_router(genres.router, prefix='/api/v1/genres', tags=['genres'])
+app.include_router(health.router, prefix='/health', tags=['health'])
+app.include_router(admin.router, prefix='/admin', tags=['admin'], dependencies=[Depends(admin.require_admin)])
 
 if __name__ == '__main__':
     uvicorn.run(
@@ -1,11 +1,22 @@
 import orjson
 from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
 
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
 
 
+def model_encoder(obj):
+    """
+    orjson `default` for models that are already valid: their field values are handed over
+    as is, nested models come back here, without the copies `.dict()` makes.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    return pydantic_encoder(obj)
+
+
 class Base(BaseModel):
     class Config:
         json_loads = orjson.loads
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from core import config
+from core.config import logger
+from models.models import Genre
+from storage.memory_storage import max_edits, tokenize, within_distance
+
+SEARCH_RESULTS_KEPT = 1024
+
+
+def trigrams(term: str) -> set[str]:
+    padded = '^{0}$'.format(term)
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Finds the terms within an edit distance of a word. An edit changes at most three trigrams
+    of the padded word, so a candidate must share all but 3 * edits of them; the survivors
+    are checked with the exact distance.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted(set(terms))
+        self.index: dict[str, list[str]] = defaultdict(list)
+        for term in self.terms:
+            for gram in trigrams(term):
+                self.index[gram].append(term)
+
+    def similar(self, word: str, edits: int) -> list[str]:
+        grams = trigrams(word)
+        required = len(grams) - 3 * edits
+        if required <= 0:
+            candidates = self.terms
+        else:
+            shared = defaultdict(int)
+            for gram in grams:
+                for term in self.index.get(gram, ()):
+                    shared[term] += 1
+            candidates = [term for term, count in shared.items() if count >= required]
+        return [term for term in candidates if within_distance(word, term, edits)]
+
+
+class Catalogue:
+    """An immutable copy of every genre: the id map, the listing order and the name index."""
+
+    def __init__(self, genres: list[Genre]):
+        self.genres = genres
+        self.by_id = {genre.id: genre for genre in genres}
+        self.postings: dict[str, list[int]] = defaultdict(list)
+        for position, genre in enumerate(genres):
+            for term in set(tokenize(genre.name)):
+                self.postings[term].append(position)
+        self.names = TrigramIndex(self.postings)
+        self.results: dict[str, list[Genre]] = {}
+
+    def search(self, name: str) -> list[Genre]:
+        """Same matching as the `match` query with `fuzziness: auto`: any word, exact matches ranked first."""
+        if name not in self.results:
+            if len(self.results) >= SEARCH_RESULTS_KEPT:
+                self.results.clear()
+            self.results[name] = self._search(name)
+        return self.results[name]
+
+    def _search(self, name: str) -> list[Genre]:
+        scores = defaultdict(float)
+        for word in tokenize(name):
+            best = {}
+            for term in self.names.similar(word, max_edits(word)):
+                weight = 1.0 if term == word else 0.5
+                for position in self.postings[term]:
+                    best[position] = max(best.get(position, 0.0), weight)
+            for position, weight in best.items():
+                scores[position] += weight
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        return [self.genres[position] for position in ranked]
+
+
+class GenreCatalogue:
+    """
+    Keeps the whole genre index in the memory of the worker and answers genre requests
+    from it. The copy is read from storage on startup, after every ETL message about the
+    genre index and every `refresh_interval` seconds in case a message was missed; until
+    the first successful read the genre service goes through the cache and storage.
+    """
+
+    def __init__(self, refresh_interval: float = config.GENRE_CATALOGUE_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self.catalogue: Optional[Catalogue] = None
+        self.service = None
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        try:
+            genres = [Genre(**source) async for batch in self.service.export_batches() for source in batch]
+        except Exception as error:
+            logger.warning('Could not load the genre catalogue: {0!r}'.format(error))
+            return
+        if not genres:
+            logger.warning('Genre index is empty, the genre catalogue is not used')
+            return
+        self.catalogue = Catalogue(genres)
+        self.loaded_at = time.time()
+        self.refreshes += 1
+        logger.info('Genre catalogue loaded: {0} genres'.format(len(genres)))
+
+    async def on_etl(self, indexes: list[str]):
+        if self.service is not None and self.service.index in indexes:
+            await self.refresh()
+
+    async def _refresh_periodically(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, service):
+        self.service = service
+        self.task = asyncio.ensure_future(self._refresh_periodically())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            'loaded': self.catalogue is not None,
+            'genres': len(self.catalogue.genres) if self.catalogue else 0,
+            'loaded_at': self.loaded_at,
+            'refreshes': self.refreshes,
+        }
+
+
+genre_catalogue = GenreCatalogue()
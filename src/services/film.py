@@ -1,18 +1,20 @@
 from functools import lru_cache
 from typing import Optional
 
-from aioredis import Redis
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.basic_cache import AsyncCacheStorage
+from cache.keys import PAGINATION_DEFAULTS, build_key
 from cache.redis_cache import RedisService
 from db.elastic import get_elastic
 from db.redis import get_redis
+from db.sharded_redis import ShardedRedis
 from models.models import Film, FilmById
 from services.utils import BaseService
 from storage.basic_storage import AsyncStorage
-from storage.elastic_storage import ElasticService
+from storage.backends import get_storage
+from storage.resilience import ResilientStorage
 
 
 class FilmService(BaseService):
@@ -48,29 +50,26 @@ class FilmService(BaseService):
             'from': page,
             'sort': sort
         }
-        objects = await self.storage.get_all(index=self.index, body=body, params=params, model=self.model)
+        objects = await self.objects_from_storage(body=body, params=params)
         return objects
 
     def get_key(self, **kwargs) -> str:
-        page_number = kwargs.get('page')
-        page_size = kwargs.get('page_size')
-        title = kwargs.get('title', None)
-        genre = kwargs.get('genre', None)
-        sort = kwargs.get('sort', 'imdb_rating:desc')
-        redis_key = "{0}::{1}::{2}::{3}::{4}::{5}::{6}::{7}::{8}::{9}::{10}".format(self.index,
-                                                                                    "page_size", page_size,
-                                                                                    "page_number", page_number,
-                                                                                    "title", title,
-                                                                                    "genre", genre,
-                                                                                    "sort", sort)
-        return redis_key
+        params = {
+            'page': kwargs.get('page'),
+            'page_size': kwargs.get('page_size'),
+            'title': kwargs.get('title', None),
+            'genre': kwargs.get('genre', None),
+            'sort': kwargs.get('sort', 'imdb_rating:desc'),
+        }
+        defaults = {**PAGINATION_DEFAULTS, 'sort': 'imdb_rating:desc'}
+        return build_key('{0}::list'.format(self.index), params, defaults, text_fields=('title', 'genre'))
 
 
 @lru_cache()
 def get_film_service(
-    redis: Redis = Depends(get_redis),
+    redis: ShardedRedis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> FilmService:
     cache = RedisService(redis)
-    storage = ElasticService(elastic)
+    storage = ResilientStorage(get_storage(elastic))
     return FilmService(cache, storage)
@@ -1,24 +1,31 @@
 from functools import lru_cache
 from typing import Optional
 
-from aioredis import Redis
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.basic_cache import AsyncCacheStorage
+from cache.keys import PAGINATION_DEFAULTS, build_key
 from cache.redis_cache import RedisService
+from core import config, timing
 from db.elastic import get_elastic
 from db.redis import get_redis
+from db.sharded_redis import ShardedRedis
 from models.models import Genre
+from services.catalogue import GenreCatalogue, genre_catalogue
 from services.utils import BaseService
 from storage.basic_storage import AsyncStorage
-from storage.elastic_storage import ElasticService
+from storage.backends import get_storage
+from storage.resilience import ResilientStorage
 
 
 class GenreService(BaseService):
-    def __init__(self, cache: AsyncCacheStorage, storage: AsyncStorage):
+    """Answers from the in-memory genre catalogue once it is loaded, from the cache and storage before that."""
+
+    def __init__(self, cache: AsyncCacheStorage, storage: AsyncStorage, catalogue: Optional[GenreCatalogue] = None):
         self.cache = cache
         self.storage = storage
+        self.catalogue = catalogue
 
     @property
     def index(self) -> str:
@@ -33,32 +40,49 @@ class GenreService(BaseService):
         return Genre
 
     def get_key(self, **kwargs) -> str:
-        page_number = kwargs.get('page')
-        page_size = kwargs.get('page_size')
+        params = {
+            'page': kwargs.get('page'),
+            'page_size': kwargs.get('page_size'),
+            'name': kwargs.get('name', None),
+        }
+        return build_key('{0}::list'.format(self.index), params, PAGINATION_DEFAULTS, text_fields=('name',))
+
+    @staticmethod
+    def page_params(**kwargs) -> dict:
+        return {'size': kwargs.get('page_size'), 'from': kwargs.get('page') - 1}
+
+    async def get_by_id(self, object_id: str) -> Optional[Genre]:
+        catalogue = self.catalogue.catalogue if self.catalogue else None
+        if catalogue is None:
+            return await super().get_by_id(object_id)
+        timing.tier('catalogue', hits=1)
+        return catalogue.by_id.get(object_id)
+
+    async def get_all_objects(self, **kwargs) -> Optional[list[Genre]]:
+        catalogue = self.catalogue.catalogue if self.catalogue else None
+        if catalogue is None:
+            return await super().get_all_objects(**kwargs)
+        timing.tier('catalogue', hits=1)
         name = kwargs.get('name', None)
-        redis_key = "{0}::{1}::{2}::{3}::{4}::{5}::{6}".format(self.index,
-                                                               "page_size", page_size,
-                                                               "page_number", page_number,
-                                                               "name", name)
-        return redis_key
+        genres = catalogue.search(name) if name else catalogue.genres
+        params = self.page_params(**kwargs)
+        return genres[params['from']:params['from'] + params['size']]
 
     async def all_objects_from_storage(self, **kwargs) -> Optional[list[Genre]]:
-        page_size = kwargs.get('page_size')
-        page = kwargs.get('page') - 1
         name = kwargs.get('name', None)
-        params = {'size': page_size, 'from': page}
+        params = self.page_params(**kwargs)
         body = {'query': {'match_all': {}}}
         if name:
             body = {'query': {'match': {'name': {'query': name, 'fuzziness': 'auto'}}}}
-        objects = await self.storage.get_all(index=self.index, body=body, params=params, model=self.model)
+        objects = await self.objects_from_storage(body=body, params=params)
         return objects
 
 
 @lru_cache()
 def get_genre_service(
-    redis: Redis = Depends(get_redis),
+    redis: ShardedRedis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> GenreService:
     cache = RedisService(redis)
-    storage = ElasticService(elastic)
-    return GenreService(cache, storage)
+    storage = ResilientStorage(get_storage(elastic))
+    return GenreService(cache, storage, genre_catalogue if config.GENRE_CATALOGUE_ENABLED else None)
@@ -1,18 +1,21 @@
 from functools import lru_cache
 from typing import Optional
 
-from aioredis import Redis
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 
 from cache.basic_cache import AsyncCacheStorage
+from cache.codec import NOT_FOUND
+from cache.keys import PAGINATION_DEFAULTS, build_key
 from cache.redis_cache import RedisService
 from db.elastic import get_elastic
 from db.redis import get_redis
-from models.models import Film, Person
+from db.sharded_redis import ShardedRedis
+from models.models import Film, FilmById, Person
 from services.utils import BaseService
 from storage.basic_storage import AsyncStorage
-from storage.elastic_storage import ElasticService
+from storage.backends import get_storage
+from storage.resilience import ResilientStorage, StorageUnavailable
 
 
 class PersonService(BaseService):
@@ -32,16 +35,26 @@ class PersonService(BaseService):
     def model_id(self):
         return Person
 
-    async def get_film_by_person_id(self, person_id: str) -> Optional[Film]:
+    async def get_film_by_person_id(self, person_id: str) -> Optional[list[Film]]:
 
         redis_key = "{0}::{1}::{2}::{3}".format(self.index, "films", "guid", person_id)
-        films = await self.cache.all_objects_from_cache(Film, redis_key)
-        if not films:
-            films = await self._get_person_film_from_elastic(person_id)
-            if not films:
-                return None
-            await self.cache.put_objects_to_cache(self.index, films, redis_key)
+        film_ids = await self.cache.ids_from_cache(redis_key)
+        if film_ids is NOT_FOUND:
+            return None
+        if film_ids:
+            return await self.objects_by_ids(film_ids, index='movies', model=Film, model_id=FilmById)
 
+        try:
+            films = await self._get_person_film_from_elastic(person_id)
+        except StorageUnavailable:
+            film_ids = await self.cache.stale_ids(redis_key)
+            if not film_ids:
+                raise
+            return await self.objects_by_ids(film_ids, index='movies', model=Film, model_id=FilmById)
+        if not films:
+            await self.cache.put_not_found_to_cache(self.index, redis_key)
+            return None
+        await self.cache.put_ids_to_cache(self.index, [film.id for film in films], redis_key)
         return films
 
     async def all_objects_from_storage(self, **kwargs) -> Optional[list[Person]]:
@@ -68,7 +81,7 @@ class PersonService(BaseService):
             'size': page_size,
             'from': page
         }
-        objects = await self.storage.get_all(index=self.index, body=body, params=params, model=self.model)
+        objects = await self.objects_from_storage(body=body, params=params)
         return objects
 
     async def _get_person_film_from_elastic(self, person_id: str) -> Optional[Film]:
@@ -77,27 +90,25 @@ class PersonService(BaseService):
             return None
         body = {"query": {"ids": {"values": res.film_ids}}}
         params = {}
-        objects = await self.storage.get_all(index='movies', body=body, params=params, model=Film)
+        objects = await self.objects_from_storage(body=body, params=params, index='movies', model=Film,
+                                                  model_id=FilmById)
         return objects
 
     def get_key(self, **kwargs) -> str:
-        page_number = kwargs.get('page')
-        page_size = kwargs.get('page_size')
-        role = kwargs.get('role', None)
-        name = kwargs.get('name', None)
-        redis_key = "{0}::{1}::{2}::{3}::{4}::{5}::{6}::{7}::{8}".format(self.index,
-                                                                         "page_size", page_size,
-                                                                         "page_number", page_number,
-                                                                         "role", role,
-                                                                         "name", name)
-        return redis_key
+        params = {
+            'page': kwargs.get('page'),
+            'page_size': kwargs.get('page_size'),
+            'role': kwargs.get('role', None),
+            'name': kwargs.get('name', None),
+        }
+        return build_key('{0}::list'.format(self.index), params, PAGINATION_DEFAULTS, text_fields=('role', 'name'))
 
 
 @lru_cache()
 def get_person_service(
-    redis: Redis = Depends(get_redis),
+    redis: ShardedRedis = Depends(get_redis),
     elastic: AsyncElasticsearch = Depends(get_elastic),
 ) -> PersonService:
     cache = RedisService(redis)
-    storage = ElasticService(elastic)
+    storage = ResilientStorage(get_storage(elastic))
     return PersonService(cache, storage)
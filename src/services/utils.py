@@ -1,10 +1,18 @@
 from abc import abstractmethod
-from typing import Optional, Type, Union
+from typing import AsyncIterator, Optional, Type, Union
 
+from pydantic import ValidationError
+
+from cache.codec import NOT_FOUND
+from cache.keys import entity_key
 from cache.redis_cache import RedisService
+from core import config, timing
 from core.config import logger
 from models.models import Film, FilmById, Genre, Person
+from services import warmer
+from storage import snapshot
 from storage.elastic_storage import ElasticService
+from storage.resilience import StorageUnavailable
 
 
 class BaseService:
@@ -38,13 +46,27 @@ class BaseService:
 
     async def get_by_id(self, object_id: str) -> Optional[Union[Film, FilmById,
                                                                 Genre, Person]]:
-        redis_key = "{0}::{1}::{2}".format(self.index, "guid", object_id)
+        if snapshot.snapshot_reader is not None:
+            obj = snapshot.snapshot_reader.get(self.index, object_id, self.model_id)
+            if obj is not None:
+                return obj
+        redis_key = entity_key(self.index, object_id)
+        warmer.track(redis_key, {'object_id': object_id})
         obj = await self.cache.object_from_cache(self.index, self.model_id, redis_key)
         logger.info('index {1} data {0} was in cache'.format(obj, self.index))
+        if obj is NOT_FOUND:
+            return None
         if not obj:
-            obj = await self.storage.get(object_id, index=self.index, model=self.model_id)
+            try:
+                obj = await self.storage.get(object_id, index=self.index, model=self.model_id)
+            except StorageUnavailable:
+                obj, = await self.cache.stale_objects(self.model_id, [redis_key])
+                if obj is None:
+                    raise
+                return obj
             logger.info('index {1} data {0} not in cache'.format(obj, self.index))
             if not obj:
+                await self.cache.put_not_found_to_cache(self.index, redis_key)
                 return None
             await self.cache.put_object_to_cache(obj, self.index, redis_key)
         return obj
@@ -52,16 +74,113 @@ class BaseService:
     async def get_all_objects(self, **kwargs) -> Optional[Union[list[Film], list[FilmById],
                                                                 list[Genre], list[Person]]]:
         redis_key = self.get_key(**kwargs)
-        objects = await self.cache.all_objects_from_cache(self.model, redis_key)
-        if not objects:
-            objects = await self.all_objects_from_storage(**kwargs)
-            if not objects:
-                return None
-            await self.cache.put_objects_to_cache(self.index, objects, redis_key)
-
+        warmer.track(redis_key, {name: value for name, value in kwargs.items()
+                                 if name != 'request' and value not in (None, '')})
+        ids = await self.cache.ids_from_cache(redis_key)
+        if ids is NOT_FOUND:
+            return None
+        if ids:
+            return await self.objects_by_ids(ids)
+        try:
+            return await self.refresh_objects(**kwargs)
+        except StorageUnavailable:
+            ids = await self.cache.stale_ids(redis_key)
+            if not ids:
+                raise
+            return await self.objects_by_ids(ids)
+
+    async def objects_from_storage(self, body: dict, params: dict, index: Optional[str] = None,
+                                   model: Optional[Type[Union[Film, Genre, Person]]] = None,
+                                   model_id: Optional[Type[Union[FilmById, Genre, Person]]] = None
+                                   ) -> list[Union[Film, Genre, Person]]:
+        """
+        Runs a listing or search query. The storage returns full documents, so the first
+        LISTING_ADMISSION_LIMIT of them are also written to the cache as per-entity entries.
+        """
+        index = index or self.index
+        model = model or self.model
+        model_id = model_id or self.model_id
+        sources = await self.storage.search(index=index, body=body, params=params)
+        with timing.measure('model'):
+            objects = [model(**source) for source in sources]
+        await self.admit_entities(index, model_id, sources[:config.LISTING_ADMISSION_LIMIT],
+                                  objects if model is model_id else None)
         return objects
 
+    async def admit_entities(self, index: str, model_id: Type[Union[FilmById, Genre, Person]],
+                             sources: list[dict], objects: Optional[list] = None):
+        if objects is None:
+            objects = []
+            for source in sources:
+                try:
+                    objects.append(model_id(**source))
+                except ValidationError:
+                    continue
+        objects = objects[:len(sources)]
+        await self.cache.put_objects_to_cache(index, objects, [entity_key(index, obj.id) for obj in objects])
+
+    async def export_batches(self, after: Optional[str] = None,
+                             batch_size: int = config.EXPORT_BATCH_SIZE) -> AsyncIterator[list[dict]]:
+        """
+        Walks the whole index in id order with search_after, bypassing the cache.
+        Ids are unique keywords, so the walk neither repeats nor skips documents and can
+        resume after any id.
+        """
+        while True:
+            body = {'query': {'match_all': {}}, 'sort': [{'id': 'asc'}]}
+            if after is not None:
+                body['search_after'] = [after]
+            sources = await self.storage.search(index=self.index, body=body, params={'size': batch_size})
+            if not sources:
+                return
+            yield sources
+            if len(sources) < batch_size:
+                return
+            after = sources[-1]['id']
+
+    async def refresh_by_id(self, object_id: str) -> Optional[Union[FilmById, Genre, Person]]:
+        """Re-reads an object from storage and caches it."""
+        obj = await self.storage.get(object_id, index=self.index, model=self.model_id)
+        if obj:
+            await self.cache.put_object_to_cache(obj, self.index, entity_key(self.index, object_id))
+        else:
+            await self.cache.put_not_found_to_cache(self.index, entity_key(self.index, object_id))
+        return obj
 
+    async def refresh_objects(self, **kwargs) -> Optional[Union[list[Film], list[Genre], list[Person]]]:
+        """Re-reads a listing from storage and caches its id list."""
+        objects = await self.all_objects_from_storage(**kwargs)
+        if not objects:
+            await self.cache.put_not_found_to_cache(self.index, self.get_key(**kwargs), listing=True)
+            return None
+        await self.cache.put_ids_to_cache(self.index, [obj.id for obj in objects], self.get_key(**kwargs))
+        return objects
 
-
-
+    async def objects_by_ids(self, ids: list[str], index: Optional[str] = None,
+                             model: Optional[Type[Union[Film, Genre, Person]]] = None,
+                             model_id: Optional[Type[Union[FilmById, Genre, Person]]] = None
+                             ) -> list[Union[Film, Genre, Person]]:
+        """
+        Hydrates a cached id list: per-entity entries come from one MGET, the missing ones
+        from one storage mget, and are written back to the cache. Order of `ids` is kept.
+        While the storage is unavailable the missing ones come from stale copies.
+        """
+        index = index or self.index
+        model = model or self.model
+        model_id = model_id or self.model_id
+        cached = await self.cache.objects_from_cache(model_id, [entity_key(index, object_id) for object_id in ids])
+        missing = [object_id for object_id, obj in zip(ids, cached) if obj is None]
+        if missing:
+            try:
+                fetched = await self.storage.get_many(missing, index=index, model=model_id)
+                await self.cache.put_objects_to_cache(index, fetched, [entity_key(index, obj.id) for obj in fetched])
+            except StorageUnavailable:
+                stale_keys = [entity_key(index, object_id) for object_id in missing]
+                stale = await self.cache.stale_objects(model_id, stale_keys)
+                fetched = [obj for obj in stale if obj is not None]
+            by_id = {obj.id: obj for obj in fetched}
+            cached = [obj or by_id.get(object_id) for object_id, obj in zip(ids, cached)]
+        found = [obj for obj in cached if obj is not None and obj is not NOT_FOUND]
+        if model is model_id:
+            return found
+        return [model.construct(**{name: getattr(obj, name) for name in model.__fields__}) for obj in found]
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+import aioredis
+import orjson
+
+from cache.stats import cache_stats
+from core import config
+from core.config import logger
+from db.sharded_redis import ShardedRedis
+
+FREQUENCY_KEY = 'warm::frequency'
+PARAMS_KEY = 'warm::params'
+LOCK_KEY = 'warm::lock'
+LOCK_EXPIRE_IN_SECONDS = 60
+ETL_CHANNEL = 'etl::completed'
+# Deletes the lock only while it still holds this worker's token, not a lock taken after it expired.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CacheWarmer:
+    """
+    Counts requests per canonical cache key and prefetches the most requested ones.
+
+    Counts are kept in memory and flushed to a Redis sorted set shared by all workers,
+    request parameters are kept in a hash next to it. Warming runs on startup and on every
+    ETL completion message; a Redis lock lets only one worker of the fleet do it.
+    """
+
+    def __init__(self, redis: ShardedRedis, services: dict, top_n: int = config.WARM_TOP_N,
+                 concurrency: int = config.WARM_CONCURRENCY,
+                 flush_interval: float = config.WARM_TRACK_FLUSH_SECONDS,
+                 max_tracked_keys: int = config.WARM_MAX_TRACKED_KEYS):
+        self.redis = redis
+        self.services = services
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self.flush_interval = flush_interval
+        self.max_tracked_keys = max_tracked_keys
+        self.counter = Counter()
+        self.params = {}
+        self.tasks = []
+        self.last_run = {}
+        # Coroutine functions called in every worker with the indexes of each ETL message.
+        self.etl_listeners = []
+
+    def track(self, redis_key: str, params: dict):
+        self.counter[redis_key] += 1
+        self.params.setdefault(redis_key, params)
+
+    async def flush(self):
+        if not self.counter:
+            return
+        counter, params = self.counter, self.params
+        self.counter, self.params = Counter(), {}
+        pipe = self.redis.pipeline()
+        for redis_key, count in counter.items():
+            pipe.zincrby(FREQUENCY_KEY, count, redis_key)
+            pipe.hset(PARAMS_KEY, redis_key, orjson.dumps(params[redis_key]))
+        await pipe.execute()
+        await self._cap()
+        logger.info('Tracked {0} cache keys, cache {1}'.format(len(counter), cache_stats.snapshot()))
+
+    async def warm(self, force: bool = False) -> Optional[dict]:
+        """
+        Prefetches the top-N keys. Missing keys are always filled, with `force`
+        listings are re-read from storage even when cached.
+        """
+        token = os.urandom(16).hex()
+        if not await self.redis.set(LOCK_KEY, token, expire=LOCK_EXPIRE_IN_SECONDS,
+                                    exist=self.redis.SET_IF_NOT_EXIST):
+            return None
+        try:
+            return await self._warm(force)
+        finally:
+            await self.redis.eval_script(RELEASE_LOCK_SCRIPT, LOCK_KEY, [token])
+
+    async def _warm(self, force: bool) -> dict:
+        started = time.monotonic()
+        hits_before = cache_stats.snapshot()
+        await self._decay()
+        keys = await self.redis.zrevrange(FREQUENCY_KEY, 0, self.top_n - 1, encoding='utf-8')
+        params = await self.redis.hmget(PARAMS_KEY, *keys) if keys else []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm_one(redis_key: str, raw_params: bytes) -> bool:
+            async with semaphore:
+                return await self._warm_key(redis_key, orjson.loads(raw_params), force)
+
+        results = await asyncio.gather(*(warm_one(redis_key, raw_params)
+                                         for redis_key, raw_params in zip(keys, params) if raw_params),
+                                       return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        for error in failed[:5]:
+            logger.warning('Cache warming failed: {0!r}'.format(error))
+        self.last_run = {
+            'force': force,
+            'keys': len(keys),
+            'warmed': results.count(True),
+            'skipped': results.count(False),
+            'failed': len(failed),
+            'seconds': round(time.monotonic() - started, 3),
+            'cache_before': hits_before,
+        }
+        logger.info('Cache warming finished {0}'.format(self.last_run))
+        return self.last_run
+
+    async def _warm_key(self, redis_key: str, params: dict, force: bool) -> bool:
+        service = self.services.get(redis_key.split('::', 1)[0])
+        if service is None:
+            return False
+        if 'object_id' in params:
+            if await self.redis.exists(redis_key):
+                return False
+            await service.refresh_by_id(params['object_id'])
+            return True
+        if not force and await self.redis.exists(redis_key):
+            return False
+        await service.refresh_objects(**params)
+        return True
+
+    async def _decay(self):
+        """Halves all counts so that old traffic fades out."""
+        await self.redis.zunionstore(FREQUENCY_KEY, (FREQUENCY_KEY, 0.5), with_weights=True)
+        await self._cap()
+
+    async def _cap(self):
+        """Drops the least requested keys beyond the limit, after every flush of new counts."""
+        stale = await self.redis.zrange(FREQUENCY_KEY, 0, -self.max_tracked_keys - 1, encoding='utf-8')
+        if stale:
+            pipe = self.redis.pipeline()
+            pipe.hdel(PARAMS_KEY, *stale)
+            pipe.zrem(FREQUENCY_KEY, *stale)
+            await pipe.execute()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as error:
+                logger.warning('Could not flush request frequencies: {0!r}'.format(error))
+
+    async def _listen_etl(self):
+        while True:
+            connection = None
+            try:
+                connection = await aioredis.create_redis(self.redis.control_address)
+                channel, = await connection.subscribe(ETL_CHANNEL)
+                while await channel.wait_message():
+                    message = await channel.get(encoding='utf-8')
+                    logger.info('ETL completed for {0}, warming cache'.format(message))
+                    for listener in self.etl_listeners:
+                        await listener(message.split(','))
+                    await self.warm(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('ETL notifications unavailable: {0!r}'.format(error))
+                await asyncio.sleep(self.flush_interval)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    async def _warm_on_startup(self):
+        try:
+            await self.warm()
+        except Exception as error:
+            logger.warning('Startup cache warming failed: {0!r}'.format(error))
+
+    def start(self):
+        self.tasks = [asyncio.ensure_future(coro) for coro in (self._flush_periodically(), self._listen_etl(),
+                                                               self._warm_on_startup())]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.flush()
+
+
+warmer: Optional[CacheWarmer] = None
+
+
+def track(redis_key: str, params: dict):
+    if warmer is not None:
+        warmer.track(redis_key, params)
@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+from elasticsearch import AsyncElasticsearch
+
+from core import config
+from storage.basic_storage import AsyncStorage
+from storage.elastic_storage import ElasticService
+from storage.memory_storage import MemoryStorage
+
+
+@lru_cache()
+def memory_storage() -> MemoryStorage:
+    if not config.MEMORY_STORAGE_PATH:
+        raise ValueError('STORAGE_BACKEND=memory needs MEMORY_STORAGE_PATH with <index>.ndjson files')
+    return MemoryStorage.load(config.MEMORY_STORAGE_PATH)
+
+
+def get_storage(elastic: AsyncElasticsearch) -> AsyncStorage:
+    """`STORAGE_BACKEND=memory` serves the documents from process memory instead of Elasticsearch."""
+    if config.STORAGE_BACKEND == 'memory':
+        return memory_storage()
+    return ElasticService(elastic)
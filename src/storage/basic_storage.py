@@ -6,6 +6,14 @@ class AsyncStorage(ABC):
     async def get(self, object_id: str, **kwargs):
         pass
 
+    @abstractmethod
+    async def get_many(self, object_ids: list[str], **kwargs):
+        pass
+
     @abstractmethod
     async def get_all(self, **kwargs):
         pass
+
+    @abstractmethod
+    async def search(self, **kwargs) -> list[dict]:
+        pass
@@ -1,8 +1,12 @@
+import asyncio
+import time
 from typing import Optional, Union
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 
+from core import timing
 from models.models import Film, FilmById, Genre, Person
+from storage import slow_queries
 from storage.basic_storage import AsyncStorage
 
 
@@ -11,18 +15,43 @@ class ElasticService(AsyncStorage):
         self.elastic = elastic
 
     async def get_all(self, index, model, body, params):
-        doc = await self.elastic.search(index=index,
-                                        doc_type="_doc",
-                                        body=body,
-                                        params=params)
-        objects = [model(**x['_source']) for x in doc['hits']['hits']]
+        sources = await self.search(index=index, body=body, params=params)
+        with timing.measure('model'):
+            objects = [model(**source) for source in sources]
         return objects
 
+    async def search(self, index, body, params) -> list[dict]:
+        started = time.perf_counter()
+        try:
+            with timing.measure('es'):
+                doc = await self.elastic.search(index=index,
+                                                doc_type="_doc",
+                                                body=body,
+                                                params=params)
+        except asyncio.CancelledError:
+            # Searches over the storage timeout are cancelled; they are the slowest of all.
+            if slow_queries.slow_query_log is not None:
+                slow_queries.slow_query_log.observe(index, body, params, None, time.perf_counter() - started)
+            raise
+        if slow_queries.slow_query_log is not None:
+            slow_queries.slow_query_log.observe(index, body, params, doc, time.perf_counter() - started)
+        return [x['_source'] for x in doc['hits']['hits']]
+
     async def get(self, object_id, **kwargs) -> Optional[Union[Film, FilmById, Genre, Person]]:
         index = kwargs['index']
         model = kwargs['model']
         try:
-            doc = await self.elastic.get(index, object_id)
+            with timing.measure('es'):
+                doc = await self.elastic.get(index, object_id)
         except NotFoundError:
             return None
-        return model(**doc['_source'])
+        with timing.measure('model'):
+            return model(**doc['_source'])
+
+    async def get_many(self, object_ids, **kwargs) -> list[Union[Film, FilmById, Genre, Person]]:
+        index = kwargs['index']
+        model = kwargs['model']
+        with timing.measure('es'):
+            doc = await self.elastic.mget(body={'ids': object_ids}, index=index)
+        with timing.measure('model'):
+            return [model(**x['_source']) for x in doc['docs'] if x.get('found')]
@@ -0,0 +1,258 @@
+import math
+import os
+import re
+from array import array
+from collections import defaultdict
+from typing import Optional, Union
+
+import orjson
+
+from models.models import Film, FilmById, Genre, Person
+from storage.basic_storage import AsyncStorage
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)?", re.UNICODE)
+
+STOPWORDS = frozenset((
+    'a an and are as at be but by for if in into is it no not of on or such that the their then there these '
+    'they this to was will with '
+    'и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот '
+    'от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь'
+).split())
+
+EN_SUFFIXES = ('ingly', 'edly', 'ing', 'ies', 'ied', 'ed', 'es', 'ly', 's')
+RU_SUFFIXES = ('иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+               'ый', 'ий', 'ой', 'ей', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ов', 'ев', 'ию', 'ия', 'ии', 'а', 'я',
+               'ы', 'и', 'у', 'ю', 'о', 'е', 'ь')
+
+
+def stem(token: str) -> str:
+    """Strips one common English or Russian ending, keeping at least three letters."""
+    if token.endswith("'s"):
+        token = token[:-2]
+    suffixes = RU_SUFFIXES if 'а' <= token[-1:] <= 'я' else EN_SUFFIXES
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """A light version of the `ru_en` analyzer of the indexes: lowercase, stop words, stemming."""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower().replace('ё', 'е')) if token not in STOPWORDS]
+
+
+def max_edits(term: str) -> int:
+    """Elasticsearch's `fuzziness: auto`."""
+    return 0 if len(term) <= 2 else 1 if len(term) <= 5 else 2
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class MemoryIndex:
+    """
+    Documents of one index with an inverted index over their text fields.
+
+    Documents are numbered in load order; each field maps a term to an array of document
+    numbers that contain it. Scores are a plain sum of term idf values, so the order of
+    equally relevant documents is the load order.
+    """
+
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+        self.numbers = {document['id']: number for number, document in enumerate(documents)}
+        self.postings: dict[str, dict[str, array]] = defaultdict(dict)
+        self.fuzzy_terms: dict[tuple[str, str], list[str]] = {}
+        for number, document in enumerate(documents):
+            for field, value in document.items():
+                if field == 'id' or field.endswith('_ids'):
+                    continue
+                for term in set(self._terms(value)):
+                    self.postings[field].setdefault(term, array('I')).append(number)
+
+    @staticmethod
+    def _terms(value) -> list[str]:
+        if isinstance(value, str):
+            return tokenize(value)
+        if isinstance(value, list):
+            return [term for item in value if isinstance(item, str) for term in tokenize(item)]
+        return []
+
+    def _expand(self, field: str, term: str, fuzzy: bool) -> list[str]:
+        if not fuzzy or not max_edits(term):
+            return [term] if term in self.postings[field] else []
+        key = (field, term)
+        if key not in self.fuzzy_terms:
+            self.fuzzy_terms[key] = [candidate for candidate in self.postings[field]
+                                     if within_distance(term, candidate, max_edits(term))]
+        return self.fuzzy_terms[key]
+
+    def match(self, field: str, query: Union[str, dict]) -> dict[int, float]:
+        if isinstance(query, dict):
+            text, fuzzy, operator = query['query'], 'fuzziness' in query, query.get('operator', 'or').lower()
+        else:
+            text, fuzzy, operator = query, False, 'or'
+        scores: dict[int, float] = {}
+        matched_terms = []
+        for token in tokenize(str(text)):
+            numbers = defaultdict(float)
+            for term in self._expand(field, token, fuzzy):
+                postings = self.postings[field][term]
+                weight = math.log(1 + len(self.documents) / len(postings)) * (1.0 if term == token else 0.5)
+                for number in postings:
+                    numbers[number] = max(numbers[number], weight)
+            matched_terms.append(numbers)
+        if not matched_terms:
+            return {}
+        if operator == 'and':
+            common = set.intersection(*(set(numbers) for numbers in matched_terms))
+            matched_terms = [{number: score for number, score in numbers.items() if number in common}
+                             for numbers in matched_terms]
+        for numbers in matched_terms:
+            for number, score in numbers.items():
+                scores[number] = scores.get(number, 0.0) + score
+        return scores
+
+    def evaluate(self, query: dict) -> dict[int, float]:
+        kind, clause = next(iter(query.items()))
+        if kind == 'match_all':
+            return dict.fromkeys(range(len(self.documents)), 1.0)
+        if kind == 'ids':
+            return {self.numbers[object_id]: 1.0 for object_id in clause['values'] if object_id in self.numbers}
+        if kind == 'match':
+            field, field_query = next(iter(clause.items()))
+            return self.match(field, field_query)
+        if kind == 'bool':
+            return self._bool(clause)
+        raise ValueError('Unsupported query {0}'.format(kind))
+
+    def _bool(self, clause: dict) -> dict[int, float]:
+        def as_list(value):
+            return value if isinstance(value, list) else [value]
+
+        required = [self.evaluate(query) for query in as_list(clause.get('must', []))]
+        filters = [self.evaluate(query) for query in as_list(clause.get('filter', []))]
+        optional = [self.evaluate(query) for query in as_list(clause.get('should', []))]
+        excluded = set().union(*(self.evaluate(query) for query in as_list(clause.get('must_not', []))))
+        if required or filters:
+            candidates = set.intersection(*(set(scores) for scores in required + filters))
+        else:
+            candidates = set().union(*optional)
+        scores = {}
+        for number in candidates - excluded:
+            scores[number] = sum(part.get(number, 0.0) for part in required + optional)
+        return scores
+
+
+def sort_spec(body: dict, params: dict) -> list[tuple[str, bool]]:
+    """[(field, descending)] from `sort` of the body or the `field:order,...` query parameter."""
+    spec = []
+    for item in body.get('sort') or []:
+        if isinstance(item, str):
+            spec.append((item, False))
+            continue
+        field, order = next(iter(item.items()))
+        order = order.get('order', 'asc') if isinstance(order, dict) else order
+        spec.append((field, order == 'desc'))
+    for item in str(params.get('sort') or '').split(','):
+        if item:
+            field, _, order = item.partition(':')
+            spec.append((field, order == 'desc'))
+    return spec
+
+
+class SortKey:
+    """Orders documents by the sort fields; missing values go last, as in Elasticsearch."""
+
+    __slots__ = ('values',)
+
+    def __init__(self, values: tuple):
+        self.values = values
+
+    def __lt__(self, other: 'SortKey') -> bool:
+        for (value, descending), (other_value, _) in zip(self.values, other.values):
+            if value == other_value:
+                continue
+            if value is None or other_value is None:
+                return other_value is None
+            return value > other_value if descending else value < other_value
+        return False
+
+
+class MemoryStorage(AsyncStorage):
+    """
+    In-process storage over the same documents and query shapes as ElasticService: `match`
+    (with `fuzziness: auto`), `bool`, `ids` and `match_all` queries, sorting by fields,
+    `from`/`size` paging and `search_after`.
+    """
+
+    def __init__(self, documents: dict[str, list[dict]]):
+        self.indexes = {index: MemoryIndex(index_documents) for index, index_documents in documents.items()}
+
+    @classmethod
+    def load(cls, path: str) -> 'MemoryStorage':
+        """From `<index>.ndjson` files in `path`, the export format."""
+        documents = {}
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.ndjson'):
+                with open(os.path.join(path, name), 'rb') as file:
+                    lines = map(orjson.loads, file.read().splitlines())
+                    documents[name[:-len('.ndjson')]] = [line for line in lines if 'cursor' not in line]
+        return cls(documents)
+
+    def put(self, index: str, documents: list[dict]):
+        """Adds or replaces documents by id; the index of `index` is rebuilt."""
+        current = {document['id']: document for document in getattr(self.indexes.get(index), 'documents', [])}
+        current.update((document['id'], document) for document in documents)
+        self.indexes[index] = MemoryIndex(list(current.values()))
+
+    def _index(self, index: str) -> MemoryIndex:
+        return self.indexes[index]
+
+    async def get(self, object_id, **kwargs) -> Optional[Union[Film, FilmById, Genre, Person]]:
+        index = self._index(kwargs['index'])
+        number = index.numbers.get(object_id)
+        if number is None:
+            return None
+        return kwargs['model'](**index.documents[number])
+
+    async def get_many(self, object_ids, **kwargs) -> list[Union[Film, FilmById, Genre, Person]]:
+        index = self._index(kwargs['index'])
+        return [kwargs['model'](**index.documents[index.numbers[object_id]])
+                for object_id in object_ids if object_id in index.numbers]
+
+    async def get_all(self, index, model, body, params):
+        sources = await self.search(index=index, body=body, params=params)
+        return [model(**source) for source in sources]
+
+    async def search(self, index, body, params) -> list[dict]:
+        index = self._index(index)
+        params = params or {}
+        scores = index.evaluate(body.get('query') or {'match_all': {}})
+        spec = sort_spec(body, params)
+        if spec:
+            def key(number):
+                document = index.documents[number]
+                values = tuple((document.get(field), descending) for field, descending in spec)
+                return SortKey(values + ((number, False),))
+        else:
+            def key(number):
+                return SortKey(((scores[number], True), (number, False)))
+        numbers = sorted(scores, key=key)
+        if body.get('search_after') is not None and spec:
+            after = SortKey(tuple(zip(body['search_after'], (descending for _, descending in spec))))
+            numbers = [number for number in numbers if after < SortKey(key(number).values[:len(spec)])]
+        start = int(params.get('from', body.get('from', 0)) or 0)
+        size = int(params.get('size', body.get('size', 10)))
+        return [index.documents[number] for number in numbers[start:start + size]]
@@ -0,0 +1,307 @@
+import asyncio
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from elasticsearch import ConnectionError, TransportError
+
+from api.routes import LISTING, LOOKUP, SEARCH
+from core import config
+from core.config import logger
+from storage.basic_storage import AsyncStorage
+
+
+class StorageUnavailable(Exception):
+    """The storage is failing or the circuit breaker is open."""
+
+
+class StorageOverloaded(StorageUnavailable):
+    """The worker already has as many storage calls in flight as its concurrency limit allows."""
+
+
+# Route class of the API request being served, set by api.concurrency.AdaptiveConcurrencyMiddleware.
+# Calls made outside API requests (warming, catalogue refreshes) and by exports are not limited.
+route_kind: ContextVar[Optional[str]] = ContextVar('route_kind', default=None)
+
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if len(self.samples) < 20:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens when the share of failed or slow calls among the last `window` calls exceeds its
+    threshold. While open all calls are rejected; after `open_seconds` one probe call is let
+    through (half-open) and its outcome closes or reopens the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int = config.ES_BREAKER_WINDOW, min_calls: int = config.ES_BREAKER_MIN_CALLS,
+                 failure_ratio: float = config.ES_BREAKER_FAILURE_RATIO,
+                 slow_ratio: float = config.ES_BREAKER_SLOW_RATIO,
+                 slow_call_ms: float = config.ES_BREAKER_SLOW_MS,
+                 open_seconds: float = config.ES_BREAKER_OPEN_SECONDS):
+        self.outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_ratio = slow_ratio
+        self.slow_call = slow_call_ms / 1000
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+            self.probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, seconds: float, failed: bool):
+        slow = seconds >= self.slow_call
+        if self.state == self.HALF_OPEN:
+            if failed or slow:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+                logger.info('Elasticsearch circuit breaker closed')
+            return
+        self.outcomes.append((failed, slow))
+        if len(self.outcomes) < self.min_calls:
+            return
+        failures = sum(failed for failed, _ in self.outcomes) / len(self.outcomes)
+        slow_calls = sum(slow for _, slow in self.outcomes) / len(self.outcomes)
+        if failures >= self.failure_ratio or slow_calls >= self.slow_ratio:
+            self._open()
+
+    def cancelled(self):
+        """A cancelled call says nothing about the storage: a half-open breaker lets the next probe through."""
+        if self.state == self.HALF_OPEN:
+            self.probing = False
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.opened += 1
+            logger.warning('Elasticsearch circuit breaker opened')
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+
+    def snapshot(self) -> dict:
+        return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected}
+
+
+class ConcurrencyLimiter:
+    """
+    AIMD limit of the storage calls a worker has in flight.
+
+    A call slower than `tolerance` times the median latency of the last `window` calls of its
+    route class (and slower than `min_latency`), or a failed one, shrinks the limit by `backoff`,
+    at most once per `backoff_interval`; every other call grows it by 1/limit, about +1 per
+    limit's worth of calls. Cache hits never reach the storage, so they neither take slots nor
+    move the median. Classes are admitted up to a share of the limit, so cheap id lookups keep
+    headroom when listings and fuzzy searches are already rejected.
+    """
+
+    def __init__(self, initial_limit: float = config.CONCURRENCY_INITIAL_LIMIT,
+                 min_limit: float = config.CONCURRENCY_MIN_LIMIT, max_limit: float = config.CONCURRENCY_MAX_LIMIT,
+                 backoff: float = config.CONCURRENCY_BACKOFF, tolerance: float = config.CONCURRENCY_LATENCY_TOLERANCE,
+                 min_latency_ms: float = config.CONCURRENCY_MIN_LATENCY_MS,
+                 backoff_interval_ms: float = config.CONCURRENCY_BACKOFF_INTERVAL_MS,
+                 window: int = config.CONCURRENCY_LATENCY_WINDOW, shares: dict = None):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.min_latency = min_latency_ms / 1000
+        self.backoff_interval = backoff_interval_ms / 1000
+        self.window = window
+        self.shares = shares or {LOOKUP: 1.0, LISTING: config.CONCURRENCY_LISTING_SHARE,
+                                 SEARCH: config.CONCURRENCY_SEARCH_SHARE}
+        self.latencies: dict[str, LatencyWindow] = {}
+        self.in_flight = 0
+        self.last_backoff = 0.0
+        self.admitted = Counter()
+        self.rejected = Counter()
+
+    def acquire(self, kind: str) -> bool:
+        if self.in_flight >= max(1.0, self.limit * self.shares.get(kind, 1.0)):
+            self.rejected[kind] += 1
+            return False
+        self.in_flight += 1
+        self.admitted[kind] += 1
+        return True
+
+    def baseline(self, kind: str) -> Optional[float]:
+        latencies = self.latencies.get(kind)
+        return latencies.percentile(50) if latencies is not None else None
+
+    def release(self, kind: str, seconds: Optional[float] = None, failed: bool = False):
+        """`seconds` is None for calls cancelled before the storage answered: they only free their slot."""
+        self.in_flight -= 1
+        if seconds is None:
+            return
+        baseline = self.baseline(kind)
+        congested = baseline is not None and seconds > max(self.min_latency, baseline * self.tolerance)
+        if not failed:
+            self.latencies.setdefault(kind, LatencyWindow(self.window)).record(seconds)
+        if failed or congested:
+            now = time.monotonic()
+            if now - self.last_backoff >= self.backoff_interval:
+                self.last_backoff = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'admitted': dict(self.admitted),
+            'rejected': dict(self.rejected),
+            'p50_ms': {kind: round((self.baseline(kind) or 0) * 1000, 3) for kind in self.latencies},
+        }
+
+
+def is_failure(error: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx responses count against the breaker; other errors are the caller's."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, TransportError):
+        return not isinstance(error.status_code, int) or error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class ResilientStorage(AsyncStorage):
+    """
+    Wraps a storage with per-operation timeouts and a shared circuit breaker, and hedges id
+    lookups: when a get is not answered within the recent p95 latency, a duplicate request is
+    sent and the first answer wins. Raises StorageUnavailable instead of waiting on a failing
+    cluster, so that callers can fall back to stale cache entries.
+    """
+
+    def __init__(self, storage: AsyncStorage, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[ConcurrencyLimiter] = None,
+                 get_timeout_ms: float = config.ES_GET_TIMEOUT_MS,
+                 search_timeout_ms: float = config.ES_SEARCH_TIMEOUT_MS,
+                 hedge_min_delay_ms: float = config.ES_HEDGE_MIN_DELAY_MS,
+                 hedge_budget: float = config.ES_HEDGE_BUDGET):
+        self.storage = storage
+        self.breaker = breaker or elastic_breaker
+        self.limiter = limiter or storage_limiter
+        self.get_timeout = get_timeout_ms / 1000
+        self.search_timeout = search_timeout_ms / 1000
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_budget = hedge_budget
+        self.latency = get_latency
+        self.calls = 0
+        self.hedged = 0
+
+    async def _call(self, operation, timeout: float, hedge: bool = False):
+        if not self.breaker.allow():
+            raise StorageUnavailable('circuit breaker is open')
+        kind = route_kind.get()
+        if kind is not None and not self.limiter.acquire(kind):
+            self.breaker.cancelled()
+            raise StorageOverloaded('concurrency limit reached')
+        started = time.monotonic()
+        seconds, failed = None, False
+        try:
+            if hedge:
+                result = await asyncio.wait_for(self._hedged(operation), timeout)
+            else:
+                result = await asyncio.wait_for(operation(), timeout)
+            seconds = time.monotonic() - started
+        except asyncio.CancelledError:
+            self.breaker.cancelled()
+            raise
+        except Exception as error:
+            seconds, failed = time.monotonic() - started, is_failure(error)
+            self.breaker.record(seconds, failed=failed)
+            if failed:
+                raise StorageUnavailable(repr(error)) from error
+            raise
+        finally:
+            if kind is not None:
+                self.limiter.release(kind, seconds, failed=failed)
+        self.breaker.record(seconds, failed=False)
+        if hedge:
+            self.latency.record(seconds)
+        return result
+
+    def _hedge_delay(self) -> Optional[float]:
+        p95 = self.latency.percentile(95)
+        if p95 is None or self.hedged >= self.calls * self.hedge_budget:
+            return None
+        return max(p95, self.hedge_min_delay)
+
+    async def _hedged(self, operation):
+        self.calls += 1
+        tasks = [asyncio.ensure_future(operation())]
+        try:
+            delay = self._hedge_delay()
+            if delay is None:
+                return await tasks[0]
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+            self.hedged += 1
+            tasks.append(asyncio.ensure_future(operation()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        return task.result()
+        finally:
+            # Also when the timeout of `_call` cancels the wait: no request outlives its caller.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def get(self, object_id, **kwargs):
+        return await self._call(lambda: self.storage.get(object_id, **kwargs), self.get_timeout, hedge=True)
+
+    async def get_many(self, object_ids, **kwargs):
+        return await self._call(lambda: self.storage.get_many(object_ids, **kwargs), self.get_timeout, hedge=True)
+
+    async def get_all(self, **kwargs):
+        return await self._call(lambda: self.storage.get_all(**kwargs), self.search_timeout)
+
+    async def search(self, **kwargs) -> list[dict]:
+        return await self._call(lambda: self.storage.search(**kwargs), self.search_timeout)
+
+    def snapshot(self) -> dict:
+        p95 = self.latency.percentile(95) or 0
+        return {**self.breaker.snapshot(), 'hedged': self.hedged, 'p95_ms': round(p95 * 1000, 3)}
+
+
+elastic_breaker = CircuitBreaker()
+get_latency = LatencyWindow()
+storage_limiter = ConcurrencyLimiter()
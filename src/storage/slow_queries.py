@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Optional
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+
+from core import config
+from core.config import logger
+from db.sharded_redis import ShardedRedis
+
+SWITCH_KEY = 'slow_queries::profiling'
+PROFILES_KEY = 'slow_queries::profiles'
+
+
+def profile_key(profile_id: str) -> str:
+    return 'slow_queries::profile::{0}'.format(profile_id)
+
+
+class SlowQueryLog:
+    """
+    Slow Elasticsearch searches of this worker.
+
+    Every search whose `took` or round trip is over `threshold_ms` is logged with its full body,
+    times and result size and kept in a bounded list. While profiling is switched on (a Redis
+    key set by an admin, so it reaches every worker and turns itself off when it expires),
+    slow searches and a sample `rate` of the others are run again in the background with
+    `profile: true`, one at a time per worker, and the profile trees are stored in Redis.
+    """
+
+    def __init__(self, redis: ShardedRedis, elastic: AsyncElasticsearch,
+                 threshold_ms: float = config.SLOW_QUERY_MS, kept: int = config.SLOW_QUERY_KEPT,
+                 poll_interval: float = config.SLOW_QUERY_POLL_SECONDS):
+        self.redis = redis
+        self.elastic = elastic
+        self.threshold_ms = threshold_ms
+        self.poll_interval = poll_interval
+        self.records: deque = deque(maxlen=kept)
+        self.searches = 0
+        self.slow = 0
+        self.profile_rate: Optional[float] = None
+        self.profiles = 0
+        self.profiling: Optional[asyncio.Task] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def observe(self, index: str, body: dict, params: dict, response: Optional[dict], seconds: float):
+        """`response` is None for searches cancelled before Elasticsearch answered."""
+        self.searches += 1
+        took_ms = response.get('took', 0) if response is not None else None
+        slow = response is None or max(took_ms, seconds * 1000) >= self.threshold_ms
+        if slow:
+            self.slow += 1
+            record = {
+                'at': time.time(),
+                'index': index,
+                'body': body,
+                'params': params,
+                'took_ms': took_ms,
+                'round_trip_ms': round(seconds * 1000, 3),
+                'cancelled': response is None,
+            }
+            if response is not None:
+                record.update(hits=len(response['hits']['hits']), total=response['hits'].get('total'),
+                              timed_out=response.get('timed_out', False))
+            self.records.append(record)
+            logger.warning('Slow query: {0}'.format(orjson.dumps(record).decode()))
+        if self.profile_rate is not None and self.profiling is None and (slow or random.random() < self.profile_rate):
+            self.profiling = asyncio.ensure_future(self._profile(index, body, params, took_ms))
+
+    async def _profile(self, index: str, body: dict, params: dict, took_ms: Optional[int]):
+        try:
+            response = await self.elastic.search(index=index, doc_type='_doc', body={**(body or {}), 'profile': True},
+                                                 params=params,
+                                                 request_timeout=config.SLOW_QUERY_PROFILE_TIMEOUT_SECONDS)
+            profile_id = '{0}-{1}-{2}'.format(int(time.time() * 1000), os.getpid(), self.profiles)
+            profile = {
+                'id': profile_id,
+                'at': time.time(),
+                'index': index,
+                'body': body,
+                'params': params,
+                'took_ms': took_ms,
+                'profiled_took_ms': response.get('took'),
+                'profile': response.get('profile'),
+            }
+            await self.redis.set(profile_key(profile_id), orjson.dumps(profile),
+                                 expire=config.SLOW_QUERY_PROFILE_TTL_SECONDS)
+            await store_profile_id(self.redis, profile_id, profile['at'])
+            self.profiles += 1
+            logger.info('Query profile {0} stored for index {1}'.format(profile_id, index))
+        except Exception as error:
+            logger.warning('Query profile failed: {0!r}'.format(error))
+        finally:
+            self.profiling = None
+
+    async def refresh(self):
+        value = await self.redis.get(SWITCH_KEY)
+        rate = float(value) if value is not None else None
+        if rate != self.profile_rate:
+            logger.info('Query profiling {0}'.format('off' if rate is None else 'on, rate {0}'.format(rate)))
+        self.profile_rate = rate
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as error:
+                logger.warning('Query profiling switch unavailable: {0!r}'.format(error))
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._poll())
+
+    async def stop(self):
+        for task in (self.task, self.profiling):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            'pid': os.getpid(),
+            'threshold_ms': self.threshold_ms,
+            'searches': self.searches,
+            'slow': self.slow,
+            'profile_rate': self.profile_rate,
+            'profiles': self.profiles,
+            'records': list(self.records),
+        }
+
+
+async def switch_profiling(redis: ShardedRedis, rate: float, seconds: int):
+    """Switches profiling on in all workers for `seconds`, or off when `seconds` is 0."""
+    if seconds > 0:
+        await redis.set(SWITCH_KEY, str(rate), expire=seconds)
+    else:
+        await redis.delete(SWITCH_KEY)
+
+
+async def store_profile_id(redis: ShardedRedis, profile_id: str, at: float):
+    """
+    Indexes a profile by time. The index keeps the newest SLOW_QUERY_PROFILES_KEPT ids and drops
+    the ones whose profiles have expired, so it stays bounded while profiling is kept on.
+    """
+    pipe = redis.pipeline()
+    pipe.zadd(PROFILES_KEY, at, profile_id)
+    pipe.zremrangebyscore(PROFILES_KEY, max=at - config.SLOW_QUERY_PROFILE_TTL_SECONDS)
+    pipe.zremrangebyrank(PROFILES_KEY, 0, -config.SLOW_QUERY_PROFILES_KEPT - 1)
+    pipe.expire(PROFILES_KEY, config.SLOW_QUERY_PROFILE_TTL_SECONDS)
+    await pipe.execute()
+
+
+async def stored_profiles(redis: ShardedRedis) -> list[dict]:
+    profile_ids = await redis.zrevrange(PROFILES_KEY, 0, -1, encoding='utf-8')
+    if not profile_ids:
+        return []
+    values = await redis.mget(*[profile_key(profile_id) for profile_id in profile_ids])
+    return [orjson.loads(value) for value in values if value is not None]
+
+
+slow_query_log: Optional[SlowQueryLog] = None
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import sqlite3
+from typing import Optional, Type, Union
+
+import orjson
+
+from core import config, timing
+from core.config import logger
+from models.models import FilmById, Genre, Person
+
+MANIFEST = 'current.json'
+
+
+class Snapshot:
+    """One published version: a read-only SQLite file of documents by index and id."""
+
+    def __init__(self, directory: str, manifest: dict, mmap_bytes: int):
+        self.version = manifest['version']
+        self.path = os.path.join(directory, manifest['file'])
+        # Published files never change, `immutable` skips locking and change detection.
+        self.connection = sqlite3.connect('file:{0}?mode=ro&immutable=1'.format(self.path), uri=True,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA mmap_size = {0:d}'.format(mmap_bytes))
+        self.documents = self.connection.execute('SELECT count(*) FROM entities').fetchone()[0]
+
+    def get(self, index: str, object_id: str) -> Optional[dict]:
+        row = self.connection.execute('SELECT value FROM entities WHERE idx = ? AND id = ?',
+                                      (index, object_id)).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def close(self):
+        self.connection.close()
+
+
+class SnapshotReader:
+    """
+    Local storage tier for id lookups over the snapshots published by the ETL.
+
+    The ETL writes every version to a new file and then atomically replaces the manifest
+    `current.json`; the reader polls the manifest every `poll_interval` seconds (and on ETL
+    messages), opens the new version and swaps it in, so a lookup sees either the old or the
+    new version and never a partly written one. Ids missing from the snapshot go to the cache
+    and storage as before.
+    """
+
+    def __init__(self, directory: str = config.SNAPSHOT_DIR, poll_interval: float = config.SNAPSHOT_POLL_SECONDS,
+                 mmap_bytes: int = config.SNAPSHOT_MMAP_BYTES):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.mmap_bytes = mmap_bytes
+        self.current: Optional[Snapshot] = None
+        self.manifest_mtime: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.swaps = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def refresh(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self.manifest_mtime:
+                return
+            with open(path, 'rb') as file:
+                manifest = orjson.loads(file.read())
+            if self.current is not None and manifest['version'] == self.current.version:
+                self.manifest_mtime = mtime
+                return
+            snapshot = Snapshot(self.directory, manifest, self.mmap_bytes)
+        except (OSError, ValueError, KeyError, sqlite3.Error) as error:
+            logger.warning('Snapshot not loaded from {0}: {1!r}'.format(self.directory, error))
+            return
+        previous, self.current, self.manifest_mtime = self.current, snapshot, mtime
+        self.swaps += 1
+        if previous is not None:
+            previous.close()
+        logger.info('Snapshot version {0} loaded: {1} documents'.format(snapshot.version, snapshot.documents))
+
+    def get(self, index: str, object_id: str,
+            model: Type[Union[FilmById, Genre, Person]]) -> Optional[Union[FilmById, Genre, Person]]:
+        if self.current is None:
+            return None
+        try:
+            document = self.current.get(index, object_id)
+        except sqlite3.Error as error:
+            logger.warning('Snapshot lookup failed: {0!r}'.format(error))
+            document = None
+        if document is None:
+            self.misses += 1
+            timing.tier('snapshot', misses=1)
+            return None
+        self.hits += 1
+        timing.tier('snapshot', hits=1)
+        with timing.measure('model'):
+            return model(**document)
+
+    async def on_etl(self, indexes: list[str]):
+        self.refresh()
+
+    async def _poll(self):
+        while True:
+            self.refresh()
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._poll())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.current is not None:
+            self.current.close()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'version': self.current.version if self.current else None,
+            'documents': self.current.documents if self.current else 0,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'swaps': self.swaps,
+        }
+
+
+snapshot_reader: Optional[SnapshotReader] = None
@@ -0,0 +1,89 @@
+"""
+Film lookups through ResilientStorage and ElasticService against the Elasticsearch stand-in
+under fault scenarios, with and without hedging: latency percentiles, unavailable answers,
+hedged requests and the final circuit breaker state. Runs on one machine without Docker,
+every scenario is seeded and repeats exactly.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_chaos
+"""
+import asyncio
+import logging
+import random
+import time
+
+from elasticsearch import AsyncElasticsearch
+
+from models.models import FilmById
+from storage.elastic_storage import ElasticService
+from storage.resilience import CircuitBreaker, LatencyWindow, ResilientStorage, StorageUnavailable
+from tests.functional.testdata.film_data import film_data
+from tests.standins.elastic import ElasticStandIn
+from tests.standins.faults import Faults, Latency
+
+REQUESTS = 600
+CONCURRENCY = 8
+
+SCENARIOS = {
+    'steady': dict(latency=Latency('lognormal', 2, 0.3)),
+    'heavy tail': dict(latency=Latency('pareto', 1, 1.2)),
+    'errors 5%': dict(latency=Latency('lognormal', 2, 0.3), error_rate=0.05),
+    'stalls 1%': dict(latency=Latency('lognormal', 2, 0.3), stall_rate=0.01, stall_seconds=2),
+}
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0.0
+
+
+async def run_scenario(stand_in: ElasticStandIn, es: AsyncElasticsearch, faults: dict, hedge: bool) -> dict:
+    stand_in.faults = Faults(seed=1, **faults)
+    storage = ResilientStorage(ElasticService(es), breaker=CircuitBreaker(), hedge_budget=0.1 if hedge else 0.0)
+    storage.latency = LatencyWindow()
+    rng = random.Random(1)
+    ids = [rng.choice(film_data)['id'] for _ in range(REQUESTS)]
+    latencies, unavailable = [], 0
+
+    async def worker(offset: int):
+        nonlocal unavailable
+        for object_id in ids[offset::CONCURRENCY]:
+            started = time.perf_counter()
+            try:
+                await storage.get(object_id, index='movies', model=FilmById)
+            except StorageUnavailable:
+                unavailable += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker(offset) for offset in range(CONCURRENCY)))
+    ordered = sorted(latencies)
+    return {
+        'p50': percentile(ordered, 50) * 1000,
+        'p99': percentile(ordered, 99) * 1000,
+        'max': ordered[-1] * 1000,
+        'unavailable': unavailable,
+        'hedged': storage.hedged,
+        'breaker': storage.breaker.state,
+    }
+
+
+async def run():
+    logging.getLogger('elasticsearch').setLevel(logging.CRITICAL)
+    stand_in = ElasticStandIn()
+    port = await stand_in.start()
+    # No client retries: the wrapper decides what to do about a failed call.
+    es = AsyncElasticsearch(hosts=['127.0.0.1:{0}'.format(port)], max_retries=0)
+    print('{0:<12} {1:<6} {2:>8} {3:>8} {4:>8} {5:>12} {6:>7} {7:>10}'.format(
+        'scenario', 'hedge', 'p50, ms', 'p99, ms', 'max, ms', 'unavailable', 'hedged', 'breaker'))
+    try:
+        for name, faults in SCENARIOS.items():
+            for hedge in (False, True):
+                result = await run_scenario(stand_in, es, faults, hedge)
+                print('{0:<12} {1:<6} {p50:>8.1f} {p99:>8.1f} {max:>8.1f} {unavailable:>12} {hedged:>7} '
+                      '{breaker:>10}'.format(name, 'on' if hedge else 'off', **result))
+    finally:
+        await es.close()
+        await stand_in.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+"""
+Memory footprint and encode/decode time of cache entries per entry type.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_codec
+"""
+import json
+import timeit
+
+from pydantic.json import pydantic_encoder
+
+from cache.codec import CacheCodec, lz4_frame
+from models.models import Film, FilmById, Genre, Person
+from tests.functional.testdata.film_data import film_data
+from tests.functional.testdata.genre_data import genre_data
+from tests.functional.testdata.person_data import people_data
+
+PAGE_SIZE = 100
+REPEAT = 200
+
+
+def page(data: list, model) -> list:
+    items = [model(**row) for row in data]
+    return (items * (PAGE_SIZE // len(items) + 1))[:PAGE_SIZE]
+
+
+ENTRIES = {
+    'film by id': FilmById(**film_data[0]),
+    'person by id': Person(**people_data[0]),
+    'films page': page(film_data, Film),
+    'persons page': page(people_data, Person),
+    'genres page': page(genre_data, Genre),
+}
+
+CODECS = {
+    'stdlib json': None,
+    'orjson': CacheCodec(compression='none'),
+    'orjson+zlib': CacheCodec(compress_threshold=0, compression='zlib'),
+    'default': CacheCodec(),
+}
+if lz4_frame is not None:
+    CODECS['orjson+lz4'] = CacheCodec(compress_threshold=0, compression='lz4')
+
+
+def measure(codec, value):
+    if codec is None:
+        encode = lambda: json.dumps(value, default=pydantic_encoder).encode()
+        data = encode()
+        decode = lambda: json.loads(data)
+    else:
+        encode = lambda: codec.encode(value)
+        data = encode()
+        decode = lambda: codec.decode(data)
+    encode_us = timeit.timeit(encode, number=REPEAT) / REPEAT * 1e6
+    decode_us = timeit.timeit(decode, number=REPEAT) / REPEAT * 1e6
+    return len(data), encode_us, decode_us
+
+
+def main():
+    print('{0:<14} {1:<12} {2:>9} {3:>11} {4:>11}'.format('entry', 'codec', 'bytes', 'encode, us', 'decode, us'))
+    for entry_name, value in ENTRIES.items():
+        for codec_name, codec in CODECS.items():
+            size, encode_us, decode_us = measure(codec, value)
+            print('{0:<14} {1:<12} {2:>9} {3:>11.1f} {4:>11.1f}'.format(entry_name, codec_name, size,
+                                                                       encode_us, decode_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Key distribution and remapping of the consistent hashing ring of the sharded cache.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_ring
+"""
+from collections import Counter
+
+from db.sharded_redis import HashRing
+
+KEYS = ['movies::guid::{0}'.format(i) for i in range(100000)]
+NODES = ['redis-{0}:6379'.format(i) for i in range(1, 5)]
+
+
+def distribution(ring: HashRing) -> dict:
+    counts = Counter(ring.get(key) for key in KEYS)
+    return {node: round(count / len(KEYS), 4) for node, count in sorted(counts.items())}
+
+
+def remapped(before: HashRing, after: HashRing) -> float:
+    return sum(before.get(key) != after.get(key) for key in KEYS) / len(KEYS)
+
+
+def main():
+    for vnodes in (40, 160, 640):
+        ring = HashRing(NODES, vnodes=vnodes)
+        grown = HashRing(NODES + ['redis-5:6379'], vnodes=vnodes)
+        shrunk = HashRing(NODES[:-1], vnodes=vnodes)
+        print('vnodes={0}'.format(vnodes))
+        print('  share per node:   {0}'.format(distribution(ring)))
+        print('  remapped on add:  {0:.3f} (ideal {1:.3f})'.format(remapped(ring, grown), 1 / (len(NODES) + 1)))
+        print('  remapped on drop: {0:.3f} (ideal {1:.3f})'.format(remapped(ring, shrunk), 1 / len(NODES)))
+
+
+if __name__ == '__main__':
+    main()
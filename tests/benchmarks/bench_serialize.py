@@ -0,0 +1,80 @@
+"""
+CPU time per endpoint to turn service results into response bytes: FastAPI's response_model
+validation, jsonable_encoder and ORJSONResponse against the orjson fast path, plus reading
+cache entries back with validation against `construct`.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_serialize
+"""
+import asyncio
+import timeit
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.models import Film, FilmById, Genre, Person, model_encoder
+from tests.functional.testdata.film_data import film_data
+from tests.functional.testdata.genre_data import genre_data
+from tests.functional.testdata.person_data import people_data
+
+PAGE_SIZE = 100
+REPEAT = 200
+
+
+def page(data: list, model) -> list:
+    items = [model(**row) for row in data]
+    return (items * (PAGE_SIZE // len(items) + 1))[:PAGE_SIZE]
+
+
+# endpoint -> (response model, service result)
+ENDPOINTS = {
+    'GET /films/{id}': (FilmById, FilmById(**film_data[0])),
+    'GET /people/{id}': (Person, Person(**people_data[0])),
+    'GET /genres/{id}': (Genre, Genre(**genre_data[0])),
+    'GET /films/': (list[Film], page(film_data, Film)),
+    'GET /people/': (list[Person], page(people_data, Person)),
+    'GET /genres/': (list[Genre], page(genre_data, Genre)),
+}
+
+
+def fastapi_path(response_model, content) -> bytes:
+    field = create_response_field(name='response', type_=response_model)
+    loop = asyncio.new_event_loop()
+
+    def run():
+        data = loop.run_until_complete(serialize_response(field=field, response_content=content))
+        return ORJSONResponse(data).body
+    return run
+
+
+def fast_path(content) -> bytes:
+    return lambda: orjson.dumps(content, default=model_encoder)
+
+
+def cache_read(response_model, content):
+    model = getattr(response_model, '__args__', (response_model,))[0]
+    rows = orjson.loads(orjson.dumps(content, default=model_encoder))
+    rows = rows if isinstance(rows, list) else [rows]
+    return (lambda: [model.parse_obj(row) for row in rows]), (lambda: [model.construct(**row) for row in rows])
+
+
+def per_call_us(function) -> float:
+    return timeit.timeit(function, number=REPEAT) / REPEAT * 1e6
+
+
+def main():
+    print('{0:<18} {1:>12} {2:>12} {3:>14} {4:>14}'.format('endpoint', 'fastapi, us', 'orjson, us',
+                                                            'parse_obj, us', 'construct, us'))
+    for endpoint, (response_model, content) in ENDPOINTS.items():
+        fastapi_run = fastapi_path(response_model, content)
+        assert orjson.loads(fastapi_run()) == orjson.loads(fast_path(content)())
+        parse, construct = cache_read(response_model, content)
+        print('{0:<18} {1:>12.1f} {2:>12.1f} {3:>14.1f} {4:>14.1f}'.format(
+            endpoint, per_call_us(fastapi_run), per_call_us(fast_path(content)),
+            per_call_us(parse), per_call_us(construct)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Shared memory cache: get/put time in one process, then several processes reading and writing
+the same table at once, checking that no read returns a value of another key or a torn value.
+Prints the occupancy and collision statistics of the table at the end.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_shared_memory
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from cache.shared_memory import SharedTable
+
+SLOTS = 4096
+SLOT_BYTES = 1024
+KEYS = 6000
+PROCESSES = 3
+OPERATIONS = 20000
+
+
+def value_for(key: str, version: int) -> bytes:
+    body = '{0}:{1}:'.format(key, version).encode()
+    return body + b'x' * (300 - len(body))
+
+
+def worker(path: str, seed: int, queue):
+    table = SharedTable.open(path, SLOTS, SLOT_BYTES, ttl=60)
+    rng = random.Random(seed)
+    bad = 0
+    for operation in range(OPERATIONS):
+        key = 'movies::guid::{0}'.format(int(rng.paretovariate(1.0)) % KEYS)
+        if rng.random() < 0.2:
+            table.put(key, value_for(key, operation))
+            continue
+        value = table.get(key)
+        if value is not None and (not value.startswith(key.encode() + b':') or len(value) != 300):
+            bad += 1
+    queue.put({'hits': table.hits, 'misses': table.misses, 'writes': table.writes, 'collisions': table.collisions,
+               'torn_reads': table.torn_reads, 'bad_values': bad})
+    table.close()
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'table')
+    table = SharedTable.open(path, SLOTS, SLOT_BYTES, ttl=60)
+    keys = ['movies::guid::{0}'.format(number) for number in range(2000)]
+    started = time.perf_counter()
+    for key in keys:
+        table.put(key, value_for(key, 0))
+    put_us = (time.perf_counter() - started) / len(keys) * 1e6
+    started = time.perf_counter()
+    for key in keys:
+        table.get(key)
+    get_us = (time.perf_counter() - started) / len(keys) * 1e6
+    print('put {0:.1f} us, get {1:.1f} us'.format(put_us, get_us))
+
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, seed, queue)) for seed in range(PROCESSES)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    print('{0} processes, {1} operations each in {2:.2f} s'.format(PROCESSES, OPERATIONS, elapsed))
+    for result in results:
+        print(result)
+    print({**table.occupancy(), **table.snapshot()})
+    table.close()
+    os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Query time of the in-memory storage for the query shapes the services send to Elasticsearch.
+
+Run from the project root:
+    PYTHONPATH=src python -m tests.benchmarks.bench_storage
+"""
+import asyncio
+import time
+
+from models.models import Film, FilmById
+from tests.functional.testdata.film_data import film_data
+from tests.standins.testdata import functional_storage
+
+REPEAT = 2000
+
+QUERIES = {
+    'match_all sorted': ({'query': {'match_all': {}}}, {'size': 50, 'from': 0, 'sort': 'imdb_rating:desc'}),
+    'fuzzy title': ({'query': {'match': {'title': {'query': 'stars', 'fuzziness': 'auto'}}}}, {'size': 50}),
+    'fuzzy genre': ({'query': {'match': {'genre': {'query': 'acton', 'fuzziness': 'auto'}}}}, {'size': 50}),
+    'ids': ({'query': {'ids': {'values': [row['id'] for row in film_data[:10]]}}}, {'size': 10}),
+    'search_after': ({'query': {'match_all': {}}, 'sort': [{'id': 'asc'}], 'search_after': [film_data[0]['id']]},
+                     {'size': 100}),
+}
+
+
+async def measure(coro_factory) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        await coro_factory()
+    return (time.perf_counter() - started) / REPEAT * 1e6
+
+
+async def run():
+    started = time.perf_counter()
+    storage = functional_storage()
+    print('loaded in {0:.1f} ms'.format((time.perf_counter() - started) * 1000))
+    print('{0:<18} {1:>8} {2:>10}'.format('query', 'hits', 'time, us'))
+    for name, (body, params) in QUERIES.items():
+        hits = len(await storage.search(index='movies', body=body, params=params))
+        elapsed = await measure(lambda: storage.search(index='movies', body=body, params=params))
+        print('{0:<18} {1:>8} {2:>10.1f}'.format(name, hits, elapsed))
+    film_id = film_data[0]['id']
+    elapsed = await measure(lambda: storage.get(film_id, index='movies', model=FilmById))
+    print('{0:<18} {1:>8} {2:>10.1f}'.format('get', 1, elapsed))
+    elapsed = await measure(lambda: storage.get_all('movies', Film, *QUERIES['match_all sorted']))
+    print('{0:<18} {1:>8} {2:>10.1f}'.format('get_all', len(film_data), elapsed))
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,239 @@
+"""
+Closed-loop load generator: RPS and latency percentiles per endpoint, cache-hot and cache-cold.
+
+Each of `--concurrency` workers sends requests back to back for `--duration` seconds. Ids and
+search words come from the app's own export endpoints and are drawn with a Zipf (or uniform)
+distribution. In the cold state Redis is flushed before every scenario and each id or search
+word is requested once at most, in the hot state every key is requested once before measuring.
+Results are written as JSON, a previous result file can be passed to print the differences.
+RPS and latencies count 2xx responses only; other statuses are reported separately, and the run
+fails when their share in a scenario is above `--max-non-2xx`.
+
+Start the app with every rate limit class above the generated load, e.g.
+RATE_LIMIT_LOOKUP=1000000/1 RATE_LIMIT_LISTING=1000000/1 RATE_LIMIT_SEARCH=1000000/1, then
+run from the project root against it and its Redis and Elasticsearch:
+    PYTHONPATH=src python -m tests.benchmarks.load --url http://127.0.0.1:8000 --output load.json
+    PYTHONPATH=src python -m tests.benchmarks.load --state cold --baseline load.json
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+import aiohttp
+import aioredis
+import orjson
+
+SCENARIOS = ('films', 'films_search', 'film_by_id', 'person_films')
+
+
+class Zipf:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+    def __call__(self) -> int:
+        return bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+class Uniform:
+    def __init__(self, n: int, rng: random.Random):
+        self.n = n
+        self.rng = rng
+
+    def __call__(self) -> int:
+        return self.rng.randrange(self.n)
+
+
+class Sequence:
+    """Every key once, in random order; used for the cold state."""
+
+    def __init__(self, n: int, rng: random.Random):
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.position = itertools.count()
+
+    def __call__(self) -> Optional[int]:
+        position = next(self.position)
+        return self.order[position] if position < len(self.order) else None
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def exported(session: aiohttp.ClientSession, url: str, resource: str) -> list[dict]:
+    async with session.get('{0}/api/v1/{1}/export'.format(url, resource)) as response:
+        body = await response.read()
+    return [line for line in map(orjson.loads, body.splitlines()) if 'cursor' not in line]
+
+
+async def load_keys(session: aiohttp.ClientSession, url: str) -> dict[str, list[str]]:
+    films = await exported(session, url, 'films')
+    people = await exported(session, url, 'people')
+    words = sorted({word for film in films for word in film['title'].split() if len(word) > 3})
+    return {
+        'films': ['?page[number]={0}&page[size]=50'.format(page) for page in range(1, 11)],
+        'films_search': ['search/?title={0}'.format(word) for word in words],
+        'film_by_id': [film['id'] for film in films],
+        'person_films': ['{0}/films/'.format(person['id']) for person in people],
+    }
+
+
+def paths(scenario: str, keys: list[str]) -> list[str]:
+    resource = 'people' if scenario == 'person_films' else 'films'
+    return ['/api/v1/{0}/{1}'.format(resource, key) for key in keys]
+
+
+async def run_scenario(session: aiohttp.ClientSession, url: str, urls: list[str], draw: Callable,
+                       concurrency: int, duration: float) -> dict:
+    latencies, statuses, errors = [], Counter(), Counter()
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            rank = draw()
+            if rank is None:
+                return
+            started = time.perf_counter()
+            try:
+                async with session.get(url + urls[rank]) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                errors[type(error).__name__] += 1
+                continue
+            # 429 and 503 come back fast and would make the rejections look like throughput.
+            if 200 <= response.status < 300:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    ordered = sorted(latencies)
+    sent = sum(statuses.values()) + sum(errors.values())
+    failed = sent - len(latencies)
+    return {
+        'requests': len(latencies),
+        'non_2xx': failed,
+        'non_2xx_share': round(failed / sent, 4) if sent else 0.0,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': dict(errors),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p90_ms': round(percentile(ordered, 90) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+async def flush_redis(redis_url: str):
+    redis = await aioredis.create_redis(redis_url)
+    await redis.flushdb()
+    redis.close()
+    await redis.wait_closed()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    results = {}
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        keys = await load_keys(session, args.url)
+        for scenario in args.scenarios:
+            urls = paths(scenario, keys[scenario])
+            if not urls:
+                continue
+            if args.state == 'cold':
+                await flush_redis(args.redis)
+                draw = Sequence(len(urls), rng)
+            else:
+                await run_scenario(session, args.url, urls, Sequence(len(urls), rng), args.concurrency, args.duration)
+                draw = Zipf(len(urls), args.zipf_s, rng) if args.distribution == 'zipf' else Uniform(len(urls), rng)
+            results[scenario] = {'keys': len(urls), **await run_scenario(session, args.url, urls, draw,
+                                                                         args.concurrency, args.duration)}
+    return {
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'config': {name: getattr(args, name) for name in ('url', 'state', 'concurrency', 'duration', 'distribution',
+                                                          'zipf_s', 'seed')},
+        'results': results,
+    }
+
+
+def compare(result: dict, baseline: dict):
+    print('{0:<14} {1:>18} {2:>18} {3:>18}'.format('scenario', 'rps', 'p50, ms', 'p99, ms'))
+    for scenario, current in result['results'].items():
+        before = baseline.get('results', {}).get(scenario)
+        if before is None:
+            continue
+        cells = []
+        for metric in ('rps', 'p50_ms', 'p99_ms'):
+            change = (current[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            cells.append('{0:.1f} ({1:+.1f}%)'.format(current[metric], change))
+        print('{0:<14} {1:>18} {2:>18} {3:>18}'.format(scenario, *cells))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--redis', default='redis://127.0.0.1:6379', help='flushed before cold scenarios')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--state', choices=('hot', 'cold'), default='hot')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    parser.add_argument('--distribution', choices=('zipf', 'uniform'), default='zipf')
+    parser.add_argument('--zipf-s', type=float, default=1.1)
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per request')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-non-2xx', type=float, default=0.01,
+                        help='largest share of non-2xx responses and errors per scenario')
+    parser.add_argument('--output', help='write the JSON result to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON result of an earlier run to compare with')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    result = asyncio.run(run(args))
+    data = orjson.dumps(result, option=orjson.OPT_INDENT_2)
+    if args.output:
+        with open(args.output, 'wb') as file:
+            file.write(data)
+    else:
+        print(data.decode())
+    if args.baseline:
+        with open(args.baseline, 'rb') as file:
+            compare(result, orjson.loads(file.read()))
+    rejected = {scenario: current['statuses'] for scenario, current in result['results'].items()
+                if current['non_2xx_share'] > args.max_non_2xx}
+    for scenario, statuses in rejected.items():
+        print('{0}: {1:.1%} of responses are not 2xx {2}, raise the RATE_LIMIT_* and CONCURRENCY_* limits'.format(
+            scenario, result['results'][scenario]['non_2xx_share'], statuses), file=sys.stderr)
+    if rejected:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from settings import TestSettings
@@ -22,3 +24,34 @@ def make_get_request(session):
             return body, status
 
     return inner
+
+
+@pytest.fixture(scope='session')
+def make_raw_get_request(session):
+    async def inner(path: str, params: dict = None, headers: dict = None):
+        params = params or {}
+        url = '{protocol}://{host}:{port}/api/v1/{path}'.format(
+            protocol='http',
+            host=settings.service_host,
+            port=settings.service_port,
+            path=path
+        )
+        async with session.get(url, params=params, headers=headers) as response:
+            body = await response.read()
+            return body, response.status, response.headers
+
+    return inner
+
+
+@pytest.fixture(scope='session')
+def get_cached(redis_client):
+    """The API writes to the cache in the background, so the entry may appear a few ms after the response."""
+    async def inner(key: str, attempts: int = 20):
+        for _ in range(attempts):
+            res = await redis_client.get(key)
+            if res is not None:
+                return res
+            await asyncio.sleep(0.01)
+        return None
+
+    return inner
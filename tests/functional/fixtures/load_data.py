@@ -5,7 +5,7 @@ import utils.helper as util
 
 
 @pytest.fixture(scope='session', autouse=True)
-async def load_data(es_client):
+async def load_data(es_client, redis_client):
     indexes = index_map.ind_data
     for i in indexes.keys():
         bulk_query = await util.get_es_bulk_query(indexes[i], i)
@@ -13,3 +13,5 @@ async def load_data(es_client):
         response = await es_client.bulk(str_query, refresh=True)
         if response['errors']:
             raise Exception('Ошибка записи данных в Elasticsearch')
+    # Announced like the ETL does, so that the workers reload what they keep in memory.
+    await redis_client.publish('etl::completed', ','.join(indexes.keys()))
@@ -4,6 +4,9 @@ from http import HTTPStatus
 import pytest
 
 import testdata.film_data as film
+from settings import TestSettings
+
+settings = TestSettings()
 
 
 @pytest.mark.parametrize(
@@ -55,11 +58,108 @@ async def test_film_page_wrong(make_get_request):
 
 
 @pytest.mark.asyncio
-async def test_film_cache(make_get_request, redis_client):
+async def test_film_cache(make_get_request, get_cached):
     _, _ = await make_get_request('films/' + str(film.film_id))
     redis_key = "movies::guid::{id_}".format(id_=film.film_id)
 
-    res = await redis_client.get(redis_key)
-    res = json.loads(res.decode('utf8'))
+    res = await get_cached(redis_key)
+    # The first byte is the cache codec header: version 1, plain JSON payload.
+    assert res[0] == 0x10
+    res = json.loads(res[1:].decode('utf8'))
 
     assert res['id'] == film.film_id
+
+
+@pytest.mark.asyncio
+async def test_film_client_cache_invalidated(make_get_request, get_cached, redis_client):
+    redis_key = "movies::guid::{id_}".format(id_=film.film_id)
+    _, _ = await make_get_request('films/' + str(film.film_id))
+    cached = await get_cached(redis_key)
+    # Served from the in-process copy now, changing the key must drop it.
+    _, _ = await make_get_request('films/' + str(film.film_id))
+
+    changed = json.loads(cached[1:].decode('utf8'))
+    changed['title'] = 'Changed title'
+    await redis_client.set(redis_key, cached[:1] + json.dumps(changed).encode('utf8'), expire=60)
+
+    body, status = await make_get_request('films/' + str(film.film_id))
+    assert status == HTTPStatus.OK
+    assert body['title'] == 'Changed title'
+    await redis_client.delete(redis_key)
+
+
+@pytest.mark.asyncio
+async def test_film_not_modified(make_raw_get_request):
+    body, status, headers = await make_raw_get_request('films/' + str(film.film_id))
+    assert status == HTTPStatus.OK
+    assert 'max-age' in headers['Cache-Control']
+    etag = headers['ETag']
+
+    body, status, headers = await make_raw_get_request('films/' + str(film.film_id),
+                                                       headers={'If-None-Match': etag})
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert body == b''
+    assert headers['ETag'] == etag
+
+
+@pytest.mark.asyncio
+async def test_film_list_cache_stores_ids(make_get_request, get_cached):
+    body, status = await make_get_request('films/?page[size]=50&page[number]=1')
+    assert status == HTTPStatus.OK
+
+    res = await get_cached('movies::list')
+    res = json.loads(res[1:].decode('utf8'))
+
+    assert res == [elem['id'] for elem in body]
+
+
+@pytest.mark.asyncio
+async def test_film_not_found_cache(make_get_request, get_cached, redis_client):
+    body, status = await make_get_request('films/' + str(film.film_id_not_ex))
+    assert status == HTTPStatus.NOT_FOUND
+
+    res = await get_cached("movies::guid::{id_}".format(id_=film.film_id_not_ex))
+    # Negative entries are a bare codec header: version 1, format "not found".
+    assert res == b'\x13'
+    assert 0 < await redis_client.ttl("movies::guid::{id_}".format(id_=film.film_id_not_ex)) <= 30
+
+
+@pytest.mark.asyncio
+async def test_film_search_populates_film_cache(make_get_request, get_cached):
+    body, status = await make_get_request('films/search/?title={}&page[size]=50&page[number]=1'.format(
+        film.search_film_text))
+    assert status == HTTPStatus.OK
+
+    res = await get_cached("movies::guid::{id_}".format(id_=body[0]['id']))
+    res = json.loads(res[1:].decode('utf8'))
+
+    assert res['id'] == body[0]['id']
+    assert 'description' in res
+
+
+@pytest.mark.asyncio
+async def test_film_export(make_raw_get_request):
+    body, status, headers = await make_raw_get_request('films/export')
+    assert status == HTTPStatus.OK
+    assert headers['Content-Type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in body.decode('utf8').splitlines()]
+    films = [line for line in lines if 'cursor' not in line]
+    assert sorted(line['id'] for line in films) == sorted(row['id'] for row in film.film_data)
+    assert 'cursor' in lines[-1]
+
+    body, status, _ = await make_raw_get_request('films/export', params={'cursor': lines[-1]['cursor']})
+    assert status == HTTPStatus.OK
+    assert body == b''
+
+    _, status, _ = await make_raw_get_request('films/export', params={'cursor': 'not-a-cursor'})
+    assert status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_film_server_timing(session):
+    url = 'http://{host}:{port}/api/v1/films/{film_id}'.format(host=settings.service_host,
+                                                               port=settings.service_port, film_id=film.film_id)
+    async with session.get(url, headers={'X-Server-Timing': '1', 'X-Admin-Token': settings.admin_token}) as response:
+        assert response.status == HTTPStatus.OK
+        assert 'total;dur=' in response.headers['Server-Timing']
+
@@ -1,9 +1,12 @@
-import json
+import asyncio
 from http import HTTPStatus
 
 import pytest
 
 import testdata.genre_data as genre
+from settings import TestSettings
+
+settings = TestSettings()
 
 
 @pytest.mark.parametrize(
@@ -54,11 +57,23 @@ async def test_film_page_wrong(make_get_request):
 
 
 @pytest.mark.asyncio
-async def test_genre_cache(make_get_request, redis_client):
-    _, _ = await make_get_request('genres/' + str(genre.genre_id))
+async def test_genre_catalogue(make_get_request, get_cached, redis_client, session):
+    url = 'http://{0}:{1}/health/ready'.format(settings.service_host, settings.service_port)
+    for _ in range(30):
+        async with session.get(url) as response:
+            if (await response.json())['genre_catalogue']['genres'] == len(genre.genre_data):
+                break
+        await asyncio.sleep(0.5)
     redis_key = "genre::guid::{id_}".format(id_=genre.genre_id)
+    await redis_client.delete(redis_key)
 
-    res = await redis_client.get(redis_key)
-    res = json.loads(res.decode('utf8'))
+    body, status = await make_get_request('genres/' + str(genre.genre_id))
+    assert status == HTTPStatus.OK
+    assert body == genre.genre_id_res
+    # Served from the worker's memory, the cache is not involved.
+    assert await get_cached(redis_key, attempts=5) is None
 
-    assert res['id'] == genre.genre_id
+    body, status = await make_get_request('genres/search/?name={}&page[size]=50&page[number]=1'.format(
+        genre.search_genre_text))
+    assert status == HTTPStatus.OK
+    assert body == genre.search_genre_text_res
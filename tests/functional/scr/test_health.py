@@ -0,0 +1,35 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from settings import TestSettings
+
+settings = TestSettings()
+
+
+def health_url(path: str) -> str:
+    return 'http://{host}:{port}/health/{path}'.format(host=settings.service_host, port=settings.service_port,
+                                                       path=path)
+
+
+@pytest.mark.asyncio
+async def test_live(session):
+    async with session.get(health_url('live')) as response:
+        assert response.status == HTTPStatus.OK
+        assert (await response.json())['alive'] is True
+
+
+@pytest.mark.asyncio
+async def test_ready(session):
+    # The app may have started before the test indexes existed, failed checks are retried every few seconds.
+    for _ in range(30):
+        async with session.get(health_url('ready')) as response:
+            body = await response.json()
+            if response.status == HTTPStatus.OK:
+                break
+        await asyncio.sleep(0.5)
+    assert response.status == HTTPStatus.OK
+    assert body['ready'] is True
+    assert body['checks']['elasticsearch:movies']['ok'] is True
+    assert any(name.startswith('redis:') for name in body['checks'])
@@ -105,31 +105,33 @@ async def test_person_page_size_too_wrong(make_get_request):
 
 
 @pytest.mark.asyncio
-async def test_person_cache(make_get_request, redis_client):
+async def test_person_cache(make_get_request, get_cached):
     _, _ = await make_get_request('people/' + str(person.person_id))
     redis_key = "person::guid::{id_}".format(id_=person.person_id)
-    res = await redis_client.get(redis_key)
-    res = json.loads(res.decode('utf8'))
+    res = await get_cached(redis_key)
+    # The first byte is the cache codec header: version 1, plain JSON payload.
+    assert res[0] == 0x10
+    res = json.loads(res[1:].decode('utf8'))
     assert res['id'] == person.person_id
 
 
 @pytest.mark.asyncio
-async def test_people_cache(make_get_request, redis_client):
+async def test_people_cache(make_get_request, get_cached):
     _, _ = await make_get_request('people/?page[size]=60&page[number]=1')
-    redis_key = "person::page_size::60::page_number::1::role::None::name::None"
+    redis_key = "person::list::page_size=60"
 
-    res = await redis_client.get(redis_key)
-    res = orjson.loads(res.decode('utf8'))
+    res = await get_cached(redis_key)
+    res = orjson.loads(res[1:])
 
-    assert res == person.people_data
+    assert res == [elem['id'] for elem in person.people_data]
 
 
 @pytest.mark.asyncio
-async def test_person_film_cache(make_get_request, redis_client):
+async def test_person_film_cache(make_get_request, get_cached):
     body, _ = await make_get_request('people/' + str(person.person_film_id) + '/films')
     redis_key = "person::films::guid::{id_}".format(id_=person.person_film_id)
 
-    res = await redis_client.get(redis_key)
-    res = json.loads(res.decode('utf8'))
+    res = await get_cached(redis_key)
+    res = json.loads(res[1:].decode('utf8'))
 
-    assert res == person.person_film_id_res
+    assert res == [elem['id'] for elem in person.person_film_id_res]
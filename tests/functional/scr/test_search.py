@@ -123,3 +123,31 @@ async def test_search_person_textnamerole(make_get_request, main_status, text_na
     body, status = await make_get_request('people/search/?name={}&role={}&page[size]=50&page[number]=1'.format(text_name, text_role))
     assert status == main_status
     assert body == expected_answer
+
+
+@pytest.mark.asyncio
+async def test_search_cache_key_normalized(make_get_request, get_cached):
+    body, status = await make_get_request('films/search/?title={}&page[size]=50&page[number]=1'.format(
+        '  ' + film.search_film_text.upper() + ' '))
+    assert status == HTTPStatus.OK
+    assert body == film.search_film_text_res
+
+    redis_key = 'movies::list::title={0}'.format(film.search_film_text.casefold())
+    assert await get_cached(redis_key)
+
+
+@pytest.mark.asyncio
+async def test_search_rate_limited(make_raw_get_request):
+    headers = {'X-API-Key': 'test-search-rate-limit'}
+    path = 'films/search/?title={}'.format(film.search_film_text)
+    _, status, response_headers = await make_raw_get_request(path, headers=headers)
+    assert status == HTTPStatus.OK
+    assert response_headers['RateLimit-Limit'] == '100'
+    assert response_headers['RateLimit-Remaining'] == '99'
+
+    # A token comes back every 0.6s, send a few more than the burst.
+    for _ in range(110):
+        _, status, response_headers = await make_raw_get_request(path, headers=headers)
+    assert status == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(response_headers['Retry-After']) >= 1
+    assert response_headers['RateLimit-Remaining'] == '0'
@@ -8,3 +8,4 @@ class TestSettings(BaseSettings):
     es_port: str = Field("9200", env="ELASTIC_PORT")
     service_host: str = Field('127.0.0.1', env='SERVICE_HOST')
     service_port: str = Field('8000', env='SERVICE_HOST')
+    admin_token: str = Field('test-admin-token', env='ADMIN_TOKEN')
@@ -0,0 +1,59 @@
+"""
+Runs the Elasticsearch and Redis stand-ins until interrupted, e.g. for the API, the ETL or the
+load generator on one machine:
+    PYTHONPATH=src python -m tests.standins --es-latency lognormal:3:0.6 --es-error-rate 0.01 \
+        --es-stall-rate 0.002 --es-stall-seconds 5 --redis-latency fixed:0.2
+"""
+import argparse
+import asyncio
+
+from core.config import logger
+from storage.memory_storage import MemoryStorage
+from tests.standins.elastic import ElasticStandIn
+from tests.standins.faults import Faults, Latency
+from tests.standins.resp import RedisStandIn
+from tests.standins.testdata import functional_storage
+
+
+def faults(args, prefix: str) -> Faults:
+    return Faults(latency=Latency.parse(getattr(args, prefix + '_latency')),
+                  error_rate=getattr(args, prefix + '_error_rate'),
+                  stall_rate=getattr(args, prefix + '_stall_rate'),
+                  stall_seconds=getattr(args, prefix + '_stall_seconds'),
+                  seed=args.seed)
+
+
+async def serve(args):
+    elastic = ElasticStandIn(MemoryStorage.load(args.data) if args.data else functional_storage(), faults(args, 'es'))
+    redis = RedisStandIn(faults(args, 'redis'))
+    await elastic.start(args.host, args.es_port)
+    await redis.start(args.host, args.redis_port)
+    logger.info('Stand-ins: elasticsearch on {0}:{1}, redis on {0}:{2}'.format(args.host, elastic.port, redis.port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await elastic.stop()
+        await redis.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Elasticsearch and Redis stand-ins with injected faults')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--es-port', type=int, default=9200)
+    parser.add_argument('--redis-port', type=int, default=6379)
+    parser.add_argument('--data', help='directory with <index>.ndjson files, the functional test data by default')
+    parser.add_argument('--seed', type=int, default=0)
+    for prefix in ('es', 'redis'):
+        parser.add_argument('--{0}-latency'.format(prefix), default='fixed:0',
+                            help='fixed:MS, uniform:LOW:HIGH, lognormal:MEDIAN:SIGMA or pareto:SCALE:ALPHA')
+        parser.add_argument('--{0}-error-rate'.format(prefix), type=float, default=0.0)
+        parser.add_argument('--{0}-stall-rate'.format(prefix), type=float, default=0.0)
+        parser.add_argument('--{0}-stall-seconds'.format(prefix), type=float, default=30.0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
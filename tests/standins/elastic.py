@@ -0,0 +1,140 @@
+"""
+Elasticsearch stand-in: the part of the HTTP API used by ElasticService, the ETL loader and
+the test fixtures (`_search`, `_doc`, `_mget`, `_bulk`, index existence and creation), served
+from MemoryStorage with injected latency, errors and stalls.
+"""
+import time
+from typing import Optional
+
+import orjson
+from aiohttp import web
+
+from storage.memory_storage import MemoryStorage
+from tests.standins.faults import Faults, StandInError
+from tests.standins.testdata import functional_storage
+
+
+def json_response(data: dict, status: int = 200) -> web.Response:
+    return web.Response(body=orjson.dumps(data), status=status, content_type='application/json')
+
+
+def error_response(status: int, error_type: str, reason: str) -> web.Response:
+    return json_response({'error': {'type': error_type, 'reason': reason}, 'status': status}, status)
+
+
+async def read_json(request: web.Request) -> dict:
+    body = await request.read()
+    return orjson.loads(body) if body else {}
+
+
+class ElasticStandIn:
+    def __init__(self, storage: Optional[MemoryStorage] = None, faults: Optional[Faults] = None):
+        self.storage = storage or functional_storage()
+        self.faults = faults or Faults()
+        self.runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._faults], client_max_size=64 * 1024 * 1024)
+        app.router.add_get('/', self.info)
+        app.router.add_post('/_bulk', self.bulk)
+        # The async client sends index existence checks as GET, not HEAD.
+        app.router.add_get('/{index}', self.index_exists)
+        app.router.add_put('/{index}', self.create_index)
+        app.router.add_post('/{index}/_bulk', self.bulk)
+        for path in ('/{index}/_search', '/{index}/_doc/_search'):
+            app.router.add_get(path, self.search)
+            app.router.add_post(path, self.search)
+        for path in ('/{index}/_mget', '/{index}/_doc/_mget'):
+            app.router.add_get(path, self.mget)
+            app.router.add_post(path, self.mget)
+        app.router.add_get('/{index}/_doc/{id}', self.get)
+        return app
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler):
+        try:
+            await self.faults.apply()
+        except StandInError as error:
+            return error_response(503, 'stand_in_exception', str(error))
+        return await handler(request)
+
+    async def info(self, request: web.Request) -> web.Response:
+        return json_response({'name': 'stand-in', 'version': {'number': '7.8.0'}, 'tagline': 'You Know, for Search'})
+
+    async def index_exists(self, request: web.Request) -> web.Response:
+        index = request.match_info['index']
+        if index not in self.storage.indexes:
+            return error_response(404, 'index_not_found_exception', 'no such index [{0}]'.format(index))
+        return json_response({index: {'aliases': {}, 'mappings': {}, 'settings': {}}})
+
+    async def create_index(self, request: web.Request) -> web.Response:
+        index = request.match_info['index']
+        if index in self.storage.indexes:
+            return error_response(400, 'resource_already_exists_exception', 'index [{0}] already exists'.format(index))
+        self.storage.put(index, [])
+        return json_response({'acknowledged': True, 'shards_acknowledged': True, 'index': index})
+
+    async def search(self, request: web.Request) -> web.Response:
+        started = time.monotonic()
+        index = request.match_info['index']
+        if index not in self.storage.indexes:
+            return error_response(404, 'index_not_found_exception', 'no such index [{0}]'.format(index))
+        body = await read_json(request)
+        try:
+            sources = await self.storage.search(index=index, body=body, params=dict(request.query))
+        except (ValueError, KeyError) as error:
+            return error_response(400, 'parsing_exception', repr(error))
+        hits = [{'_index': index, '_type': '_doc', '_id': source['id'], '_score': None, '_source': source}
+                for source in sources]
+        return json_response({
+            'took': int((time.monotonic() - started) * 1000),
+            'timed_out': False,
+            'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'max_score': None, 'hits': hits},
+        })
+
+    def _document(self, index: str, object_id: str) -> dict:
+        documents = self.storage.indexes.get(index)
+        number = documents.numbers.get(object_id) if documents else None
+        if number is None:
+            return {'_index': index, '_type': '_doc', '_id': object_id, 'found': False}
+        return {'_index': index, '_type': '_doc', '_id': object_id, '_version': 1, 'found': True,
+                '_source': documents.documents[number]}
+
+    async def get(self, request: web.Request) -> web.Response:
+        document = self._document(request.match_info['index'], request.match_info['id'])
+        return json_response(document, 200 if document['found'] else 404)
+
+    async def mget(self, request: web.Request) -> web.Response:
+        body = await read_json(request)
+        index = request.match_info['index']
+        ids = body.get('ids') or [doc['_id'] for doc in body.get('docs', [])]
+        return json_response({'docs': [self._document(index, object_id) for object_id in ids]})
+
+    async def bulk(self, request: web.Request) -> web.Response:
+        """Only `index` actions, as sent by the ETL and the test fixtures."""
+        started = time.monotonic()
+        lines = [orjson.loads(line) for line in (await request.read()).splitlines() if line.strip()]
+        documents: dict[str, list[dict]] = {}
+        items = []
+        for action, source in zip(lines[::2], lines[1::2]):
+            meta = action.get('index') or action.get('create') or {}
+            index = meta.get('_index', request.match_info.get('index'))
+            documents.setdefault(index, []).append({'id': meta.get('_id', source.get('id')), **source})
+            items.append({'index': {'_index': index, '_type': '_doc', '_id': meta.get('_id'), 'status': 201,
+                                    'result': 'created'}})
+        for index, index_documents in documents.items():
+            self.storage.put(index, index_documents)
+        return json_response({'took': int((time.monotonic() - started) * 1000), 'errors': False, 'items': items})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
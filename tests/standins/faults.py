@@ -0,0 +1,87 @@
+import asyncio
+import random
+from typing import Optional
+
+
+class StandInError(Exception):
+    """An injected failure; the stand-in answers it with its protocol's error reply."""
+
+
+class Latency:
+    """
+    Response delay distribution, parsed from `kind:arg:arg`, all times in milliseconds:
+        fixed:2             every response after 2 ms
+        uniform:1:5         between 1 and 5 ms
+        lognormal:2:0.5     median 2 ms, sigma 0.5 of the underlying normal
+        pareto:1:1.5        at least 1 ms, heavy tail with shape 1.5
+    """
+
+    KINDS = {
+        'fixed': lambda rng, ms: ms,
+        'uniform': lambda rng, low, high: rng.uniform(low, high),
+        'lognormal': lambda rng, median, sigma: median * rng.lognormvariate(0, sigma),
+        'pareto': lambda rng, scale, alpha: scale * rng.paretovariate(alpha),
+    }
+
+    def __init__(self, kind: str = 'fixed', *args: float):
+        if kind not in self.KINDS:
+            raise ValueError('Unknown latency distribution {0}'.format(kind))
+        self.kind = kind
+        self.args = args or (0.0,)
+
+    @classmethod
+    def parse(cls, value: str) -> 'Latency':
+        kind, *args = value.split(':')
+        return cls(kind, *map(float, args))
+
+    def sample(self, rng: random.Random) -> float:
+        """Seconds."""
+        return self.KINDS[self.kind](rng, *self.args) / 1000
+
+    def __repr__(self):
+        return ':'.join([self.kind, *map(str, self.args)])
+
+
+class Faults:
+    """
+    Misbehaviour of a stand-in server, drawn per request from a seeded generator so that
+    a scenario repeats exactly. Every request waits for a latency sample; with
+    `stall_rate` it hangs for `stall_seconds` instead, and with `error_rate` it fails
+    after the wait. Fields can be changed while the server is running.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None, error_rate: float = 0.0, stall_rate: float = 0.0,
+                 stall_seconds: float = 30.0, seed: int = 0):
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.stalls = 0
+
+    async def apply(self):
+        self.requests += 1
+        stall = self.rng.random() < self.stall_rate
+        fail = self.rng.random() < self.error_rate
+        delay = self.latency.sample(self.rng)
+        if stall:
+            self.stalls += 1
+            delay = self.stall_seconds
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if fail:
+            self.errors += 1
+            raise StandInError('injected error')
+
+    def snapshot(self) -> dict:
+        return {
+            'latency': repr(self.latency),
+            'error_rate': self.error_rate,
+            'stall_rate': self.stall_rate,
+            'stall_seconds': self.stall_seconds,
+            'requests': self.requests,
+            'errors': self.errors,
+            'stalls': self.stalls,
+        }
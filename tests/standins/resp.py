@@ -0,0 +1,260 @@
+"""
+Redis stand-in: a RESP2 server with the commands the API cache, the writer and the ETL use
+(strings with expiry, MGET, DEL, sets, PUBLISH), with injected latency, errors and stalls.
+
+Commands that arrive together, as a pipeline does, are delayed once and answered in one
+write, so a pipeline costs one round trip as with a real Redis. Unknown commands get an
+error reply, e.g. EVALSHA makes the rate limiter fall back to its local buckets.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from db.sharded_redis import ShardedRedis
+from tests.standins.faults import Faults, StandInError
+
+OK = b'+OK\r\n'
+NULL = b'$-1\r\n'
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return NULL
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, (list, tuple, set)):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def error(message: str) -> bytes:
+    return '-{0}\r\n'.format(message).encode()
+
+
+class CommandParser:
+    """Splits a byte stream into commands; each command is a RESP array of bulk strings."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[list[bytes]]:
+        self.buffer.extend(data)
+        commands = []
+        while True:
+            command, position = self._parse(0)
+            if command is None:
+                return commands
+            commands.append(command)
+            del self.buffer[:position]
+
+    def _line(self, position: int) -> tuple[Optional[bytes], int]:
+        end = self.buffer.find(b'\r\n', position)
+        if end < 0:
+            return None, position
+        return bytes(self.buffer[position:end]), end + 2
+
+    def _parse(self, position: int) -> tuple[Optional[list[bytes]], int]:
+        line, position = self._line(position)
+        if line is None:
+            return None, 0
+        if not line.startswith(b'*'):
+            return line.split(), position
+        arguments = []
+        for _ in range(int(line[1:])):
+            header, position = self._line(position)
+            if header is None:
+                return None, 0
+            length = int(header[1:])
+            if len(self.buffer) < position + length + 2:
+                return None, 0
+            arguments.append(bytes(self.buffer[position:position + length]))
+            position += length + 2
+        return arguments, position
+
+
+class Keyspace:
+    def __init__(self):
+        self.values: dict[bytes, object] = {}
+        self.expires: dict[bytes, float] = {}
+
+    def _alive(self, key: bytes) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return key in self.values
+
+    def get(self, key: bytes):
+        return self.values[key] if self._alive(key) else None
+
+    def set(self, key: bytes, value, expire: Optional[float] = None):
+        self.values[key] = value
+        if expire is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + expire
+
+    def delete(self, key: bytes) -> int:
+        alive = self._alive(key)
+        self.values.pop(key, None)
+        self.expires.pop(key, None)
+        return int(alive)
+
+    def ttl(self, key: bytes) -> int:
+        if not self._alive(key):
+            return -2
+        expires = self.expires.get(key)
+        return -1 if expires is None else max(0, round(expires - time.monotonic()))
+
+    def flush(self):
+        self.values.clear()
+        self.expires.clear()
+
+
+class RedisStandIn:
+    def __init__(self, faults: Optional[Faults] = None):
+        self.faults = faults or Faults()
+        self.keyspace = Keyspace()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.port: Optional[int] = None
+        self.clients = 0
+
+    def execute(self, command: list[bytes]) -> bytes:
+        name = command[0].upper().decode()
+        handler = getattr(self, 'command_' + name.lower(), None)
+        if handler is None:
+            return error("ERR unknown command '{0}'".format(name))
+        try:
+            return handler(*command[1:])
+        except (TypeError, ValueError):
+            return error("ERR wrong number or type of arguments for '{0}' command".format(name))
+
+    def command_ping(self, message: bytes = None) -> bytes:
+        return b'+PONG\r\n' if message is None else encode(message)
+
+    def command_echo(self, message: bytes) -> bytes:
+        return encode(message)
+
+    def command_select(self, db: bytes) -> bytes:
+        return OK
+
+    def command_client(self, subcommand: bytes, *args: bytes) -> bytes:
+        if subcommand.upper() == b'ID':
+            return encode(id(self))
+        return OK
+
+    def command_flushdb(self, *args: bytes) -> bytes:
+        self.keyspace.flush()
+        return OK
+
+    command_flushall = command_flushdb
+
+    def command_get(self, key: bytes) -> bytes:
+        value = self.keyspace.get(key)
+        if value is not None and not isinstance(value, bytes):
+            return error('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return encode(value)
+
+    def command_mget(self, *keys: bytes) -> bytes:
+        values = [self.keyspace.get(key) for key in keys]
+        return encode([value if isinstance(value, bytes) else None for value in values])
+
+    def command_set(self, key: bytes, value: bytes, *options: bytes) -> bytes:
+        expire, options = None, [option.upper() for option in options]
+        if b'EX' in options:
+            expire = float(options[options.index(b'EX') + 1])
+        if b'PX' in options:
+            expire = float(options[options.index(b'PX') + 1]) / 1000
+        exists = self.keyspace.get(key) is not None
+        if (b'NX' in options and exists) or (b'XX' in options and not exists):
+            return NULL
+        self.keyspace.set(key, value, expire)
+        return OK
+
+    def command_setex(self, key: bytes, seconds: bytes, value: bytes) -> bytes:
+        self.keyspace.set(key, value, float(seconds))
+        return OK
+
+    def command_del(self, *keys: bytes) -> bytes:
+        return encode(sum(self.keyspace.delete(key) for key in keys))
+
+    command_unlink = command_del
+
+    def command_exists(self, *keys: bytes) -> bytes:
+        return encode(sum(self.keyspace.get(key) is not None for key in keys))
+
+    def command_expire(self, key: bytes, seconds: bytes) -> bytes:
+        value = self.keyspace.get(key)
+        if value is None:
+            return encode(0)
+        self.keyspace.set(key, value, float(seconds))
+        return encode(1)
+
+    def command_ttl(self, key: bytes) -> bytes:
+        return encode(self.keyspace.ttl(key))
+
+    def command_sadd(self, key: bytes, *members: bytes) -> bytes:
+        current = self.keyspace.get(key)
+        current = set() if current is None else current
+        if not isinstance(current, set):
+            return error('WRONGTYPE Operation against a key holding the wrong kind of value')
+        added = len(set(members) - current)
+        current.update(members)
+        self.keyspace.values[key] = current
+        return encode(added)
+
+    def command_smembers(self, key: bytes) -> bytes:
+        current = self.keyspace.get(key)
+        return encode(sorted(current) if isinstance(current, set) else [])
+
+    def command_publish(self, channel: bytes, message: bytes) -> bytes:
+        return encode(0)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        parser = CommandParser()
+        self.clients += 1
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                commands = parser.feed(data)
+                if not commands:
+                    continue
+                try:
+                    await self.faults.apply()
+                    replies = [self.execute(command) for command in commands]
+                except StandInError as injected:
+                    replies = [error('ERR {0}'.format(injected))] * len(commands)
+                writer.write(b''.join(replies))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._serve, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+@asynccontextmanager
+async def sharded_redis(faults: Optional[Faults] = None) -> AsyncIterator[ShardedRedis]:
+    """A stand-in on a free port with a one-node ShardedRedis client, for tests."""
+    stand_in = RedisStandIn(faults)
+    port = await stand_in.start()
+    redis = await ShardedRedis.connect('127.0.0.1:%d' % port, minsize=1, maxsize=2)
+    try:
+        yield redis
+    finally:
+        redis.close()
+        await redis.wait_closed()
+        await stand_in.stop()
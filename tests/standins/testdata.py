@@ -0,0 +1,9 @@
+"""The documents the functional tests load into Elasticsearch, as a MemoryStorage."""
+from storage.memory_storage import MemoryStorage
+from tests.functional.testdata.film_data import film_data
+from tests.functional.testdata.genre_data import genre_data
+from tests.functional.testdata.person_data import people_data
+
+
+def functional_storage() -> MemoryStorage:
+    return MemoryStorage({'movies': film_data, 'person': people_data, 'genre': genre_data})
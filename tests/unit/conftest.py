@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+# The application packages live in src/ of the repository and in the working directory of the image,
+# the `tests` package next to them. The ETL modules import each other by plain name from ETL/,
+# which is not part of the image: tests of them skip there.
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+if (ROOT / 'src').is_dir():
+    sys.path.insert(0, str(ROOT / 'src'))
+if (ROOT / 'ETL').is_dir():
+    sys.path.append(str(ROOT / 'ETL'))
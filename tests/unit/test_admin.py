@@ -0,0 +1,25 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+
+from api.admin import require_admin
+from core import config
+
+
+@pytest.mark.asyncio
+async def test_admin_token_is_required(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 'secret')
+    await require_admin('secret')
+    for token in (None, 'wrong', 'сек'):
+        with pytest.raises(HTTPException) as error:
+            await require_admin(token)
+        assert error.value.status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_are_hidden_without_a_token(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', '')
+    with pytest.raises(HTTPException) as error:
+        await require_admin('secret')
+    assert error.value.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,40 @@
+import pytest
+
+from cache.redis_cache import stale_key
+
+etl_classes = pytest.importorskip('etl_classes')
+
+
+class FakeClient:
+    def __init__(self, negative=()):
+        self.negative = set(negative)
+        self.deleted = []
+
+    def smembers(self, key):
+        return {member.encode() for member in self.negative}
+
+    def delete(self, *keys):
+        self.deleted.extend(keys)
+
+
+def invalidator(monkeypatch, index_name, client):
+    monkeypatch.setattr(etl_classes, 'redis_connection', lambda: client)
+    return etl_classes.CacheInvalidator(index_name)
+
+
+def test_entries_are_deleted_with_their_stale_copies(monkeypatch):
+    client = FakeClient(negative={'film::page::1::50'})
+    invalidator(monkeypatch, 'film', client).invalidate([{'id': 'a'}, {'id': 'b'}])
+    assert set(client.deleted) == {
+        'film::guid::a', 'film::guid::b', stale_key('film::guid::a'), stale_key('film::guid::b'),
+        'film::page::1::50', 'film::negative',
+    }
+
+
+def test_person_films_lists_lose_their_stale_copies_too(monkeypatch):
+    client = FakeClient()
+    invalidator(monkeypatch, 'person', client).invalidate([{'id': 'p'}])
+    assert set(client.deleted) == {
+        'person::guid::p', 'person::films::guid::p', stale_key('person::guid::p'),
+        stale_key('person::films::guid::p'), 'person::negative',
+    }
@@ -0,0 +1,55 @@
+import zlib
+
+import orjson
+import pytest
+
+from cache.codec import NOT_FOUND, CacheCodec, lz4_frame
+from models.models import Genre
+
+SMALL = {'id': '1', 'name': 'Drama'}
+LARGE = [{'id': str(number), 'name': 'Genre {0}'.format(number)} for number in range(300)]
+
+
+@pytest.mark.parametrize('compression, header', [('lz4', 0x12), ('zlib', 0x11), ('none', 0x10)])
+def test_round_trip(compression, header):
+    if compression == 'lz4' and lz4_frame is None:
+        pytest.skip('lz4 is not installed')
+    codec = CacheCodec(compression=compression)
+    data = codec.encode(LARGE)
+    assert data[0] == header
+    assert codec.decode(data) == LARGE
+    assert codec.decode(codec.encode(SMALL)) == SMALL
+
+
+def test_payloads_below_the_threshold_are_not_compressed():
+    codec = CacheCodec(compress_threshold=4096, compression='zlib')
+    below = {'value': 'x' * (4096 - len(orjson.dumps({'value': ''})) - 1)}
+    assert len(orjson.dumps(below)) == 4095
+    assert codec.encode(below)[0] == 0x10
+    at = {'value': below['value'] + 'x'}
+    data = codec.encode(at)
+    assert data[0] == 0x11
+    assert orjson.loads(zlib.decompress(data[1:])) == at
+
+
+def test_models_are_serialized():
+    codec = CacheCodec()
+    assert codec.decode(codec.encode(Genre(**SMALL))) == SMALL
+
+
+def test_not_found_is_a_bare_header():
+    codec = CacheCodec()
+    assert codec.encode_not_found() == b'\x13'
+    assert codec.decode(b'\x13') is NOT_FOUND
+
+
+@pytest.mark.parametrize('value', [SMALL, LARGE[:3], 'text'])
+def test_plain_json_from_before_the_codec_is_read(value):
+    assert CacheCodec().decode(orjson.dumps(value)) == value
+
+
+def test_unknown_version_and_missing_values_decode_to_none():
+    codec = CacheCodec()
+    assert codec.decode(None) is None
+    assert codec.decode(b'') is None
+    assert codec.decode(b'\x20{}') is None
@@ -0,0 +1,76 @@
+from api.routes import LISTING, LOOKUP, SEARCH
+from storage.resilience import ConcurrencyLimiter
+
+
+def limiter(**kwargs) -> ConcurrencyLimiter:
+    settings = dict(initial_limit=10, min_limit=2, max_limit=100, backoff=0.5, tolerance=2.0, min_latency_ms=50,
+                    backoff_interval_ms=0, window=100, shares={LOOKUP: 1.0, LISTING: 0.5, SEARCH: 0.5})
+    settings.update(kwargs)
+    return ConcurrencyLimiter(**settings)
+
+
+def call(limiter_: ConcurrencyLimiter, seconds: float, kind: str = LOOKUP, failed: bool = False):
+    assert limiter_.acquire(kind)
+    limiter_.release(kind, seconds, failed=failed)
+
+
+def test_successes_grow_the_limit_additively():
+    aimd = limiter()
+    for _ in range(10):
+        call(aimd, 0.1)
+    # +1/limit per call: about +1 after a limit's worth of calls.
+    assert 10.9 < aimd.limit < 11
+
+
+def test_failures_shrink_the_limit_multiplicatively_down_to_the_minimum():
+    aimd = limiter()
+    call(aimd, 0.1, failed=True)
+    assert aimd.limit == 5
+    for _ in range(5):
+        call(aimd, 0.1, failed=True)
+    assert aimd.limit == 2
+
+
+def test_congestion_is_judged_against_the_median():
+    aimd = limiter()
+    for seconds in [0.08] * 15 + [0.001] * 10:
+        call(aimd, seconds)
+    # A few cache-fast calls do not pull the baseline down: 0.12 s is within 2x of the 0.08 s median.
+    limit = aimd.limit
+    call(aimd, 0.12)
+    assert aimd.limit > limit
+    call(aimd, 0.2)
+    assert aimd.limit < limit
+
+
+def test_calls_under_the_latency_floor_are_never_congested():
+    aimd = limiter()
+    for _ in range(30):
+        call(aimd, 0.001)
+    limit = aimd.limit
+    call(aimd, 0.04)
+    assert aimd.limit > limit
+
+
+def test_backoff_interval_limits_the_decrease_rate():
+    aimd = limiter(backoff_interval_ms=60000)
+    call(aimd, 0.1, failed=True)
+    call(aimd, 0.1, failed=True)
+    assert aimd.limit == 5
+
+
+def test_classes_are_admitted_up_to_their_share():
+    aimd = limiter(initial_limit=4)
+    assert aimd.acquire(SEARCH) and aimd.acquire(SEARCH)
+    assert not aimd.acquire(SEARCH)
+    assert aimd.acquire(LOOKUP) and aimd.acquire(LOOKUP)
+    assert not aimd.acquire(LOOKUP)
+    assert aimd.rejected == {SEARCH: 1, LOOKUP: 1}
+
+
+def test_cancelled_calls_only_free_their_slot():
+    aimd = limiter()
+    assert aimd.acquire(LOOKUP)
+    aimd.release(LOOKUP)
+    assert aimd.in_flight == 0
+    assert aimd.limit == 10
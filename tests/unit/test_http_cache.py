@@ -0,0 +1,68 @@
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.v1 import films
+from cache import data_version
+from cache.redis_cache import served_stale
+from services.film import get_film_service
+
+
+class FakeFilmService:
+    def __init__(self):
+        self.lookups = 0
+        self.stale = False
+
+    async def get_by_id(self, film_id):
+        self.lookups += 1
+        if self.stale:
+            served_stale.set(True)
+        return {'id': film_id}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(data_version, 'data_version', SimpleNamespace(value=7))
+    return FakeFilmService()
+
+
+@pytest.fixture
+def client(service):
+    app = FastAPI()
+    app.include_router(films.router, prefix='/api/v1/films')
+    app.dependency_overrides[get_film_service] = lambda: service
+    return TestClient(app)
+
+
+def test_version_etag_is_answered_before_the_lookup(client, service):
+    response = client.get('/api/v1/films/1')
+    assert response.status_code == HTTPStatus.OK
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"7-')
+
+    response = client.get('/api/v1/films/1', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert service.lookups == 1
+
+
+def test_stale_content_is_not_tagged_with_the_data_version(client, service):
+    service.stale = True
+    response = client.get('/api/v1/films/1')
+    assert response.status_code == HTTPStatus.OK
+    assert not response.headers['ETag'].startswith('W/')
+
+    service.stale = False
+    response = client.get('/api/v1/films/1')
+    assert response.headers['ETag'].startswith('W/"7-')
+
+
+def test_body_etag_without_a_data_version(client, service, monkeypatch):
+    monkeypatch.setattr(data_version, 'data_version', None)
+    etag = client.get('/api/v1/films/1').headers['ETag']
+    assert not etag.startswith('W/')
+    assert client.get('/api/v1/films/1', headers={'If-None-Match': etag}).status_code == HTTPStatus.NOT_MODIFIED
+    assert service.lookups == 2
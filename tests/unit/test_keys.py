@@ -0,0 +1,23 @@
+from cache.keys import PAGINATION_DEFAULTS, build_key
+
+
+def person_key(**params) -> str:
+    return build_key('person::list', {'page': 1, 'page_size': 50, 'role': None, 'name': None, **params},
+                     PAGINATION_DEFAULTS, text_fields=('role', 'name'))
+
+
+def test_defaults_and_empty_values_are_left_out():
+    assert person_key() == 'person::list'
+    assert person_key(page=2, name='  Foo  Bar ') == 'person::list::name=foo%20bar::page=2'
+
+
+def test_values_cannot_forge_separators():
+    assert person_key(name='foo::page=2') != person_key(name='foo', page=2)
+    assert person_key(name='foo=x') != person_key(name='foo', role='x')
+    assert person_key(name='a%3A%3Ab') != person_key(name='a::b')
+
+
+def test_long_keys_are_hashed_without_collisions():
+    forged = person_key(name='x' * 100 + '::page=2')
+    assert forged.startswith('person::list::h::')
+    assert forged != person_key(name='x' * 100, page=2)
@@ -0,0 +1,67 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from cache.redis_cache import RedisService
+from services.film import FilmService
+from services.person import PersonService
+from tests.functional.testdata import film_data as film
+from tests.functional.testdata import person_data as person
+from tests.standins.resp import sharded_redis
+from tests.standins.testdata import functional_storage
+
+
+@asynccontextmanager
+async def redis_cache():
+    async with sharded_redis() as redis:
+        yield RedisService(redis)
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_title_search():
+    async with redis_cache() as cache:
+        service = FilmService(cache, functional_storage())
+        films = await service.get_all_objects(title=film.search_film_text[:-1] + 'i', page=1, page_size=50)
+        assert [{'id': obj.id, 'title': obj.title, 'imdb_rating': obj.imdb_rating}
+                for obj in films] == film.search_film_text_res
+
+
+@pytest.mark.asyncio
+async def test_person_name_and_role_must_both_match():
+    async with redis_cache() as cache:
+        service = PersonService(cache, functional_storage())
+        people = await service.get_all_objects(name=person.search_person_double_textname,
+                                               role=person.search_person_double_textrole, page=1, page_size=50)
+        assert [obj.dict() for obj in people] == person.search_person_textnamerole_res
+
+        people = await service.get_all_objects(name=person.search_person_double_textname,
+                                               role=person.search_person_no_double_textrole, page=1, page_size=50)
+        assert people is None
+
+
+@pytest.mark.asyncio
+async def test_films_sorted_by_rating():
+    async with redis_cache() as cache:
+        service = FilmService(cache, functional_storage())
+        films = await service.get_all_objects(sort='imdb_rating:desc', page=1, page_size=50)
+        ratings = [obj.imdb_rating for obj in films]
+        assert len(films) == min(50, len(film.film_data))
+        assert ratings == sorted(ratings, reverse=True)
+
+        films = await service.get_all_objects(sort='imdb_rating:asc', page=1, page_size=50)
+        ratings = [obj.imdb_rating for obj in films]
+        assert ratings == sorted(ratings)
+
+
+@pytest.mark.asyncio
+async def test_export_walks_every_film_once_with_search_after():
+    async with redis_cache() as cache:
+        service = FilmService(cache, functional_storage())
+        batches = [batch async for batch in service.export_batches(batch_size=7)]
+        ids = [source['id'] for batch in batches for source in batch]
+        assert ids == sorted(row['id'] for row in film.film_data)
+        assert all(len(batch) == 7 for batch in batches[:-1])
+
+        resumed = [source['id'] async for batch in service.export_batches(after=ids[9], batch_size=7)
+                   for source in batch]
+        assert resumed == ids[10:]
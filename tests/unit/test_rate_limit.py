@@ -0,0 +1,25 @@
+from api import rate_limit
+from core import config
+
+
+def scope(headers: dict, client: str = '10.0.0.1') -> dict:
+    return {'headers': [(name.encode(), value.encode()) for name, value in headers.items()], 'client': (client, 5000)}
+
+
+def test_known_api_keys_get_their_own_bucket(monkeypatch):
+    monkeypatch.setattr(config, 'RATE_LIMIT_API_KEYS', frozenset({'partner'}))
+    assert rate_limit.client_identity(scope({'x-api-key': 'partner'})).startswith('key:')
+
+
+def test_unknown_api_keys_are_limited_by_address(monkeypatch):
+    monkeypatch.setattr(config, 'RATE_LIMIT_API_KEYS', frozenset({'partner'}))
+    assert rate_limit.client_identity(scope({'x-api-key': 'random-1'})) == 'ip:10.0.0.1'
+    assert rate_limit.client_identity(scope({'x-api-key': 'random-2'})) == 'ip:10.0.0.1'
+
+
+def test_forwarded_address_is_used_only_when_trusted(monkeypatch):
+    headers = {'x-forwarded-for': '1.2.3.4, 172.18.0.5'}
+    monkeypatch.setattr(config, 'RATE_LIMIT_TRUST_FORWARDED', False)
+    assert rate_limit.client_identity(scope(headers)) == 'ip:10.0.0.1'
+    monkeypatch.setattr(config, 'RATE_LIMIT_TRUST_FORWARDED', True)
+    assert rate_limit.client_identity(scope(headers)) == 'ip:172.18.0.5'
@@ -0,0 +1,29 @@
+import orjson
+import pytest
+
+from cache.redis_cache import RedisService, stale_key
+from tests.standins.resp import sharded_redis
+
+KEY = 'person::films::guid::p1'
+FILMS = [{'id': 'f1', 'title': 'Star Wars', 'imdb_rating': 8.6}, {'id': 'f2', 'title': 'Alien', 'imdb_rating': 8.5}]
+
+
+@pytest.mark.asyncio
+async def test_id_lists_are_returned():
+    async with sharded_redis() as redis:
+        cache = RedisService(redis)
+        await redis.set(KEY, cache.codec.encode(['f1', 'f2']))
+        await redis.set(stale_key(KEY), cache.codec.encode(['f1', 'f2']))
+        assert await cache.ids_from_cache(KEY) == ['f1', 'f2']
+        assert await cache.stale_ids(KEY) == ['f1', 'f2']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encode', [orjson.dumps, RedisService(None).codec.encode], ids=['legacy', 'framed'])
+async def test_entries_of_whole_objects_under_id_list_keys_are_misses(encode):
+    async with sharded_redis() as redis:
+        cache = RedisService(redis)
+        await redis.set(KEY, encode(FILMS))
+        await redis.set(stale_key(KEY), encode(FILMS))
+        assert await cache.ids_from_cache(KEY) is None
+        assert await cache.stale_ids(KEY) is None
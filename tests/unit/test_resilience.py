@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from api.routes import LOOKUP
+from storage.resilience import (CircuitBreaker, ConcurrencyLimiter, LatencyWindow, ResilientStorage,
+                                StorageOverloaded, StorageUnavailable, route_kind)
+
+
+class SlowStorage:
+    async def get(self, object_id, **kwargs):
+        await asyncio.sleep(10)
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(window=4, min_calls=2, open_seconds=0)
+    breaker.record(0.0, failed=True)
+    breaker.record(0.0, failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(0.0, failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_wedge_the_breaker():
+    breaker = open_breaker()
+    storage = ResilientStorage(SlowStorage(), breaker=breaker, get_timeout_ms=10000)
+    probe = asyncio.ensure_future(storage.get('id', index='movies', model=None))
+    await asyncio.sleep(0.01)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_rejects_calls():
+    breaker = open_breaker()
+    breaker.open_seconds = 60
+    storage = ResilientStorage(SlowStorage(), breaker=breaker)
+    with pytest.raises(StorageUnavailable):
+        await storage.get('id', index='movies', model=None)
+
+
+@pytest.mark.asyncio
+async def test_storage_calls_over_the_limit_are_rejected():
+    limiter = ConcurrencyLimiter(initial_limit=1, min_limit=1)
+    storage = ResilientStorage(SlowStorage(), breaker=CircuitBreaker(), limiter=limiter, get_timeout_ms=10000)
+    token = route_kind.set(LOOKUP)
+    try:
+        first = asyncio.ensure_future(storage.get('id', index='movies', model=None))
+        await asyncio.sleep(0.01)
+        with pytest.raises(StorageOverloaded):
+            await storage.get('id', index='movies', model=None)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert limiter.in_flight == 0
+    finally:
+        route_kind.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_timeout_during_the_hedge_delay_cancels_the_request():
+    running = []
+
+    class CountingStorage:
+        async def get(self, object_id, **kwargs):
+            running.append(object_id)
+            try:
+                await asyncio.sleep(10)
+            finally:
+                running.remove(object_id)
+
+    storage = ResilientStorage(CountingStorage(), breaker=CircuitBreaker(), get_timeout_ms=20)
+    storage.latency = LatencyWindow()
+    for _ in range(20):
+        storage.latency.record(1.0)
+    with pytest.raises(StorageUnavailable):
+        await storage.get('id', index='movies', model=None)
+    await asyncio.sleep(0)
+    assert running == []
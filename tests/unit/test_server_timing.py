@@ -0,0 +1,21 @@
+from api.server_timing import ServerTimingMiddleware
+from core import config
+
+
+def scope(headers: dict) -> dict:
+    return {'headers': [(name.encode(), value.encode()) for name, value in headers.items()]}
+
+
+def test_forced_sampling_needs_the_admin_token(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 'secret')
+    middleware = ServerTimingMiddleware(None, sample_rate=0)
+    assert middleware.sampled(scope({'x-server-timing': '1', 'x-admin-token': 'secret'}))
+    assert not middleware.sampled(scope({'x-server-timing': '1'}))
+    assert not middleware.sampled(scope({'x-server-timing': '1', 'x-admin-token': 'wrong'}))
+    assert not middleware.sampled(scope({'x-admin-token': 'secret'}))
+
+
+def test_forced_sampling_is_off_without_an_admin_token(monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', '')
+    middleware = ServerTimingMiddleware(None, sample_rate=0)
+    assert not middleware.sampled(scope({'x-server-timing': '1', 'x-admin-token': ''}))
@@ -0,0 +1,136 @@
+import aioredis
+import pytest
+
+from db.sharded_redis import HashRing, RedisNode, ShardedRedis
+
+NODES = ['redis-1:6379', 'redis-2:6379', 'redis-3:6379']
+KEYS = ['movies::guid::{0}'.format(number) for number in range(6000)]
+
+
+class FakeConnection:
+    """Answers GET and MGET from a dict, runs pipelines and scripts, and can fail on demand."""
+
+    def __init__(self, data: dict, failing: bool = False):
+        self.data = data
+        self.failing = failing
+        self.calls = []
+        self.scripts = set()
+
+    async def get(self, key):
+        self.calls.append(('get', key))
+        if self.failing:
+            raise aioredis.ConnectionClosedError('replica down')
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        self.calls.append(('mget', *keys))
+        return [self.data.get(key) for key in keys]
+
+    async def evalsha(self, digest, keys, args):
+        self.calls.append(('evalsha', digest))
+        if digest not in self.scripts:
+            raise aioredis.ReplyError('NOSCRIPT No matching script')
+        return 'sha'
+
+    async def eval(self, script, keys, args):
+        self.calls.append(('eval', script))
+        return 'eval'
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+        self.commands = []
+
+    def set(self, key, value, **kwargs):
+        self.commands.append(key)
+
+    async def execute(self):
+        self.connection.calls.append(('pipeline', *self.commands))
+        return ['OK:' + key for key in self.commands]
+
+
+def sharded(read_from_replicas: bool = False, replicas: bool = False) -> ShardedRedis:
+    nodes = [RedisNode(name, FakeConnection({}), [FakeConnection({}, failing=True)] if replicas else [])
+             for name in NODES]
+    return ShardedRedis(nodes, read_from_replicas=read_from_replicas)
+
+
+def test_ring_spreads_keys_evenly():
+    ring = HashRing(NODES)
+    counts = {node: 0 for node in NODES}
+    for key in KEYS:
+        counts[ring.get(key)] += 1
+    for count in counts.values():
+        assert abs(count - len(KEYS) / len(NODES)) < len(KEYS) / len(NODES) * 0.2
+
+
+def test_adding_or_removing_a_node_moves_only_its_keys():
+    ring = HashRing(NODES)
+    before = {key: ring.get(key) for key in KEYS}
+
+    ring.add('redis-4:6379')
+    moved = [key for key in KEYS if ring.get(key) != before[key]]
+    assert all(ring.get(key) == 'redis-4:6379' for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+    ring.remove('redis-4:6379')
+    assert {key: ring.get(key) for key in KEYS} == before
+
+    ring.remove('redis-2:6379')
+    moved = [key for key in KEYS if ring.get(key) != before[key]]
+    assert all(before[key] == 'redis-2:6379' for key in moved)
+    assert all(ring.get(key) != 'redis-2:6379' for key in KEYS)
+
+
+def test_etl_ring_maps_keys_like_the_api_ring():
+    etl_ring = pytest.importorskip('hash_ring')
+    api, etl = HashRing(NODES), etl_ring.HashRing(NODES)
+    assert all(api.get(key) == etl.get(key) for key in KEYS)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_sends_one_batch_per_node_and_keeps_the_order():
+    redis = sharded()
+    keys = KEYS[:30]
+    pipe = redis.pipeline()
+    for key in keys:
+        pipe.set(key, b'value')
+    assert await pipe.execute() == ['OK:' + key for key in keys]
+    for node in redis.nodes.values():
+        batches = [call for call in node.primary.calls if call[0] == 'pipeline']
+        assert len(batches) == 1
+        assert list(batches[0][1:]) == [key for key in keys if redis.node_for(key) is node]
+
+
+@pytest.mark.asyncio
+async def test_mget_merges_nodes_in_key_order():
+    redis = sharded()
+    for key in KEYS[:30]:
+        redis.node_for(key).primary.data[key] = key.encode()
+    assert await redis.mget(*KEYS[:40]) == [key.encode() for key in KEYS[:30]] + [None] * 10
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_read_falls_back_to_the_primary():
+    redis = sharded(read_from_replicas=True, replicas=True)
+    node = redis.node_for(KEYS[0])
+    node.primary.data[KEYS[0]] = b'value'
+    assert await redis.get(KEYS[0]) == b'value'
+    assert node.replicas[0].calls == [('get', KEYS[0])]
+    assert node.primary.calls == [('get', KEYS[0])]
+    assert node.stats.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_script_is_sent_with_eval():
+    redis = sharded()
+    primary = redis.node_for(KEYS[0]).primary
+    assert await redis.eval_script('return 1', KEYS[0], []) == 'eval'
+    assert [call[0] for call in primary.calls] == ['evalsha', 'eval']
+
+    primary.scripts.add(primary.calls[0][1])
+    assert await redis.eval_script('return 1', KEYS[0], []) == 'sha'
@@ -0,0 +1,102 @@
+import pytest
+
+from cache import shared_memory
+from cache.redis_cache import RedisService
+from cache.shared_memory import SharedTable
+
+KEY = 'movies::guid::1'
+
+
+@pytest.fixture
+def table(tmp_path):
+    table = SharedTable.open(str(tmp_path / 'table'), slots=16, slot_size=128, ways=4, ttl=10)
+    yield table
+    table.close()
+
+
+@pytest.mark.asyncio
+async def test_value_fetched_before_an_invalidation_is_not_shared(table, monkeypatch):
+    monkeypatch.setattr(shared_memory, 'shared_table', table)
+    cache = RedisService(None)
+
+    async def invalidated_while_fetching(keys):
+        table.delete(KEY)
+        return [b'old']
+    cache.mget_remote = invalidated_while_fetching
+    assert await cache.mget_raw([KEY]) == [b'old']
+    assert table.get(KEY) is None
+    assert table.stale_puts == 1
+
+    async def fetch(keys):
+        return [b'new']
+    cache.mget_remote = fetch
+    assert await cache.mget_raw([KEY]) == [b'new']
+    assert table.get(KEY) == b'new'
+
+
+def slot_of(table: SharedTable, key: str) -> int:
+    hashed = shared_memory.key_hash(key.encode())
+    for offset in table._offsets(hashed):
+        if shared_memory.SLOT.unpack_from(table.memory, offset)[2] == hashed:
+            return offset
+    raise AssertionError(key)
+
+
+def test_read_during_a_write_is_a_miss(table):
+    table.put(KEY, b'value')
+    offset = slot_of(table, KEY)
+    sequence = shared_memory.SEQUENCE.unpack_from(table.memory, offset)[0]
+
+    shared_memory.SEQUENCE.pack_into(table.memory, offset, sequence + 1)
+    assert table.get(KEY) is None
+    assert table.torn_reads == 1
+
+    shared_memory.SEQUENCE.pack_into(table.memory, offset, sequence + 2)
+    assert table.get(KEY) == b'value'
+
+
+def test_full_bucket_evicts_the_entry_closest_to_expiry(tmp_path, monkeypatch):
+    table = SharedTable.open(str(tmp_path / 'table'), slots=4, slot_size=128, ways=4, ttl=10)
+    now = 1000.0
+    monkeypatch.setattr(shared_memory.time, 'time', lambda: now)
+    for number in range(4):
+        table.put('genre::guid::{0}'.format(number), b'value')
+        now += 1
+    table.put('genre::guid::4', b'value')
+
+    assert table.collisions == 1
+    assert table.get('genre::guid::0') is None
+    assert all(table.get('genre::guid::{0}'.format(number)) == b'value' for number in range(1, 5))
+    assert table.occupancy() == {'live': 4, 'occupancy': 1.0, 'full_buckets': 1}
+    table.close()
+
+
+def test_entries_expire_after_the_ttl(table, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(shared_memory.time, 'time', lambda: now)
+    table.put(KEY, b'value')
+    now += 9.9
+    assert table.get(KEY) == b'value'
+    now += 0.2
+    assert table.get(KEY) is None
+
+
+def test_clear_bumps_the_generation_for_every_worker(table, tmp_path):
+    other = SharedTable.open(str(tmp_path / 'table'), slots=16, slot_size=128, ways=4, ttl=10)
+    table.put(KEY, b'value')
+    assert other.get(KEY) == b'value'
+
+    generation = table.generation
+    other.clear()
+    assert table.generation == generation + 1
+    assert table.get(KEY) is None
+
+    table.put(KEY, b'new')
+    assert other.get(KEY) == b'new'
+    other.close()
+
+
+def test_values_larger_than_a_slot_are_not_stored(table):
+    table.put(KEY, b'x' * 128)
+    assert table.get(KEY) is None
+    assert table.too_large == 1
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+
+import pytest
+
+from cache.redis_cache import RedisService
+from models.models import Genre
+from services.genre import GenreService
+from storage import snapshot
+from storage.snapshot import SnapshotReader
+from tests.functional.testdata.genre_data import genre_data
+from tests.standins.resp import sharded_redis
+from tests.standins.testdata import functional_storage
+
+etl_snapshot = pytest.importorskip('snapshot')
+
+GENRE = genre_data[0]
+
+
+def publish(directory: str, version: int, rows: list[dict]):
+    writer = etl_snapshot.SnapshotWriter(directory)
+    writer.put('genre', rows)
+    writer.publish()
+    assert writer.version == version
+    # Coarse file timestamps could give two quick versions the same mtime.
+    manifest = os.path.join(directory, etl_snapshot.MANIFEST)
+    os.utime(manifest, ns=(version * 10 ** 9, version * 10 ** 9))
+
+
+def stored(directory: str, version: int) -> dict:
+    connection = sqlite3.connect(os.path.join(directory, 'snapshot-{0}.sqlite'.format(version)))
+    try:
+        return {row[0]: row[1] for row in connection.execute('SELECT id, value FROM entities')}
+    finally:
+        connection.close()
+
+
+def test_new_version_copies_the_previous_one_and_replaces_changed_rows(tmp_path):
+    publish(str(tmp_path), 1, genre_data[:2])
+    publish(str(tmp_path), 2, [{**genre_data[1], 'name': 'Renamed'}, genre_data[2]])
+
+    assert len(stored(str(tmp_path), 1)) == 2
+    rows = stored(str(tmp_path), 2)
+    assert sorted(rows) == sorted(row['id'] for row in genre_data[:3])
+    assert 'Renamed' in rows[genre_data[1]['id']]
+    assert etl_snapshot.read_manifest(str(tmp_path))['version'] == 2
+    assert not os.path.exists(os.path.join(str(tmp_path), etl_snapshot.MANIFEST + '.tmp'))
+
+
+def test_only_the_last_versions_are_kept(tmp_path):
+    for version in range(1, 6):
+        publish(str(tmp_path), version, [GENRE])
+    assert sorted(name for name in os.listdir(str(tmp_path)) if name.endswith('.sqlite')) == [
+        'snapshot-3.sqlite', 'snapshot-4.sqlite', 'snapshot-5.sqlite']
+
+
+def test_reader_swaps_to_a_published_version(tmp_path):
+    reader = SnapshotReader(str(tmp_path), mmap_bytes=0)
+    reader.refresh()
+    assert reader.get('genre', GENRE['id'], Genre) is None
+
+    publish(str(tmp_path), 1, [GENRE])
+    reader.refresh()
+    assert reader.get('genre', GENRE['id'], Genre) == Genre(**GENRE)
+    assert reader.get('genre', 'unknown', Genre) is None
+
+    reader.refresh()
+    assert reader.swaps == 1
+
+    publish(str(tmp_path), 2, [{**GENRE, 'name': 'Renamed'}])
+    reader.refresh()
+    assert reader.swaps == 2
+    assert reader.get('genre', GENRE['id'], Genre).name == 'Renamed'
+    assert reader.snapshot() == {'version': 2, 'documents': 1, 'hit_rate': 0.6667, 'swaps': 2}
+
+
+def test_reader_keeps_the_current_version_when_the_manifest_is_broken(tmp_path):
+    publish(str(tmp_path), 1, [GENRE])
+    reader = SnapshotReader(str(tmp_path), mmap_bytes=0)
+    reader.refresh()
+
+    manifest = os.path.join(str(tmp_path), etl_snapshot.MANIFEST)
+    with open(manifest, 'w') as file:
+        file.write('{"version": 2, "file": "snapshot-missing.sqlite"}')
+    os.utime(manifest, ns=(5 * 10 ** 9, 5 * 10 ** 9))
+    reader.refresh()
+    assert reader.current.version == 1
+    assert reader.get('genre', GENRE['id'], Genre) == Genre(**GENRE)
+    reader.current.close()
+
+
+@pytest.mark.asyncio
+async def test_lookups_fall_through_to_the_cache_and_storage(tmp_path, monkeypatch):
+    reader = SnapshotReader(str(tmp_path), mmap_bytes=0)
+    reader.refresh()
+    monkeypatch.setattr(snapshot, 'snapshot_reader', reader)
+    async with sharded_redis() as redis:
+        service = GenreService(RedisService(redis), functional_storage())
+        assert await service.get_by_id(GENRE['id']) == Genre(**GENRE)
+
+        publish(str(tmp_path), 1, [{**GENRE, 'name': 'From the snapshot'}])
+        reader.refresh()
+        assert (await service.get_by_id(GENRE['id'])).name == 'From the snapshot'
+        assert await service.get_by_id('unknown') is None
+    reader.current.close()
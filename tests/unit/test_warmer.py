@@ -0,0 +1,211 @@
+import asyncio
+
+import pytest
+
+from services import warmer as warmer_module
+from services.warmer import FREQUENCY_KEY, LOCK_KEY, PARAMS_KEY, RELEASE_LOCK_SCRIPT, CacheWarmer
+
+
+class FakePipeline:
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self) -> list:
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """The commands of ShardedRedis the warmer uses, over dicts."""
+
+    SET_IF_NOT_EXIST = 'SET_IF_NOT_EXIST'
+
+    def __init__(self):
+        self.values = {}
+        self.scores = {}
+        self.hashes = {}
+        self.control_address = ('127.0.0.1', 6379)
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def set(self, key, value, expire=None, exist=None):
+        if exist == self.SET_IF_NOT_EXIST and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.values)
+
+    async def eval_script(self, script, key, args):
+        assert script == RELEASE_LOCK_SCRIPT
+        if self.values.get(key) == args[0]:
+            del self.values[key]
+            return 1
+        return 0
+
+    async def zincrby(self, key, increment, member):
+        self.scores[member] = self.scores.get(member, 0) + increment
+
+    async def zunionstore(self, destination, source, with_weights=False):
+        key, weight = source
+        self.scores = {member: score * weight for member, score in self.scores.items()}
+
+    def _ordered(self) -> list:
+        return sorted(self.scores, key=lambda member: (self.scores[member], member))
+
+    async def zrange(self, key, start, stop, encoding=None):
+        ordered = self._ordered()
+        return ordered[start:len(ordered) + stop + 1 if stop < 0 else stop + 1]
+
+    async def zrevrange(self, key, start, stop, encoding=None):
+        return self._ordered()[::-1][start:stop + 1]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.scores.pop(member, None)
+
+    async def hset(self, key, field, value):
+        self.hashes[field] = value
+
+    async def hmget(self, key, *fields):
+        return [self.hashes.get(field) for field in fields]
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.pop(field, None)
+
+
+class FakeService:
+    def __init__(self):
+        self.refreshed = []
+
+    async def refresh_by_id(self, object_id):
+        self.refreshed.append(object_id)
+
+    async def refresh_objects(self, **params):
+        self.refreshed.append(params)
+
+
+def make_warmer(**kwargs) -> tuple[CacheWarmer, FakeRedis, FakeService]:
+    redis = FakeRedis()
+    service = FakeService()
+    return CacheWarmer(redis, {'movies': service}, **kwargs), redis, service
+
+
+@pytest.mark.asyncio
+async def test_flush_adds_counts_and_caps_tracked_keys():
+    warmer, redis, _ = make_warmer(max_tracked_keys=2)
+    for key, count in (('movies::guid::1', 3), ('movies::guid::2', 2), ('movies::guid::3', 1)):
+        for _ in range(count):
+            warmer.track(key, {'object_id': key[-1]})
+    await warmer.flush()
+    assert redis.scores == {'movies::guid::1': 3, 'movies::guid::2': 2}
+    assert set(redis.hashes) == {'movies::guid::1', 'movies::guid::2'}
+    assert not warmer.counter
+
+    warmer.track('movies::guid::1', {'object_id': '1'})
+    await warmer.flush()
+    assert redis.scores['movies::guid::1'] == 4
+
+
+@pytest.mark.asyncio
+async def test_decay_halves_counts():
+    warmer, redis, _ = make_warmer()
+    redis.scores = {'movies::guid::1': 4, 'movies::guid::2': 1}
+    await warmer._decay()
+    assert redis.scores == {'movies::guid::1': 2, 'movies::guid::2': 0.5}
+
+
+@pytest.mark.asyncio
+async def test_warm_fills_missing_keys_and_forces_listings():
+    warmer, redis, service = make_warmer()
+    warmer.track('movies::guid::1', {'object_id': '1'})
+    warmer.track('movies::list', {'page': 1})
+    await warmer.flush()
+    redis.values['movies::list'] = b'cached'
+
+    result = await warmer.warm()
+    assert service.refreshed == ['1']
+    assert (result['warmed'], result['skipped']) == (1, 1)
+
+    redis.values['movies::guid::1'] = b'cached'
+    service.refreshed.clear()
+    await warmer.warm(force=True)
+    assert service.refreshed == [{'page': 1}]
+    assert LOCK_KEY not in redis.values
+
+
+@pytest.mark.asyncio
+async def test_lock_is_released_only_while_it_holds_our_token():
+    warmer, redis, service = make_warmer()
+    redis.values[LOCK_KEY] = 'other worker'
+    assert await warmer.warm() is None
+
+    del redis.values[LOCK_KEY]
+    warmer.track('movies::guid::1', {'object_id': '1'})
+    await warmer.flush()
+
+    async def lock_expired_and_taken(object_id):
+        redis.values[LOCK_KEY] = 'next worker'
+    service.refresh_by_id = lock_expired_and_taken
+    await warmer.warm()
+    assert redis.values[LOCK_KEY] == 'next worker'
+
+
+class FakeChannel:
+    def __init__(self, messages: list[str]):
+        self.messages = messages
+
+    async def wait_message(self) -> bool:
+        if self.messages:
+            return True
+        await asyncio.Event().wait()
+
+    async def get(self, encoding=None) -> str:
+        return self.messages.pop(0)
+
+
+class FakeSubscriber:
+    def __init__(self, channel: FakeChannel):
+        self.channel = channel
+        self.closed = False
+
+    async def subscribe(self, name):
+        return [self.channel]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_etl_message_notifies_listeners_and_forces_warming(monkeypatch):
+    warmer, redis, service = make_warmer()
+    warmer.track('movies::list', {'page': 1})
+    await warmer.flush()
+    redis.values['movies::list'] = b'cached'
+    subscriber = FakeSubscriber(FakeChannel(['movies,person']))
+
+    async def create_redis(address):
+        assert address == redis.control_address
+        return subscriber
+    monkeypatch.setattr(warmer_module.aioredis, 'create_redis', create_redis)
+    notified = []
+
+    async def listener(indexes):
+        notified.append(indexes)
+    warmer.etl_listeners.append(listener)
+
+    task = asyncio.ensure_future(warmer._listen_etl())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert notified == [['movies', 'person']]
+    assert service.refreshed == [{'page': 1}]
+    assert warmer.last_run['force']
+    assert subscriber.closed
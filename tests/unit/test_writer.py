@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from cache.writer import CacheWriter
+
+
+class FakePipeline:
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.keys = []
+
+    def set(self, key, value, expire=None):
+        self.keys.append(key)
+
+    async def execute(self):
+        await asyncio.sleep(self.redis.delay)
+        self.redis.batches.append(self.keys)
+
+
+class FakeRedis:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.batches = []
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+
+def item(key: str) -> list:
+    return [('set', (key, b'value'), {'expire': 60})]
+
+
+def test_items_over_the_queue_size_are_dropped():
+    writer = CacheWriter(FakeRedis(), max_queue=2)
+    assert writer.put(item('a'))
+    assert writer.put(item('b'))
+    assert not writer.put(item('c'))
+    assert writer.snapshot() == {'queued': 2, 'written': 0, 'dropped': 1, 'failed': 0}
+
+
+@pytest.mark.asyncio
+async def test_queued_items_are_written_in_batches():
+    redis = FakeRedis()
+    writer = CacheWriter(redis, batch_size=3, flush_interval_ms=10)
+    writer.start()
+    for number in range(7):
+        writer.put(item(str(number)))
+    await writer.stop(timeout=1)
+    assert redis.batches == [['0', '1', '2'], ['3', '4', '5'], ['6']]
+    assert writer.written == 7
+    assert writer.task.done()
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_out_the_queue():
+    redis = FakeRedis()
+    writer = CacheWriter(redis, batch_size=100, flush_interval_ms=50)
+    writer.start()
+    writer.put(item('a'))
+    await asyncio.sleep(0)
+    writer.put(item('b'))
+    started = time.monotonic()
+    await writer.stop(timeout=1)
+    assert time.monotonic() - started < 0.5
+    assert [key for batch in redis.batches for key in batch] == ['a', 'b']
+    assert writer.task.done()
+
+
+@pytest.mark.asyncio
+async def test_stop_gives_up_after_its_timeout():
+    writer = CacheWriter(FakeRedis(delay=10), flush_interval_ms=0)
+    writer.start()
+    writer.put(item('a'))
+    started = time.monotonic()
+    await writer.stop(timeout=0.05)
+    assert time.monotonic() - started < 1
+    assert writer.written == 0